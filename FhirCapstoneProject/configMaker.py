@@ -58,10 +58,51 @@ def endpoint_configurator(filename: str, endpoints: list):
             raise e
 
         # Add optional data
-        if "id_prefix" in _endpoint.keys():
-            config_parser.set(
-                str(_endpoint.get("name")), "id_prefix", str(_endpoint.get("id_prefix"))
-            )
+        for option in (
+            "id_prefix",
+            "pool_limit",
+            "pool_limit_per_host",
+            "dns_cache_ttl",
+            "keepalive_timeout",
+            "role_lookup_concurrency",
+            "capability_refresh_interval",
+            "max_search_pages",
+            "page_prefetch",
+            "breaker_failure_threshold",
+            "breaker_minimum_requests",
+            "breaker_window_seconds",
+            "breaker_open_seconds",
+            "default_timeout",
+            "default_connect_timeout",
+            "min_timeout",
+            "max_timeout",
+            "timeout_headroom",
+            "hedge_requests",
+            "hedge_budget_ratio",
+            "hedge_budget_burst",
+            "rate_limit",
+            "rate_limit_burst",
+            "max_in_flight",
+            "max_retry_after",
+            "max_requeues",
+            "retry_max_attempts",
+            "retry_backoff_base",
+            "retry_backoff_max",
+            "retry_jitter",
+            "retry_statuses",
+            "retry_exceptions",
+        ):
+            if option in _endpoint.keys():
+                config_parser.set(
+                    str(_endpoint.get("name")), option, str(_endpoint.get(option))
+                )
+
+        # Add field mappings, e.g. "map.location.phone"
+        for option in _endpoint.keys():
+            if option.startswith("map."):
+                config_parser.set(
+                    str(_endpoint.get("name")), option, str(_endpoint.get(option))
+                )
 
     with open(target, "w+") as configfile:
         config_parser.write(configfile)
@@ -0,0 +1,270 @@
+# Description: In-process caches shared by every SmartClient.
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Overview
+    --------
+    A thread-safe cache that holds at most `maxsize` entries for at most `ttl` seconds each. When full, the least
+    recently used entry is evicted to make room.
+
+    Attributes
+    -----------
+    hits
+        Number of lookups that found a fresh entry
+
+    misses
+        Number of lookups that found no entry, or only an expired one
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, clock=time.monotonic):
+        """
+        :param maxsize: The most entries the cache will hold
+        :param ttl: Seconds an entry stays fresh after it is set
+        :param clock: Function returning the current time in seconds, monotonic by default
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the fresh value stored under key and marks it as recently used, otherwise the default.
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is not None:
+                expires, value = entry
+
+                if expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Stores value under key, evicting the least recently used entries if the cache is full.
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        :return: A dict of the cache's counters and limits
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+class CachedResponse:
+    """
+    Overview
+    --------
+    A decoded response body held by `ResponseCache`, along with the validators needed to revalidate it upstream.
+
+    Attributes
+    -----------
+    value
+        The decoded response body
+
+    size
+        Size in bytes of the response body as received, counted against the cache's memory limit
+
+    etag
+        The ETag header of the response, or None
+
+    last_modified
+        The Last-Modified header of the response, or None
+
+    expires
+        Clock time after which the entry must be revalidated before being served
+    """
+
+    def __init__(self, value, size: int, etag, last_modified, expires: float):
+        self.value = value
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+        self.uses = 0
+
+    def can_revalidate(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+class ResponseCache:
+    """
+    Overview
+    --------
+    A thread-safe cache of decoded responses bounded by the total size of the response bodies it holds. Entries stay
+    in the cache after they go stale so that they can be revalidated with If-None-Match/If-Modified-Since instead of
+    downloaded again.
+
+    When the cache is over its memory limit, entries are evicted by policy: "lru" evicts the least recently used
+    entry, "lfu" evicts the least frequently used entry.
+    """
+
+    POLICIES = ("lru", "lfu")
+
+    def __init__(self, max_bytes: int, policy: str = "lru", clock=time.monotonic):
+        """
+        :param max_bytes: The most response body bytes the cache will hold
+        :param policy: Eviction policy, one of ResponseCache.POLICIES
+        :param clock: Function returning the current time in seconds, monotonic by default
+        """
+        if policy not in ResponseCache.POLICIES:
+            raise ValueError(
+                f"Unknown eviction policy {policy}, expected one of {ResponseCache.POLICIES}"
+            )
+
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._clock = clock
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key) -> CachedResponse or None:
+        """
+        Returns the entry stored under key whether it is fresh or stale, see `ResponseCache.is_fresh`.
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry.uses += 1
+            self._entries.move_to_end(key)
+
+            if self.is_fresh(entry):
+                self.hits += 1
+
+            return entry
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        """
+        Whether the entry may be served without revalidating it upstream.
+        """
+        return entry.expires > self._clock()
+
+    def store(self, key, value, size: int, etag, last_modified, max_age: float):
+        """
+        Stores a decoded response under key, evicting other entries if the cache goes over its memory limit. A
+        response larger than the whole cache is not stored.
+
+        :param value: The decoded response body
+        :param size: Size in bytes of the response body as received
+        :param etag: The ETag header of the response, or None
+        :param last_modified: The Last-Modified header of the response, or None
+        :param max_age: Seconds the response is fresh for
+        """
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+
+            self._entries[key] = CachedResponse(
+                value, size, etag, last_modified, self._clock() + max_age
+            )
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                self._remove(self._eviction_candidate())
+                self.evictions += 1
+
+    def refresh(self, key, max_age: float):
+        """
+        Marks the entry stored under key fresh again, after upstream confirmed it is unchanged (HTTP 304).
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is not None:
+                entry.expires = self._clock() + max_age
+                self.revalidations += 1
+
+    def _eviction_candidate(self):
+        if self.policy == "lfu":
+            return min(self._entries, key=lambda key: self._entries[key].uses)
+
+        return next(iter(self._entries))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.revalidations = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        :return: A dict of the cache's counters and limits
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+            }
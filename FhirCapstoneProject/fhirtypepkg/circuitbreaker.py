@@ -0,0 +1,182 @@
+# Description: Tracks the health of an endpoint so that requests to an endpoint that is down fail fast.
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Overview
+    --------
+    A thread-safe circuit breaker for a single endpoint. While closed, every request is allowed and the outcome of
+    each is kept for `window_seconds`. Once at least `minimum_requests` have been seen in the window and the share of
+    failures (errors and timeouts) reaches `failure_threshold`, the circuit opens and requests are refused for
+    `open_seconds`. After that the circuit is half-open: up to `half_open_requests` trial requests are allowed, one
+    success closes the circuit again and one failure re-opens it.
+
+    Attributes
+    -----------
+    state
+        One of CLOSED, OPEN or HALF_OPEN
+
+    opened_count
+        Number of times the circuit has opened
+
+    rejected_count
+        Number of requests refused while the circuit was open
+    """
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        minimum_requests: int = 5,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_requests: int = 1,
+        clock=time.monotonic,
+    ):
+        """
+        :param failure_threshold: Share of failed requests in the window, from 0 to 1, that opens the circuit
+        :param minimum_requests: Fewest requests in the window before the circuit may open
+        :param window_seconds: Seconds an outcome is counted for
+        :param open_seconds: Seconds the circuit stays open before trial requests are allowed
+        :param half_open_requests: Trial requests allowed at once while half-open
+        :param clock: Function returning the current time in seconds, monotonic by default
+        """
+        self.failure_threshold = failure_threshold
+        self.minimum_requests = minimum_requests
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_requests = half_open_requests
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._outcomes = deque()
+
+        self.state = CLOSED
+        self._changed_at = self._clock()
+        self._trial_requests = 0
+
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    def _prune(self, now: float):
+        while self._outcomes and self._outcomes[0][0] <= now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def _change_state(self, state: str, now: float):
+        self.state = state
+        self._changed_at = now
+        self._trial_requests = 0
+
+        if state == OPEN:
+            self.opened_count += 1
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def _refresh_state(self, now: float):
+        # An open circuit lets trial requests through once it has been open long enough. A half-open circuit whose
+        # trial requests never reported back (e.g. they were cancelled) allows new ones after the same wait.
+        if self.state != CLOSED and now - self._changed_at >= self.open_seconds:
+            self._change_state(HALF_OPEN, now)
+
+    def is_available(self) -> bool:
+        """
+        Whether a request would be allowed right now, without counting as one.
+        """
+        with self._lock:
+            self._refresh_state(self._clock())
+
+            if self.state == HALF_OPEN:
+                return self._trial_requests < self.half_open_requests
+
+            return self.state == CLOSED
+
+    def allow_request(self) -> bool:
+        """
+        Whether a request may be sent, a request that is allowed must report its outcome with `record_success` or
+        `record_failure`.
+        """
+        with self._lock:
+            self._refresh_state(self._clock())
+
+            if self.state == CLOSED:
+                return True
+
+            if (
+                self.state == HALF_OPEN
+                and self._trial_requests < self.half_open_requests
+            ):
+                self._trial_requests += 1
+                return True
+
+            self.rejected_count += 1
+            return False
+
+    def record_success(self):
+        """
+        Records a request that the endpoint answered, a success while half-open closes the circuit.
+        """
+        with self._lock:
+            now = self._clock()
+
+            if self.state == HALF_OPEN:
+                self._change_state(CLOSED, now)
+            elif self.state == CLOSED:
+                self._outcomes.append((now, True))
+                self._prune(now)
+
+    def record_failure(self):
+        """
+        Records a request that errored or timed out, which may open the circuit.
+        """
+        with self._lock:
+            now = self._clock()
+
+            if self.state == HALF_OPEN:
+                self._change_state(OPEN, now)
+                return
+
+            if self.state == OPEN:
+                return
+
+            self._outcomes.append((now, False))
+            self._prune(now)
+
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            if (
+                len(self._outcomes) >= self.minimum_requests
+                and failures / len(self._outcomes) >= self.failure_threshold
+            ):
+                self._change_state(OPEN, now)
+
+    def reset(self):
+        """
+        Closes the circuit and forgets every recorded outcome.
+        """
+        with self._lock:
+            self._change_state(CLOSED, self._clock())
+
+    def snapshot(self) -> dict:
+        """
+        :return: A dict of the circuit's state and counters in the current window
+        """
+        with self._lock:
+            now = self._clock()
+            self._refresh_state(now)
+            self._prune(now)
+
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+
+            return {
+                "state": self.state,
+                "seconds_in_state": round(now - self._changed_at, 3),
+                "requests_in_window": len(self._outcomes),
+                "failures_in_window": failures,
+                "opened_count": self.opened_count,
+                "rejected_count": self.rejected_count,
+            }
@@ -21,6 +21,38 @@ class Endpoint:
         can_search_by_npi=False,
         secure_connection_needed=True,
         id_prefix=None,
+        pool_limit=400,
+        pool_limit_per_host=100,
+        dns_cache_ttl=300,
+        keepalive_timeout=30.0,
+        role_lookup_concurrency=8,
+        capability_refresh_interval=3600.0,
+        max_search_pages=10,
+        page_prefetch=1,
+        breaker_failure_threshold=0.5,
+        breaker_minimum_requests=5,
+        breaker_window_seconds=60.0,
+        breaker_open_seconds=30.0,
+        default_timeout=30.0,
+        default_connect_timeout=10.0,
+        min_timeout=1.0,
+        max_timeout=120.0,
+        timeout_headroom=3.0,
+        hedge_requests=False,
+        hedge_budget_ratio=0.1,
+        hedge_budget_burst=10.0,
+        rate_limit=0.0,
+        rate_limit_burst=10.0,
+        max_in_flight=32,
+        max_retry_after=60.0,
+        max_requeues=3,
+        retry_max_attempts=3,
+        retry_backoff_base=0.2,
+        retry_backoff_max=5.0,
+        retry_jitter=0.5,
+        retry_statuses=(502, 503, 504),
+        retry_exceptions=("connection", "timeout"),
+        field_mappings=None,
     ):
         self.name = name
         self.host = host
@@ -33,6 +65,63 @@ class Endpoint:
 
         self.id_prefix = id_prefix
 
+        # Connection pool settings for the SmartClient's long-lived async session
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+
+        # Maximum number of PractitionerRole lookups in flight at once for a single search
+        self.role_lookup_concurrency = role_lookup_concurrency
+
+        # Seconds between background refreshes of the endpoint's Capability Statement
+        self.capability_refresh_interval = capability_refresh_interval
+
+        # Most pages of a search Bundle to follow, and how many may be fetched ahead of the one being parsed
+        self.max_search_pages = max_search_pages
+        self.page_prefetch = page_prefetch
+
+        # Circuit breaker, see `::fhirtypepkg.circuitbreaker.CircuitBreaker`
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_minimum_requests = breaker_minimum_requests
+        self.breaker_window_seconds = breaker_window_seconds
+        self.breaker_open_seconds = breaker_open_seconds
+
+        # Request timeouts, see `::fhirtypepkg.latency.LatencyTracker`
+        self.default_timeout = default_timeout
+        self.default_connect_timeout = default_connect_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_headroom = timeout_headroom
+
+        # Opt-in hedging of slow requests, limited to hedge_budget_ratio extra requests per request
+        self.hedge_requests = hedge_requests
+        self.hedge_budget_ratio = hedge_budget_ratio
+        self.hedge_budget_burst = hedge_budget_burst
+
+        # Requests per second (0 for no limit) and most requests in flight at once, see
+        # `::fhirtypepkg.ratelimit.RateLimiter`
+        self.rate_limit = rate_limit
+        self.rate_limit_burst = rate_limit_burst
+        self.max_in_flight = max_in_flight
+
+        # A request answered 429 is sent again after its Retry-After, at most max_requeues times and only if the
+        # endpoint asks to wait no longer than max_retry_after seconds
+        self.max_retry_after = max_retry_after
+        self.max_requeues = max_requeues
+
+        # Retries of transient failures, see `::fhirtypepkg.retry.RetryPolicy`
+        self.retry_max_attempts = retry_max_attempts
+        self.retry_backoff_base = retry_backoff_base
+        self.retry_backoff_max = retry_backoff_max
+        self.retry_jitter = retry_jitter
+        self.retry_statuses = retry_statuses
+        self.retry_exceptions = retry_exceptions
+
+        # Field mappings overriding how this endpoint's resources are flattened, by resource type then field, see
+        # `::fhirtypepkg.flatten.FIELD_MAPPINGS`
+        self.field_mappings = field_mappings or {}
+
         self.resourceType = {
             _PRACTITIONER: _PRACTITIONER,
             _PRACTITIONER_ROLE: _PRACTITIONER_ROLE,
@@ -0,0 +1,127 @@
+# Description: A long-lived event loop on a background thread, for running coroutines from synchronous code.
+import asyncio
+import os
+import threading
+
+
+class EventLoopThread:
+    """
+    Overview
+    --------
+    Runs one asyncio event loop for the life of the process on a daemon thread. Synchronous callers (e.g. Flask
+    request handlers, each on their own thread) submit coroutines to it with `run` and block for the result. Because
+    every coroutine runs on the same loop, they share the SmartClients' pooled aiohttp sessions and each other's
+    in-flight lookups, where `asyncio.run` would build and tear down a loop (and a session) per request.
+
+    The loop is started on first use. A process forked from one that had started it (e.g. a pre-forking WSGI worker)
+    starts a loop of its own, as threads do not survive a fork.
+
+    Attributes
+    -----------
+    name
+        Name of the thread the loop runs on
+    """
+
+    def __init__(self, name: str = "fhirtype-event-loop"):
+        """
+        :param name: Name of the thread the loop runs on
+        """
+        self.name = name
+
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Returns the running loop of this process, starting it if needed.
+        :return: The event loop
+        """
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(
+                    target=run_loop, name=self.name, daemon=True
+                )
+                self._thread.start()
+                started.wait()
+
+                self._loop = loop
+                self._pid = os.getpid()
+
+            return self._loop
+
+    def run(self, coroutine, timeout: float or None = None):
+        """
+        Runs the coroutine on the loop and blocks the calling thread until it finishes. Must not be called from the
+        loop's own thread.
+        :param coroutine: The coroutine to run
+        :param timeout: Seconds to wait before cancelling the coroutine, or None to wait as long as it takes
+        :return: The result of the coroutine
+        """
+        loop = self.get_loop()
+
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError(
+                "EventLoopThread.run() cannot be called from the loop's own thread, await the coroutine instead"
+            )
+
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, async_iterator, timeout: float or None = None):
+        """
+        Runs an asynchronous iterator (e.g. an async generator) on the loop and yields each of its items to the
+        calling thread as soon as it is ready, e.g. to stream a response. Closing the returned generator early (e.g.
+        because the client went away) closes the asynchronous iterator on the loop. Must not be called from the
+        loop's own thread.
+        :param async_iterator: The asynchronous iterator
+        :param timeout: Seconds to wait for each item before cancelling the iterator, or None to wait as long as it
+        takes
+        :return: A generator of the items
+        """
+
+        async def next_item():
+            return await async_iterator.__anext__()
+
+        try:
+            while True:
+                try:
+                    yield self.run(next_item(), timeout)
+                except StopAsyncIteration:
+                    return
+        finally:
+            aclose = getattr(async_iterator, "aclose", None)
+            if aclose is not None and self._loop is not None:
+                self.run(aclose())
+
+    def stop(self, timeout: float or None = None):
+        """
+        Stops the loop and waits for its thread to finish. A later `run` starts a new loop.
+        :param timeout: Seconds to wait for the thread
+        """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = self._pid = None
+
+        if loop is None or loop.is_closed():
+            return
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+        if not thread.is_alive():
+            loop.close()
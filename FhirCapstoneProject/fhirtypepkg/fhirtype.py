@@ -1,9 +1,16 @@
+import json
 import os
 from email.message import Message
 from logging import Logger
 
 from .logging_fhir import FHIRLogger
 
+# orjson is an optional, faster JSON decoder that reads bytes directly
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 _CONTENTTYPE_APPLICATION_JSON = "application/json"
 _CONTENTTYPE_APPLICATION_FHIRJSON = "application/fhir+json"
 
@@ -20,6 +27,33 @@ except AssertionError as e:
 
 _logger = FHIRLogger(logger_config_path)
 
+# Which JSON decoder upstream responses are read with: "orjson", "json", or "auto" for orjson whenever it is installed
+_json_decoder = os.environ.get("FHIRTYPE_JSON_DECODER", "auto")
+if _json_decoder == "orjson" and orjson is None:
+    _logger.logger.warning(
+        "FHIRTYPE_JSON_DECODER is orjson but orjson is not installed, using json."
+    )
+use_orjson = orjson is not None and _json_decoder in ("auto", "orjson")
+
+
+def loads_json(data: bytes or str):
+    """
+    Decodes a JSON document, straight from the bytes of a response body where possible so that the body is never
+    copied to a str first. Uses orjson when it is installed (see FHIRTYPE_JSON_DECODER), otherwise the json module.
+    orjson only reads UTF-8, so bytes in any other encoding (or with a byte order mark) are decoded to a str first.
+    :param data: The JSON document, as bytes (UTF-8, -16 or -32) or str
+    :return: The decoded document
+    """
+    if use_orjson:
+        if isinstance(data, (bytes, bytearray)):
+            encoding = json.detect_encoding(data)
+            if encoding != "utf-8":
+                data = data.decode(encoding)
+
+        return orjson.loads(data)
+
+    return json.loads(data)
+
 
 def decorate_if(_f=None, decorator=None, condition=False):
     if _f is not None:
@@ -57,6 +91,10 @@ class ExceptionNPI(Exception):
     pass
 
 
+class ExceptionCircuitOpen(Exception):
+    pass
+
+
 def parse_content_type_header(content_types: str) -> tuple[str, dict[str, str]]:
     """
     Credit to Philip Couling at https://stackoverflow.com/a/75727619
@@ -79,3 +117,22 @@ def content_type_is_json(parsed_content_type: tuple[str, dict[str, str]]):
     return content_type_is(
         parsed_content_type, _CONTENTTYPE_APPLICATION_JSON
     ) or content_type_is(parsed_content_type, _CONTENTTYPE_APPLICATION_FHIRJSON)
+
+
+def parse_cache_control_header(cache_control: str or None) -> dict[str, str or None]:
+    """
+    This function will parse a Cache-Control string into a dict of directives, directives without a value map to None
+    :param cache_control: e.g. 'public, max-age=60, must-revalidate'
+    :return: e.g. {'public': None, 'max-age': '60', 'must-revalidate': None}
+    """
+    directives = {}
+
+    if not cache_control:
+        return directives
+
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') if value else None
+
+    return directives
@@ -0,0 +1,310 @@
+# Description: Declarative mappings from the fields of FHIR JSON resources to flattened fields, compiled once into
+# accessor functions.
+import re
+
+# One step of a path: a key, then any number of selectors, e.g. "coding[system=http://nucc.org/provider-taxonomy]"
+_STEP = re.compile(r"(\$?[A-Za-z_][A-Za-z0-9_]*)((?:\[[^\]]*\])*)")
+_SELECTOR = re.compile(r"\[([^\]]*)\]")
+
+# How a field picks one value when its path finds several
+_PICKS = ("first", "last")
+
+
+def parse_path(path: str) -> tuple:
+    """
+    Parses a path to values of a JSON resource, e.g. "name[0].given[0]", "telecom[system=phone].value" or
+    "specialty[*].coding[system=http://nucc.org/provider-taxonomy].code". Each step is a key of an object, followed
+    by any number of selectors of a list: an index ([0], [-1]), every item ([*]), or every item with a key equal to
+    a value ignoring case ([system=phone]). A path starting with $name is read from the related resource of that
+    name (e.g. "$organization.name") rather than the resource itself.
+
+    :param path: The path
+    :return: A 2-tuple of (the name of the related resource or None, a list of steps), each step a tuple of
+    ("key", key), ("index", index), ("all",) or ("match", key, lowercase value)
+    :raises ValueError: If the path is malformed
+    """
+    root = None
+    steps = []
+
+    # Split on the dots that are not inside a selector, which may hold URLs
+    parts = []
+    depth = 0
+    current = ""
+    for character in path.strip():
+        if character == "[":
+            depth += 1
+        elif character == "]":
+            depth -= 1
+        if character == "." and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += character
+    parts.append(current)
+
+    for position, part in enumerate(parts):
+        match = _STEP.fullmatch(part.strip())
+        if match is None:
+            raise ValueError(f"Invalid step '{part}' in field mapping path '{path}'")
+
+        key, selectors = match.groups()
+        if key.startswith("$"):
+            if position != 0:
+                raise ValueError(
+                    f"Related resource '{key}' must start field mapping path '{path}'"
+                )
+            root = key[1:]
+        else:
+            steps.append(("key", key))
+
+        for selector in _SELECTOR.findall(selectors):
+            selector = selector.strip()
+
+            if selector == "*":
+                steps.append(("all",))
+            elif re.fullmatch(r"-?\d+", selector):
+                steps.append(("index", int(selector)))
+            elif "=" in selector:
+                key, expected = (item.strip() for item in selector.split("=", 1))
+                steps.append(("match", key, expected.lower()))
+            else:
+                raise ValueError(
+                    f"Invalid selector [{selector}] in field mapping path '{path}'"
+                )
+
+    return root, steps
+
+
+def parse_field(spec: str, transforms: dict) -> tuple or None:
+    """
+    Parses the mapping of one field, a path (see `parse_path`) followed by any number of stages, each after a "|",
+    e.g. "telecom[system=phone].value | last | phone". A stage is either a pick ("first", the default, or "last")
+    choosing one of the values the path finds, or the name of a transform in transforms applied to the value
+    picked. Values that are None are never found, and transforms are not applied to None.
+
+    :param spec: The mapping of the field, empty for a field that is always None
+    :param transforms: A dict of transform name to a function of one value
+    :return: A 4-tuple of (related resource name or None, steps, pick, transform names), or None for an empty spec
+    :raises ValueError: If the spec is malformed or names an unknown stage
+    """
+    path, *stages = (part.strip() for part in spec.split("|"))
+
+    if not path:
+        if stages:
+            raise ValueError(f"Field mapping '{spec}' has stages but no path")
+        return None
+
+    root, steps = parse_path(path)
+
+    pick = "first"
+    names = []
+    for stage in stages:
+        if stage in _PICKS:
+            if names:
+                raise ValueError(
+                    f"Pick '{stage}' must come before any transform in field mapping '{spec}'"
+                )
+            pick = stage
+        elif stage in transforms:
+            names.append(stage)
+        else:
+            raise ValueError(f"Unknown stage '{stage}' in field mapping '{spec}'")
+
+    return root, steps, pick, names
+
+
+def _step_source(node: str, step: tuple) -> str:
+    # An expression of the value a key or index step finds from `node`, None if there is none
+    if step[0] == "key":
+        return f"{node}.get({step[1]!r}) if type({node}) is dict else None"
+
+    length = (
+        f"len({node}) > {step[1]}" if step[1] >= 0 else f"len({node}) >= {-step[1]}"
+    )
+    return f"{node}[{step[1]}] if type({node}) is list and {length} else None"
+
+
+def _loop_source(output: str, node: str, steps: list, pick: str) -> list:
+    # Lines setting `output` to the value the steps, starting with a list selector, find from `node`. Each list
+    # selector becomes a loop which, for the first value, is broken out of once it is found.
+    lines = []
+
+    def emit(depth: int, node: str, indent: str, in_loop: bool, is_dict: bool):
+        if depth == len(steps):
+            lines.append(f"{indent}if {node} is not None:")
+            lines.append(f"{indent}    {output} = {node}")
+            if pick == "first" and in_loop:
+                lines.append(f"{indent}    break")
+            return
+
+        step = steps[depth]
+        found = f"{output}_{depth}"
+
+        if step[0] == "key" and is_dict:
+            lines.append(f"{indent}{found} = {node}.get({step[1]!r})")
+            emit(depth + 1, found, indent, in_loop, False)
+        elif step[0] in ("key", "index"):
+            lines.append(f"{indent}{found} = {_step_source(node, step)}")
+            emit(depth + 1, found, indent, in_loop, False)
+        else:
+            lines.append(f"{indent}if type({node}) is list:")
+            lines.append(f"{indent}    for {found} in {node}:")
+            if step[0] == "all":
+                emit(depth + 1, found, indent + "        ", True, False)
+            else:
+                key, expected = step[1], step[2]
+                lines.append(
+                    f"{indent}        if type({found}) is dict and type({found}.get({key!r})) is str "
+                    f"and {found}[{key!r}].lower() == {expected!r}:"
+                )
+                emit(depth + 1, found, indent + "            ", True, True)
+
+            if pick == "first" and in_loop:
+                lines.append(f"{indent}    if {output} is not None:")
+                lines.append(f"{indent}        break")
+
+    emit(0, node, "", False, False)
+
+    return lines
+
+
+def compile_mapping(resource_type: str, fields: dict, transforms: dict):
+    """
+    Compiles the mappings of every field of one resource type (see `parse_field`) into a single function flattening
+    such a resource. The function is generated with each path written out as the dict lookups and loops it stands
+    for, and with the steps that fields have in common (e.g. "name[0]") taken once, so that flattening a resource
+    neither interprets the mapping nor probes the resource for attributes.
+
+    :param resource_type: The type of resource the mapping is for, e.g. "Location"
+    :param fields: A dict of flattened field name to its mapping, in the order of the output
+    :param transforms: A dict of transform name to a function of one value
+    :return: A function of (resource, related=None) returning a dict of the flattened fields, where resource is a
+    JSON Object and related is a dict of the related resources paths may start from (e.g. {"organization": ...}).
+    It is named flatten_<type>_mapping.
+    :raises ValueError: If a mapping is malformed
+    """
+    name = (
+        "flatten_" + re.sub(r"(?<!^)(?=[A-Z])", "_", resource_type).lower() + "_mapping"
+    )
+
+    namespace = {}
+    transform_names = {}
+    body = []
+    outputs = []
+
+    # The variable holding the value at each (root, steps) that has been taken, None if there is none
+    values = {}
+
+    def value_at(root: str or None, steps: tuple) -> str:
+        if (root, steps) in values:
+            return values[(root, steps)]
+
+        if not steps:
+            if root is None:
+                return "resource"
+            line = f"related.get({root!r}) if related else None"
+        elif root is None and len(steps) == 1 and steps[0][0] == "key":
+            line = f"resource.get({steps[0][1]!r})"
+        else:
+            line = _step_source(value_at(root, steps[:-1]), steps[-1])
+
+        variable = f"value_{len(values)}"
+        body.append(f"{variable} = {line}")
+
+        values[(root, steps)] = variable
+        return variable
+
+    for index, spec in enumerate(fields.values()):
+        parsed = parse_field(spec, transforms)
+        if parsed is None:
+            outputs.append("None")
+            continue
+
+        root, steps, pick, names = parsed
+
+        # The steps up to the first list selector find at most one value, and are shared with other fields
+        loop = next(
+            (
+                position
+                for position, step in enumerate(steps)
+                if step[0] in ("all", "match")
+            ),
+            len(steps),
+        )
+        output = value_at(root, tuple(steps[:loop]))
+
+        if loop < len(steps):
+            node, output = output, f"field_{index}"
+            body.append(f"{output} = None")
+            body.extend(_loop_source(output, node, steps[loop:], pick))
+
+        if names:
+            if not output.startswith("field_"):
+                body.append(f"field_{index} = {output}")
+                output = f"field_{index}"
+
+            for transform in names:
+                if transform not in transform_names:
+                    transform_names[transform] = f"_transform_{len(transform_names)}"
+                    namespace[transform_names[transform]] = transforms[transform]
+
+                body.append(f"if {output} is not None:")
+                body.append(f"    {output} = {transform_names[transform]}({output})")
+
+        outputs.append(output)
+
+    body.append(
+        "return {%s}"
+        % ", ".join(f"{field!r}: {output}" for field, output in zip(fields, outputs))
+    )
+
+    source = f"def {name}(resource, related=None):\n" + "".join(
+        f"    {line}\n" for line in body
+    )
+    exec(compile(source, f"<field mapping of {resource_type}>", "exec"), namespace)
+
+    return namespace[name]
+
+
+def merge_mappings(defaults: dict, overrides: dict or None) -> dict:
+    """
+    Overrides some field mappings of some resource types. Resource types and fields are matched ignoring case (as
+    the options of an .ini file are lowercase) and take the spelling of the defaults. Only the fields a resource
+    type has among the defaults may be overridden, so that every field is still flattened from one resource type.
+
+    :param defaults: A dict of resource type to a dict of field name to mapping
+    :param overrides: The same, for the fields to override, or None
+    :return: A new dict of resource type to a dict of field name to mapping
+    :raises ValueError: If an override names a resource type, or a field of a resource type, the defaults do not have
+    """
+    merged = {resource_type: dict(fields) for resource_type, fields in defaults.items()}
+    resource_types = {resource_type.lower(): resource_type for resource_type in merged}
+
+    for resource_type, fields in (overrides or {}).items():
+        if resource_type.lower() not in resource_types:
+            raise ValueError(
+                f"Unknown resource type '{resource_type}' in field mappings, expected one of "
+                + ", ".join(merged)
+            )
+        resource_type = resource_types[resource_type.lower()]
+        target = merged[resource_type]
+        names = {name.lower(): name for name in target}
+
+        for name, spec in fields.items():
+            if name.lower() not in names:
+                owner = next(
+                    (
+                        other
+                        for other, other_fields in defaults.items()
+                        if name.lower() in (known.lower() for known in other_fields)
+                    ),
+                    None,
+                )
+                raise ValueError(
+                    f"Field '{name}' is not flattened from {resource_type}"
+                    + (f" but from {owner}" if owner else "")
+                    + ", so it cannot be mapped there"
+                )
+            target[names[name.lower()]] = spec
+
+    return merged
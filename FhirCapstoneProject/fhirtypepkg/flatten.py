@@ -1,12 +1,19 @@
+import collections
+import functools
+import os
 import re
 from datetime import datetime, timezone
 from typing import List, Dict, Any
 from typing import Optional
 
+import isodate
 from fhirclient.models.domainresource import DomainResource
 from pydantic import BaseModel
 
+from FhirCapstoneProject.fhirtypepkg.cache import TTLCache
 from FhirCapstoneProject.fhirtypepkg.fhirtype import ExceptionNPI
+from FhirCapstoneProject.fhirtypepkg.fieldmap import compile_mapping
+from FhirCapstoneProject.fhirtypepkg.fieldmap import merge_mappings
 
 
 def validate_npi(npi: str) -> str:
@@ -199,14 +206,15 @@ def get_address(address_obj, sub_attr: str = None):
     if address_obj:
         address = address_obj[0]  # assumption made here
         if address.text:
+            parts = address.text.split(",")
             if sub_attr == "street":
-                return address.text.split(",")[0]
+                return parts[0]
             elif sub_attr == "city":
-                return address.text.split(",")[1]
+                return parts[1]
             elif sub_attr == "state":
-                return address.text.split(",")[2]
+                return parts[2]
             elif sub_attr == "zip":
-                return address.text.split(",")[3]
+                return parts[3]
     return None
 
 
@@ -474,6 +482,463 @@ def flatten_loc(resource: DomainResource):
     }
 
 
+# Whether every record is validated by StandardProcessModel (pydantic) rather than only converted by
+# PractitionerRecord, which leaves to pydantic only the values that do not already have (or trivially convert to)
+# the type of their field
+strict_records = os.environ.get("FHIRTYPE_STRICT_RECORDS") == "1"
+
+# Flattened fields of each Practitioner, PractitionerRole and Location, shared by every request and keyed by the
+# endpoint and the resource's type, id and version, so that a resource is flattened again only once it changes
+fragment_cache = TTLCache(
+    maxsize=int(os.environ.get("FHIRTYPE_FRAGMENT_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("FHIRTYPE_FRAGMENT_CACHE_TTL", 900)),
+)
+
+_NPI_SYSTEM = "http://hl7.org/fhir/sid/us-npi"
+_TAXONOMY_SYSTEM = "http://nucc.org/provider-taxonomy"
+
+
+@functools.lru_cache(maxsize=4096)
+def json_isostring(value: str) -> str or None:
+    """
+    Normalizes a FHIR date or dateTime string exactly as `fhirclient.models.fhirdate.FHIRDate.isostring` does, so
+    that records flattened from JSON carry the same timestamps as those flattened from fhirclient models.
+
+    Parameters:
+    :param value: The date or dateTime string, e.g. a `meta.lastUpdated`
+    :type value: str
+
+    Returns:
+    :return: The normalized ISO 8601 string, or None if it could not be parsed.
+    :rtype: str
+    """
+    try:
+        if "T" in value:
+            return isodate.datetime_isoformat(isodate.parse_datetime(value))
+        return isodate.date_isoformat(isodate.parse_date(value))
+    except Exception:
+        return None
+
+
+def _full_name(name: dict) -> str or None:
+    # "FAMILY, GIVEN GIVEN" of a HumanName, as `get_name(resource, "full")` gives it
+    family = name.get("family", None)
+    if not family:
+        return None
+
+    given = name.get("given", None)
+    return family + ", " + " ".join(given) if given else family
+
+
+# Transforms the field mappings may apply, by name, see `::fhirtypepkg.fieldmap.compile_mapping`
+FIELD_TRANSFORMS = {
+    "capitalize": lambda value: value.capitalize() or None,
+    "first_word": lambda value: re.split(r"[^a-zA-Z]", value)[0],
+    "full_name": _full_name,
+    "isostring": lambda value: json_isostring(value) if value else None,
+    "lower": lambda value: value.lower(),
+    "npi": validate_npi,
+    "phone": standardize_phone_number,
+    "spaces": lambda value: value.replace("_", " ") or None,
+    "upper": lambda value: value.upper(),
+}
+
+# How the fields of each resource type are flattened from its JSON, see `::fhirtypepkg.fieldmap.compile_mapping`.
+# An endpoint may override a field with a `map.<resource type>.<field>` option in ServerEndpoints.ini.
+FIELD_MAPPINGS = {
+    "Practitioner": {
+        "FullName": "name[0] | full_name",
+        "NPI": "identifier[system=" + _NPI_SYSTEM + "].value | npi",
+        "FirstName": "name[0].given[0] | first_word | capitalize",
+        "LastName": "name[0].family | capitalize",
+        "Gender": "gender | capitalize",
+        "LastPracUpdate": "meta.lastUpdated | isostring",
+    },
+    "PractitionerRole": {
+        "GroupName": "$organization.name | spaces",
+        "Taxonomy": "specialty[*].coding[system=" + _TAXONOMY_SYSTEM + "].code",
+        "LastPracRoleUpdate": "meta.lastUpdated | isostring",
+    },
+    "Location": {
+        "ADD1": "address.line[0]",
+        "ADD2": "",
+        "City": "address.city",
+        "State": "address.state",
+        "Zip": "address.postalCode",
+        "Phone": "telecom[system=phone].value | last | phone",
+        "Fax": "telecom[system=fax].value | last | phone",
+        "Email": "telecom[system=email].value | last",
+        "lat": "position.latitude",
+        "lng": "position.longitude",
+        "LastLocationUpdate": "meta.lastUpdated | isostring",
+    },
+}
+
+
+def compile_field_mappings(overrides: dict or None = None) -> Dict[str, Any]:
+    """
+    Compiles FIELD_MAPPINGS, with the given fields overridden, into one flattening function per resource type.
+
+    Parameters:
+    :param overrides: A dict of resource type to a dict of field name to mapping, or None.
+    :type overrides: dict
+
+    Returns:
+    :return: A dict of resource type to a function of (resource, related=None) returning its flattened fields.
+    :rtype: dict
+
+    Raises:
+    :raises ValueError: If a mapping is malformed.
+    """
+    return {
+        resource_type: compile_mapping(resource_type, fields, FIELD_TRANSFORMS)
+        for resource_type, fields in merge_mappings(FIELD_MAPPINGS, overrides).items()
+    }
+
+
+_default_flatteners = compile_field_mappings()
+
+# The compiled field mappings of each endpoint (by name) that overrides some, see `register_field_mappings`
+_endpoint_flatteners = {}
+
+
+def register_field_mappings(endpoint: str, overrides: dict or None) -> None:
+    """
+    Compiles the field mappings of an endpoint once, for every record flattened from it afterwards.
+
+    Parameters:
+    :param endpoint: The name of the endpoint.
+    :type endpoint: str
+    :param overrides: A dict of resource type to a dict of field name to mapping, or None for the defaults.
+    :type overrides: dict
+
+    Raises:
+    :raises ValueError: If a mapping is malformed, or names a resource type or field FIELD_MAPPINGS does not have
+    for it.
+    """
+    if not overrides:
+        _endpoint_flatteners.pop(endpoint, None)
+        return
+
+    try:
+        flatteners = compile_field_mappings(overrides)
+    except ValueError as e:
+        raise ValueError(f"Invalid field mappings of endpoint {endpoint}: {e}") from e
+
+    _endpoint_flatteners[endpoint] = flatteners
+
+    # Fragments flattened with the mappings it had before
+    fragment_cache.clear()
+
+
+def field_flatteners(endpoint: str) -> Dict[str, Any]:
+    """
+    Returns:
+    :return: A dict of resource type to the compiled function flattening it, for the given endpoint.
+    :rtype: dict
+    """
+    return _endpoint_flatteners.get(endpoint, _default_flatteners)
+
+
+def flatten_prac_json(resource: dict):
+    """
+    Flattens a practitioner JSON resource into a dictionary with the same keys and values as `flatten_prac` would
+    give for the fhirclient model of it, without building the model. Where `flatten_prac` would raise on an
+    incomplete resource (e.g. a name without a family), the affected keys are None instead.
+
+    Parameters:
+    :param resource: JSON Object of a Practitioner.
+    :type resource: dict
+
+    Returns:
+    :return: A dictionary with flattened practitioner attributes.
+    :rtype: dict
+    """
+    return _default_flatteners["Practitioner"](resource)
+
+
+def flatten_role_json(resource: dict, organization: dict or None = None):
+    """
+    Flattens a practitioner role JSON resource into a dictionary with the same keys and values as `flatten_role`
+    would give for the fhirclient model of it, without building the model.
+
+    Parameters:
+    :param resource: JSON Object of a PractitionerRole.
+    :type resource: dict
+    :param organization: JSON Object of the Organization the role references, or None if it was not resolved.
+    :type organization: dict
+
+    Returns:
+    :return: A dictionary with flattened role attributes.
+    :rtype: dict
+    """
+    return _default_flatteners["PractitionerRole"](
+        resource, {"organization": organization}
+    )
+
+
+def flatten_loc_json(resource: dict):
+    """
+    Flattens a location JSON resource into a dictionary with the same keys and values as `flatten_loc` would give
+    for the fhirclient model of it, without building the model.
+
+    Parameters:
+    :param resource: JSON Object of a Location.
+    :type resource: dict
+
+    Returns:
+    :return: A dictionary with flattened location attributes.
+    :rtype: dict
+    """
+    return _default_flatteners["Location"](resource)
+
+
+def standardize_record(combined: dict, trusted: bool = False) -> Dict[str, Any]:
+    """
+    Builds the record `StandardProcessModel(**combined).model_dump()` would. Unless strict_records is set (with
+    FHIRTYPE_STRICT_RECORDS=1), the values are converted by `PractitionerRecord.from_fields`, which only validates
+    them through pydantic when one has a type it does not expect.
+
+    Parameters:
+    :param combined: The metadata and flattened fields of one record.
+    :type combined: dict
+    :param trusted: Whether the text fields were flattened from fhirclient models, which have already checked them.
+    :type trusted: bool
+
+    Returns:
+    :return: The record, with every field of StandardProcessModel in order.
+    :rtype: dict
+
+    Raises:
+    :raises ValueError: If a value does not convert to the type of its field.
+    """
+    if strict_records:
+        return StandardProcessModel(**combined).model_dump()
+
+    return PractitionerRecord.from_fields(combined, trusted).to_dict()
+
+
+def resource_version(resource) -> tuple:
+    """
+    Identifies a version of a resource, given either as a JSON Object or as a fhirclient model.
+
+    Parameters:
+    :param resource: The resource, or None.
+
+    Returns:
+    :return: A 3-tuple of (resourceType, id, version), where version is meta.versionId, or meta.lastUpdated if
+    there is none. Any of them may be None.
+    :rtype: tuple
+    """
+    if resource is None:
+        return None, None, None
+
+    if isinstance(resource, dict):
+        meta = resource.get("meta", None) or {}
+        return (
+            resource.get("resourceType", None),
+            resource.get("id", None),
+            meta.get("versionId", None) or meta.get("lastUpdated", None),
+        )
+
+    meta = getattr(resource, "meta", None)
+    version = None
+    if meta is not None:
+        version = getattr(meta, "versionId", None)
+        if version is None and getattr(meta, "lastUpdated", None) is not None:
+            version = meta.lastUpdated.as_json()
+
+    return (
+        getattr(resource, "resource_type", None),
+        getattr(resource, "id", None),
+        version,
+    )
+
+
+def flatten_fragment(
+    endpoint: str, flatten, resource, *args, depends_on=None
+) -> Dict[str, Any]:
+    """
+    Flattens a resource with the given function through fragment_cache, so that the same version of a resource
+    from the same endpoint is flattened once however many records (and requests) it is part of. A resource
+    without an id or a version (meta.versionId or meta.lastUpdated) is always flattened anew. The fragment is
+    shared, it must not be changed.
+
+    Parameters:
+    :param endpoint: The name of the endpoint the resource came from.
+    :type endpoint: str
+    :param flatten: The function flattening the resource, e.g. flatten_prac_json.
+    :param resource: The resource, as a JSON Object or a fhirclient model.
+    :param args: Further arguments of flatten.
+    :param depends_on: Another resource the fragment is flattened from (e.g. a role's organization), or None.
+
+    Returns:
+    :return: The flattened fields of the resource.
+    :rtype: dict
+    """
+    resource_type, _id, version = resource_version(resource)
+    if _id is None or version is None:
+        return flatten(resource, *args)
+
+    dependency = resource_version(depends_on)
+    if dependency[1] is not None and dependency[2] is None:
+        return flatten(resource, *args)
+
+    key = (endpoint, flatten.__name__, resource_type, _id, version, dependency)
+
+    fragment = fragment_cache.get(key, None)
+    if fragment is None:
+        fragment = flatten(resource, *args)
+        fragment_cache.set(key, fragment)
+
+    return fragment
+
+
+def role_locations_json(role: dict, resolved: dict) -> list:
+    """
+    Picks out the Locations of a PractitionerRole JSON resource, each at most once, as
+    `::fhirtypepkg.client.SmartClient.find_practitioner_role_locations` does for the fhirclient model of it.
+
+    Parameters:
+    :param role: JSON Object of a PractitionerRole.
+    :type role: dict
+    :param resolved: A dict of reference string to the JSON Object it resolved to.
+    :type resolved: dict
+
+    Returns:
+    :return: A list of Location JSON Objects, empty for any reference that could not be resolved.
+    :rtype: list
+
+    Raises:
+    :raises ValueError: If the role has no locations.
+    """
+    if not role.get("location", None):
+        raise ValueError(
+            f"No location available in practitioner role prac-id: {role.get('id', None)}"
+        )
+
+    locations = []
+    seen_loc = set()
+    for role_location in role["location"]:
+        location = resolved.get(role_location.get("reference", None), None) or {}
+        if location.get("id", None) not in seen_loc:
+            seen_loc.add(location.get("id", None))
+            locations.append(location)
+
+    return locations
+
+
+def flatten_practitioners_json(
+    endpoint: str, practitioners: list, roles: list, resolved: dict
+) -> List[Dict[str, Any]]:
+    """
+    Flattens every (practitioner, role, location) of the given JSON resources into records. This is the model-free
+    counterpart of flattening fhirclient models with `FlattenSmartOnFHIRObject` one record at a time, and gives the
+    same records, but never builds a model. The given JSON Objects are only read, never changed, so they may be
+    shared (e.g. with a cache).
+
+    Parameters:
+    :param endpoint: The name of the endpoint the resources came from.
+    :type endpoint: str
+    :param practitioners: JSON Objects of the Practitioners.
+    :type practitioners: list
+    :param roles: JSON Objects of their PractitionerRoles.
+    :type roles: list
+    :param resolved: A dict of reference string to the JSON Object it resolved to, for the roles' locations and
+    organizations.
+    :type resolved: dict
+
+    Returns:
+    :return: A list of flattened records.
+    :rtype: list
+    """
+    metadata = {
+        "Endpoint": endpoint,
+        "DateRetrieved": datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+        + "Z",
+        "Accuracy": -1.0,
+    }
+    records = []
+    flatteners = field_flatteners(endpoint)
+
+    # id() of each Location to its flattened fields, as roles share locations
+    locations = {}
+
+    for practitioner in practitioners:
+        prac_data = flatten_fragment(endpoint, flatteners["Practitioner"], practitioner)
+
+        for role in roles:
+            # Match roles to current practitioner
+            reference = (role.get("practitioner", None) or {}).get("reference", None)
+            if reference is None or "/" not in reference:
+                continue
+
+            if reference.split("/")[1] != practitioner.get("id", None):
+                continue
+
+            organization_reference = (role.get("organization", None) or {}).get(
+                "reference", None
+            )
+            organization = resolved.get(organization_reference, None)
+            role_data = flatten_fragment(
+                endpoint,
+                flatteners["PractitionerRole"],
+                role,
+                {"organization": organization},
+                depends_on=organization,
+            )
+
+            for location in role_locations_json(role, resolved):
+                # The Location is kept alongside, so that its id() is not reused
+                _, loc_data = locations.get(id(location), (None, None))
+                if loc_data is None:
+                    loc_data = flatten_fragment(
+                        endpoint, flatteners["Location"], location
+                    )
+                    locations[id(location)] = (location, loc_data)
+
+                records.append(
+                    standardize_record(
+                        combine_fragments(metadata, prac_data, role_data, loc_data)
+                    )
+                )
+
+    return records
+
+
+def combine_fragments(*fragments: dict) -> Dict[str, Any]:
+    """
+    Combines the fragments of one record (e.g. the metadata and the flattened practitioner, role and location) into
+    the dict `standardize_record` takes. Fields no fragment has are left out, and so None in the record.
+
+    Parameters:
+    :param fragments: Dicts of field to value, which together make up the record.
+    :type fragments: dict
+
+    Returns:
+    :return: The fields of every fragment.
+    :rtype: dict
+
+    Raises:
+    :raises ValueError: If a fragment has a key that is not a field of a record, or that another fragment also has.
+    """
+    combined = {}
+    covered = 0
+    for fragment in fragments:
+        combined.update(fragment)
+        covered += len(fragment)
+
+    if not combined.keys() <= _RECORD_FIELD_SET:
+        raise ValueError(
+            f"{sorted(combined.keys() - _RECORD_FIELD_SET)} are not fields of a record"
+        )
+
+    if len(combined) != covered:
+        raise ValueError("A field is given by more than one fragment of a record")
+
+    return combined
+
+
 class FlattenSmartOnFHIRObject:
     """
     Deserializes SmartOnFHIR Objects into a structured JSON format.
@@ -535,27 +1000,80 @@ class FlattenSmartOnFHIRObject:
         # Initialize a temporary data holder as defaultdict to handle missing keys smoothly
         combined_data = defaultdict(lambda: None, **self.metadata)
 
+        endpoint = self.metadata["Endpoint"]
+
         # Flatten the practitioner object if it exists
         if self.prac_obj:
-            prac_data = flatten_prac(resource=self.prac_obj)
+            prac_data = flatten_fragment(endpoint, flatten_prac, self.prac_obj)
             for key, value in prac_data.items():
                 combined_data[key] = value
 
         # Flatten roles and collect necessary data
         if self.prac_role_obj:
             for role in self.prac_role_obj:
-                role_data = flatten_role(resource=role)
+                role_data = flatten_fragment(
+                    endpoint,
+                    flatten_role,
+                    role,
+                    depends_on=getattr(role, "organization", None),
+                )
                 for key, value in role_data.items():
                     combined_data[key] = value
 
         # Flatten the locations
         if self.prac_loc_obj:
             for loc in self.prac_loc_obj:
-                loc_data = flatten_loc(resource=loc)
+                loc_data = flatten_fragment(endpoint, flatten_loc, loc)
                 for key, value in loc_data.items():
                     combined_data[key] = value
 
-        self.flatten_data = StandardProcessModel(**combined_data).model_dump()
+        self.flatten_data = standardize_record(combined_data, trusted=True)
+
+    def flatten_batch(self, triples: list) -> List[Dict[str, Any]]:
+        """
+        Flattens many (practitioner, role, location) FHIR Client objects at once, giving the records `flatten_all`
+        would give for each triple on its own, with this object's metadata. Practitioners, roles and
+        locations shared by several triples are flattened once, and versioned ones are taken from fragment_cache
+        (see `flatten_fragment`).
+
+        Parameters:
+        :param triples: A list of 3-tuples of (practitioner, role, location) objects.
+        :type triples: list
+
+        Returns:
+        :return: A list of flattened records.
+        :rtype: list
+        """
+        endpoint = self.metadata["Endpoint"]
+        flattened = {}  # id() of each object to its flattened fields
+
+        def flatten_once(resource, flatten, depends_on=None) -> dict:
+            if not resource:
+                return {}
+
+            # The object is kept alongside, so that its id() is not reused
+            _, data = flattened.get(id(resource), (None, None))
+            if data is None:
+                data = flatten_fragment(
+                    endpoint, flatten, resource, depends_on=depends_on
+                )
+                flattened[id(resource)] = (resource, data)
+            return data
+
+        return [
+            standardize_record(
+                combine_fragments(
+                    self.metadata,
+                    flatten_once(practitioner, flatten_prac),
+                    flatten_once(
+                        role, flatten_role, getattr(role, "organization", None)
+                    ),
+                    flatten_once(location, flatten_loc),
+                ),
+                trusted=True,
+            )
+            for practitioner, role, location in triples
+        ]
 
     def get_flattened_data(self) -> Dict[str, Any]:
         """
@@ -630,3 +1148,131 @@ class StandardProcessModel(BaseModel):
     lat: Optional[float] = None
     lng: Optional[float] = None
     LastLocationUpdate: Optional[str] = None
+
+
+def _to_int(value):
+    # The int pydantic would make of an int or a string of ASCII digits, any other value is left to pydantic
+    if value is None or type(value) is int:
+        return value
+    if type(value) is str and value.isascii() and value.isdigit():
+        return int(value)
+    raise TypeError(value)
+
+
+def _to_float(value):
+    # The float pydantic would make of a float or an int, any other value is left to pydantic
+    if value is None or type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    raise TypeError(value)
+
+
+def _to_str(value):
+    if value is None or type(value) is str:
+        return value
+    raise TypeError(value)
+
+
+def _as_is(value):
+    return value
+
+
+# The fields of a record in order, and the function converting a value of each to the field's type (raising
+# TypeError for a value it leaves to pydantic), compiled once from the annotations of StandardProcessModel
+_RECORD_FIELDS = tuple(StandardProcessModel.model_fields)
+_RECORD_FIELD_SET = frozenset(_RECORD_FIELDS)
+_RECORD_CONVERTERS = tuple(
+    (
+        _to_int
+        if field.annotation == Optional[int]
+        else _to_float if field.annotation == Optional[float] else _to_str
+    )
+    for field in StandardProcessModel.model_fields.values()
+)
+
+# The same, for values flattened from fhirclient models, whose text has already been checked
+_TRUSTED_RECORD_CONVERTERS = tuple(
+    _as_is if convert is _to_str else convert for convert in _RECORD_CONVERTERS
+)
+
+
+class PractitionerRecord(collections.namedtuple("PractitionerRecord", _RECORD_FIELDS)):
+    """
+    A flattened record with the fields of StandardProcessModel, kept as a tuple (with no per-record __dict__) rather
+    than a pydantic model. Values are converted to the type of their field by `from_fields`, which leaves only those
+    of a type it does not expect to StandardProcessModel, while it stays available to validate any record with
+    `validate`.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_fields(cls, combined: dict, trusted: bool = False) -> "PractitionerRecord":
+        """
+        Parameters:
+        :param combined: The metadata and flattened fields of one record, missing fields are None.
+        :type combined: dict
+        :param trusted: Whether the text fields were flattened from fhirclient models, which have already checked
+        them, so that they are taken as they are.
+        :type trusted: bool
+
+        Returns:
+        :return: The record, with every value converted to the type of its field.
+        :rtype: PractitionerRecord
+
+        Raises:
+        :raises ValueError: If a value does not convert to the type of its field.
+        """
+        try:
+            return (_build_trusted_record if trusted else _build_record)(combined.get)
+        except TypeError:
+            return cls._make(StandardProcessModel(**combined).model_dump().values())
+
+    def validate(self) -> "PractitionerRecord":
+        """
+        Returns:
+        :return: The record as validated, and converted, by StandardProcessModel.
+        :rtype: PractitionerRecord
+
+        Raises:
+        :raises ValueError: If pydantic rejects the record.
+        """
+        return self._make(StandardProcessModel(**self.to_dict()).model_dump().values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns:
+        :return: The record as `StandardProcessModel.model_dump` would give it.
+        :rtype: dict
+        """
+        return dict(zip(self._fields, self))
+
+
+def _compile_record_builder(record_converters: tuple):
+    # Generates the function building a PractitionerRecord from the `get` of a dict, with each field's conversion
+    # written out (and none for values taken as they are), rather than looped over for every record
+    converters = {
+        _to_int: "_to_int",
+        _to_float: "_to_float",
+        _to_str: "_to_str",
+        _as_is: "",
+    }
+    source = "def build(get):\n    return _make((%s))\n" % ", ".join(
+        "%s(get(%r))" % (converters[convert], field)
+        for field, convert in zip(_RECORD_FIELDS, record_converters)
+    )
+
+    namespace = {
+        "_make": PractitionerRecord._make,
+        "_to_int": _to_int,
+        "_to_float": _to_float,
+        "_to_str": _to_str,
+    }
+    exec(compile(source, "<PractitionerRecord builder>", "exec"), namespace)
+
+    return namespace["build"]
+
+
+_build_record = _compile_record_builder(_RECORD_CONVERTERS)
+_build_trusted_record = _compile_record_builder(_TRUSTED_RECORD_CONVERTERS)
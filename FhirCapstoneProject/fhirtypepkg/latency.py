@@ -0,0 +1,367 @@
+# Description: Rolling latency histograms per endpoint and operation, and the request timeouts derived from them.
+import contextlib
+import contextvars
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+PRACTITIONER = "practitioner"
+ROLE = "role"
+REFERENCE = "reference"
+CONNECT = "connect"
+OTHER = "other"
+
+# The operation the current request is made for, set with `operation` and read wherever a request is sent
+current_operation = contextvars.ContextVar("current_operation", default=OTHER)
+
+# Upper bounds, in seconds, of the histogram buckets: 5ms to ~2min, each about 41% wider than the last
+_BUCKET_BOUNDS = tuple(0.005 * 2 ** (i / 2) for i in range(30))
+
+
+@contextlib.contextmanager
+def operation(name: str):
+    """
+    Attributes every request sent inside the block (including from tasks and threads it starts) to the named
+    operation, e.g. `with operation(PRACTITIONER): ...`
+    :param name: One of PRACTITIONER, ROLE, REFERENCE or OTHER
+    """
+    token = current_operation.set(name)
+    try:
+        yield
+    finally:
+        current_operation.reset(token)
+
+
+class LatencyHistogram:
+    """
+    Overview
+    --------
+    A histogram of latencies over a rolling window. Samples are counted in the current window, once it is
+    `window_seconds` old it becomes the previous window and a new one starts. Percentiles are taken over both, so
+    they always cover between one and two windows of samples.
+    """
+
+    def __init__(self, window_seconds: float = 300.0, clock=time.monotonic):
+        """
+        :param window_seconds: Seconds each window counts samples for
+        :param clock: Function returning the current time in seconds, monotonic by default
+        """
+        self.window_seconds = window_seconds
+        self._clock = clock
+
+        # One count per bucket, and one more for samples beyond the last bound
+        self._current = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self._previous = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self._window_started = self._clock()
+
+    def _rotate(self):
+        now = self._clock()
+        elapsed = now - self._window_started
+
+        if elapsed >= self.window_seconds:
+            # Anything older than the last window is dropped altogether
+            if elapsed >= 2 * self.window_seconds:
+                self._previous = [0] * len(self._current)
+            else:
+                self._previous = self._current
+            self._current = [0] * len(self._previous)
+            self._window_started = now
+
+    def _counts(self) -> list:
+        self._rotate()
+        return [a + b for a, b in zip(self._current, self._previous)]
+
+    def record(self, seconds: float):
+        """
+        Counts one sample.
+        :param seconds: The latency of the sample
+        """
+        self._rotate()
+
+        for i, bound in enumerate(_BUCKET_BOUNDS):
+            if seconds <= bound:
+                self._current[i] += 1
+                return
+
+        self._current[-1] += 1
+
+    def count(self) -> int:
+        """
+        :return: The number of samples in the rolling window
+        """
+        return sum(self._counts())
+
+    def percentile(self, q: float) -> float or None:
+        """
+        :param q: The percentile, from 0 to 1 (e.g. 0.99)
+        :return: The upper bound of the bucket that holds the percentile, or None if there are no samples
+        """
+        counts = self._counts()
+        total = sum(counts)
+
+        if total == 0:
+            return None
+
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= q * total:
+                return _BUCKET_BOUNDS[min(i, len(_BUCKET_BOUNDS) - 1)]
+
+        return _BUCKET_BOUNDS[-1]
+
+    def snapshot(self) -> dict:
+        """
+        :return: A dict of the sample count, common percentiles and the cumulative count under each bucket bound
+        """
+        counts = self._counts()
+
+        buckets = []
+        cumulative = 0
+        for bound, bucket_count in zip(_BUCKET_BOUNDS + ("+Inf",), counts):
+            cumulative += bucket_count
+            buckets.append({"le": bound, "count": cumulative})
+
+        return {
+            "count": cumulative,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": buckets,
+        }
+
+
+class LatencyTracker:
+    """
+    Overview
+    --------
+    Keeps a `LatencyHistogram` for each operation against one endpoint and derives its request timeouts from them.
+    An operation's timeout is its observed p99 with some headroom, kept between `min_timeout` and `max_timeout`, so
+    slow outliers are cut off while an endpoint that is always slow keeps a timeout that suits it. Until an operation
+    has `min_samples` samples, its timeout is the default.
+
+    Attributes
+    -----------
+    default_timeout
+        Seconds to wait for a response before there are enough samples
+
+    default_connect_timeout
+        Seconds to wait for a new connection before there are enough samples
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 30.0,
+        default_connect_timeout: float = 10.0,
+        min_timeout: float = 1.0,
+        max_timeout: float = 120.0,
+        headroom: float = 3.0,
+        timeout_percentile: float = 0.99,
+        min_samples: int = 20,
+        window_seconds: float = 300.0,
+        clock=time.monotonic,
+    ):
+        """
+        :param default_timeout: Seconds to wait for a response before there are enough samples
+        :param default_connect_timeout: Seconds to wait for a new connection before there are enough samples
+        :param min_timeout: Fewest seconds a derived timeout may be
+        :param max_timeout: Most seconds a derived timeout may be
+        :param headroom: Multiple of the percentile that a derived timeout allows
+        :param timeout_percentile: The percentile, from 0 to 1, timeouts are derived from
+        :param min_samples: Fewest samples an operation needs before its timeout is derived
+        :param window_seconds: Seconds each histogram window counts samples for
+        :param clock: Function returning the current time in seconds, monotonic by default
+        """
+        self.default_timeout = default_timeout
+        self.default_connect_timeout = default_connect_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.headroom = headroom
+        self.timeout_percentile = timeout_percentile
+        self.min_samples = min_samples
+        self.window_seconds = window_seconds
+        self._clock = clock
+
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation_name: str, seconds: float):
+        """
+        Counts the latency of one request that the endpoint answered.
+        :param operation_name: The operation the request was made for
+        :param seconds: The latency of the request
+        """
+        with self._lock:
+            histogram = self._histograms.get(operation_name, None)
+
+            if histogram is None:
+                histogram = LatencyHistogram(self.window_seconds, self._clock)
+                self._histograms[operation_name] = histogram
+
+            histogram.record(seconds)
+
+    def count(self, operation_name: str) -> int:
+        """
+        :return: The number of samples of the operation in the rolling window
+        """
+        with self._lock:
+            histogram = self._histograms.get(operation_name, None)
+            return 0 if histogram is None else histogram.count()
+
+    def percentile(self, operation_name: str, q: float) -> float or None:
+        """
+        :return: The q percentile latency of the operation, or None if there are no samples
+        """
+        with self._lock:
+            histogram = self._histograms.get(operation_name, None)
+            return None if histogram is None else histogram.percentile(q)
+
+    def timeout(self, operation_name: str) -> float:
+        """
+        :param operation_name: The operation a request is made for
+        :return: Seconds to wait for the request
+        """
+        default = (
+            self.default_connect_timeout
+            if operation_name == CONNECT
+            else self.default_timeout
+        )
+
+        with self._lock:
+            histogram = self._histograms.get(operation_name, None)
+
+            if histogram is None or histogram.count() < self.min_samples:
+                return default
+
+            observed = histogram.percentile(self.timeout_percentile)
+
+        return min(self.max_timeout, max(self.min_timeout, observed * self.headroom))
+
+    def timeouts(self, operation_name: str) -> tuple[float, float]:
+        """
+        :param operation_name: The operation a request is made for
+        :return: A 2-tuple of seconds to wait for a new connection and seconds to wait for the response
+        """
+        return self.timeout(CONNECT), self.timeout(operation_name)
+
+    def export(self) -> dict:
+        """
+        :return: A dict of each operation's histogram snapshot and current timeout, for dashboards
+        """
+        with self._lock:
+            snapshots = {
+                name: histogram.snapshot()
+                for name, histogram in self._histograms.items()
+            }
+
+        for name, snapshot in snapshots.items():
+            snapshot["timeout"] = self.timeout(name)
+
+        return snapshots
+
+
+class HedgeBudget:
+    """
+    Overview
+    --------
+    Limits hedged requests to a share of all requests against an endpoint. Every request earns `ratio` of a token,
+    up to `burst` tokens, and every hedge spends one, so over time at most `ratio` extra requests are sent per request.
+
+    Attributes
+    -----------
+    requests
+        Number of requests that could have been hedged
+
+    hedges
+        Number of hedges sent
+
+    hedges_won
+        Number of hedges that answered before the request they duplicated
+
+    rejected
+        Number of hedges not sent because the budget was spent
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10.0):
+        """
+        :param ratio: Tokens earned per request, i.e. the most hedges per request over time
+        :param burst: The most tokens that can be saved up
+        """
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.rejected = 0
+
+    def deposit(self):
+        """
+        Earns the budget for one request.
+        """
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Spends the budget for one hedge.
+        :return: Whether the hedge may be sent
+        """
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.hedges += 1
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_win(self):
+        """
+        Counts a hedge that answered first.
+        """
+        with self._lock:
+            self.hedges_won += 1
+
+    def stats(self) -> dict:
+        """
+        :return: A dict of the budget's counters and remaining tokens
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+                "rejected": self.rejected,
+                "tokens": round(self._tokens, 3),
+            }
+
+
+class LatencyTrackingAdapter(HTTPAdapter):
+    """
+    Overview
+    --------
+    A Requests transport adapter that applies a `LatencyTracker`'s timeouts to requests sent without one, and
+    records the latency of each response the endpoint answered (anything but a server error).
+    """
+
+    def __init__(self, tracker: LatencyTracker, **kwargs):
+        super().__init__(**kwargs)
+        self.tracker = tracker
+
+    def send(self, request, timeout=None, **kwargs):
+        operation_name = current_operation.get()
+
+        if timeout is None:
+            timeout = self.tracker.timeouts(operation_name)
+
+        response = super().send(request, timeout=timeout, **kwargs)
+
+        if response.status_code < 500:
+            self.tracker.record(operation_name, response.elapsed.total_seconds())
+
+        return response
@@ -0,0 +1,210 @@
+# Description: Per-endpoint request rate and concurrency limits, and the Retry-After of throttled responses.
+import asyncio
+import contextlib
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value: str or None, now: float or None = None) -> float or None:
+    """
+    Reads a Retry-After header, given either as seconds or as an HTTP date.
+    :param value: The value of the header, or None if there was none
+    :param now: The current UNIX time, defaults to the system clock
+    :return: Seconds to wait (never negative), or None if the header is missing or malformed
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    if now is None:
+        now = datetime.now(timezone.utc).timestamp()
+
+    return max(0.0, retry_at.timestamp() - now)
+
+
+class RateLimiter:
+    """
+    Overview
+    --------
+    Keeps the requests sent to one endpoint under a steady rate and a number in flight at once. The rate is a token
+    bucket: `rate` tokens are earned per second, up to `burst`, and every request spends one, waiting for it if none
+    is left. The endpoint may also ask for a pause (e.g. the Retry-After of a 429), during which no request is sent.
+
+    Asynchronous requests wait their turn on the event loop with `acquire`, blocking requests (e.g. the FHIR Client,
+    on its own thread) with `acquire_blocking`. Each kind is held to `max_in_flight` separately.
+
+    Attributes
+    -----------
+    rate
+        Requests per second, 0 for no limit
+
+    burst
+        Most requests that may be sent at once after a quiet spell
+
+    max_in_flight
+        Most requests in flight at once, 0 for no limit
+
+    throttled
+        Number of requests that had to wait for a token or a pause
+
+    requeued
+        Number of requests sent again because the endpoint answered 429
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        burst: float = 10.0,
+        max_in_flight: int = 0,
+        clock=time.monotonic,
+    ):
+        """
+        :param rate: Requests per second, 0 for no limit
+        :param burst: Most requests that may be sent at once after a quiet spell
+        :param max_in_flight: Most requests in flight at once, 0 for no limit
+        :param clock: Function returning the current time in seconds, monotonic by default
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_in_flight = max_in_flight
+        self._clock = clock
+
+        self._tokens = self.burst
+        self._refilled = self._clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        # asyncio semaphores belong to the loop they are first used on
+        self._loop_semaphores = weakref.WeakKeyDictionary()
+        self._thread_semaphore = (
+            threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        )
+
+        self.throttled = 0
+        self.requeued = 0
+
+    def _reserve(self) -> float:
+        # Takes a token and returns 0, or returns how long to wait before trying again
+        with self._lock:
+            now = self._clock()
+
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            if self.rate <= 0:
+                return 0.0
+
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._refilled) * self.rate
+            )
+            self._refilled = now
+
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+
+            return (1.0 - self._tokens) / self.rate
+
+    def _semaphore(self) -> asyncio.Semaphore or None:
+        if self.max_in_flight <= 0:
+            return None
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._loop_semaphores.get(loop, None)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_in_flight)
+                self._loop_semaphores[loop] = semaphore
+
+        return semaphore
+
+    def pause(self, seconds: float):
+        """
+        Holds back every request for the given time, e.g. when the endpoint asked to be left alone.
+        :param seconds: Seconds from now until requests may be sent again
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def record_requeue(self):
+        """
+        Counts a request sent again because the endpoint answered 429.
+        """
+        with self._lock:
+            self.requeued += 1
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """
+        Waits, without blocking the event loop, until a request may be sent and holds its place in flight for the
+        duration of the block, e.g. `async with limiter.acquire(): ...`
+        """
+        semaphore = self._semaphore()
+
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            wait = self._reserve()
+            if wait > 0:
+                with self._lock:
+                    self.throttled += 1
+
+                while wait > 0:
+                    await asyncio.sleep(wait)
+                    wait = self._reserve()
+
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    @contextlib.contextmanager
+    def acquire_blocking(self):
+        """
+        Blocks the calling thread until a request may be sent and holds its place in flight for the duration of the
+        block, e.g. `with limiter.acquire_blocking(): ...`
+        """
+        if self._thread_semaphore is not None:
+            self._thread_semaphore.acquire()
+        try:
+            wait = self._reserve()
+            if wait > 0:
+                with self._lock:
+                    self.throttled += 1
+
+                while wait > 0:
+                    time.sleep(wait)
+                    wait = self._reserve()
+
+            yield
+        finally:
+            if self._thread_semaphore is not None:
+                self._thread_semaphore.release()
+
+    def stats(self) -> dict:
+        """
+        :return: A dict of the limiter's settings and counters
+        """
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "max_in_flight": self.max_in_flight,
+                "throttled": self.throttled,
+                "requeued": self.requeued,
+                "paused_for": round(max(0.0, self._paused_until - self._clock()), 3),
+            }
@@ -0,0 +1,201 @@
+# Description: Retries of transient upstream failures, with exponential backoff and jitter, within a request deadline.
+import asyncio
+import contextlib
+import contextvars
+import random
+import threading
+import time
+
+import aiohttp
+import requests
+
+# The time (of time.monotonic) by which the current request must be answered, set with `deadline`
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+# Names that retryable exceptions can be given by in the endpoint config, and what each stands for
+RETRYABLE_EXCEPTIONS = {
+    "connection": (
+        aiohttp.ClientConnectionError,
+        requests.ConnectionError,
+    ),
+    "timeout": (
+        asyncio.TimeoutError,
+        requests.Timeout,
+    ),
+    "payload": (
+        aiohttp.ClientPayloadError,
+        requests.exceptions.ChunkedEncodingError,
+        requests.exceptions.ContentDecodingError,
+    ),
+}
+
+
+def retryable_exception_classes(retryable_exceptions) -> tuple:
+    """
+    :param retryable_exceptions: Names (see RETRYABLE_EXCEPTIONS) or classes of exceptions
+    :return: The exception classes they stand for
+    :raises ValueError: If a name is not one of RETRYABLE_EXCEPTIONS
+    """
+    exception_classes = []
+    for exception in retryable_exceptions:
+        if isinstance(exception, str):
+            name = exception.strip().lower()
+            if name not in RETRYABLE_EXCEPTIONS:
+                raise ValueError(
+                    f"Unknown retryable exception '{exception}', expected one of "
+                    + ", ".join(RETRYABLE_EXCEPTIONS)
+                )
+            exception_classes.extend(RETRYABLE_EXCEPTIONS[name])
+        else:
+            exception_classes.append(exception)
+    return tuple(exception_classes)
+
+
+@contextlib.contextmanager
+def deadline(at: float or None):
+    """
+    Sets the time by which every request sent inside the block (including from tasks and threads it starts) must be
+    answered, retries that could not finish by then are not attempted. e.g. `with deadline(time.monotonic() + 30):`
+    :param at: The deadline, in terms of time.monotonic (which the event loop's clock also uses), or None for none
+    """
+    token = current_deadline.set(at)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+class RetryPolicy:
+    """
+    Overview
+    --------
+    Decides whether a failed request to an endpoint is sent again, and how long to wait first. A request is
+    attempted at most `max_attempts` times. The n-th retry waits `backoff_base * 2 ** (n - 1)` seconds, at most
+    `backoff_max`, less a random share of up to `jitter` of it so that clients that failed together do not retry
+    together. No retry is started that could not finish before the current request deadline.
+
+    Attributes
+    -----------
+    retries
+        Number of retries sent
+
+    recovered
+        Number of requests answered, with a status that is not retried, after at least one retry
+
+    exhausted
+        Number of requests that still failed after `max_attempts` attempts
+
+    deadline_exceeded
+        Number of retries not sent because the request deadline would have passed
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base: float = 0.2,
+        backoff_max: float = 5.0,
+        jitter: float = 0.5,
+        retryable_statuses=(502, 503, 504),
+        retryable_exceptions=("connection", "timeout"),
+        clock=time.monotonic,
+        rng=random.random,
+    ):
+        """
+        :param max_attempts: Most times a request is attempted, 1 to never retry
+        :param backoff_base: Seconds to wait before the first retry
+        :param backoff_max: Most seconds to wait before any retry
+        :param jitter: Share, from 0 to 1, of each wait that is taken off at random
+        :param retryable_statuses: HTTP statuses that are retried
+        :param retryable_exceptions: Names (see RETRYABLE_EXCEPTIONS) or classes of exceptions that are retried
+        :param clock: Function returning the current time in seconds, monotonic by default
+        :param rng: Function returning a random float from 0 to 1
+        :raises ValueError: If a retryable exception is named that is not one of RETRYABLE_EXCEPTIONS
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = min(1.0, max(0.0, jitter))
+        self.retryable_statuses = frozenset(retryable_statuses)
+
+        self.retryable_exceptions = retryable_exception_classes(retryable_exceptions)
+
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+
+        self.retries = 0
+        self.recovered = 0
+        self.exhausted = 0
+        self.deadline_exceeded = 0
+
+    def is_retryable_status(self, status: int) -> bool:
+        """
+        :return: Whether a response with the status is retried
+        """
+        return status in self.retryable_statuses
+
+    def is_retryable_exception(self, exception: BaseException) -> bool:
+        """
+        :return: Whether a request that raised the exception is retried
+        """
+        # A certificate that failed to verify will fail again
+        if isinstance(
+            exception, (aiohttp.ClientSSLError, requests.exceptions.SSLError)
+        ):
+            return False
+
+        return isinstance(exception, self.retryable_exceptions)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        :param attempt: The number of attempts made so far
+        :return: Seconds to wait before the next attempt
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return delay * (1.0 - self.jitter * self._rng())
+
+    def next_delay(self, attempt: int) -> float or None:
+        """
+        Decides whether a request that failed in a retryable way is attempted again, and counts the retry if so.
+        :param attempt: The number of attempts made so far
+        :return: Seconds to wait before the next attempt, or None if it should not be attempted again
+        """
+        if attempt >= self.max_attempts:
+            with self._lock:
+                self.exhausted += 1
+            return None
+
+        delay = self.backoff(attempt)
+
+        # A retry that could not even be sent before the deadline would only be cancelled
+        at = current_deadline.get()
+        if at is not None and self._clock() + delay >= at:
+            with self._lock:
+                self.deadline_exceeded += 1
+            return None
+
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def record_outcome(self, attempt: int):
+        """
+        Counts a request that got a final answer.
+        :param attempt: The number of attempts it took
+        """
+        if attempt > 1:
+            with self._lock:
+                self.recovered += 1
+
+    def stats(self) -> dict:
+        """
+        :return: A dict of the policy's counters
+        """
+        with self._lock:
+            return {
+                "max_attempts": self.max_attempts,
+                "retries": self.retries,
+                "recovered": self.recovered,
+                "exhausted": self.exhausted,
+                "deadline_exceeded": self.deadline_exceeded,
+            }
@@ -0,0 +1,81 @@
+# Description: Coalesces identical concurrent lookups so that they share one upstream request.
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """
+    Overview
+    --------
+    Runs at most one lookup per key at a time on each event loop. A caller asking for a key that is already being
+    looked up waits for that lookup and gets its result (or its exception) instead of starting another. The lookup
+    keeps running while any caller still waits for it, it is only cancelled once every caller has given up.
+
+    Attributes
+    -----------
+    started
+        Number of lookups started
+
+    coalesced
+        Number of callers that joined a lookup already in flight
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key, lookup):
+        """
+        Returns the result of lookup(), sharing it with every concurrent caller for the same key.
+        :param key: A hashable key, callers with equal keys share a lookup
+        :param lookup: A function of no arguments returning the coroutine to run
+        :return: The result of the lookup
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+
+        with self._lock:
+            flight = self._in_flight.get(flight_key, None)
+
+            if flight is None:
+                task = loop.create_task(lookup())
+                flight = [task, 0]
+                self._in_flight[flight_key] = flight
+                task.add_done_callback(lambda _: self._forget(flight_key, flight))
+                self.started += 1
+            else:
+                self.coalesced += 1
+
+            flight[1] += 1
+
+        task = flight[0]
+        try:
+            return await asyncio.shield(task)
+        finally:
+            with self._lock:
+                flight[1] -= 1
+                abandoned = flight[1] == 0 and not task.done()
+
+            if abandoned:
+                # Later callers start afresh rather than join a cancelled lookup
+                self._forget(flight_key, flight)
+                task.cancel()
+
+    def _forget(self, flight_key, flight: list):
+        with self._lock:
+            if self._in_flight.get(flight_key, None) is flight:
+                del self._in_flight[flight_key]
+
+    def stats(self) -> dict:
+        """
+        :return: A dict of the lookups started, callers coalesced and lookups in flight
+        """
+        with self._lock:
+            return {
+                "started": self.started,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
@@ -1,11 +1,18 @@
 # Authors: Iain Richey, Trenton Young, Kevin Carman, Hla Htun
 # Description: Functionality to connect to and interact with Endpoints.
 import asyncio
-import http.client
 import json
+import os
+import re
 import ssl
-import subprocess
+import threading
+import time
+import warnings
 from typing import Any
+from typing import AsyncIterator
+from urllib.parse import quote
+from urllib.parse import urljoin
+from urllib.parse import urlparse
 
 import aiohttp
 import fhirclient.models.bundle
@@ -14,7 +21,7 @@ import fhirclient.models.organization as org
 import fhirclient.models.practitioner as prac
 import fhirclient.models.practitionerrole as prac_role
 import requests
-import requests.adapters
+import urllib3
 from fhirclient import client
 from fhirclient.models.capabilitystatement import CapabilityStatement
 from fhirclient.models.domainresource import DomainResource
@@ -24,17 +31,102 @@ from requests.exceptions import HTTPError
 from requests.exceptions import SSLError
 
 import FhirCapstoneProject.fhirtypepkg as fhirtypepkg
-from FhirCapstoneProject.fhirtypepkg.curl_to_requests import (
-    FakeSocket,
-    FakeHTTPResponse,
-)
+from FhirCapstoneProject.fhirtypepkg.cache import ResponseCache
+from FhirCapstoneProject.fhirtypepkg.cache import TTLCache
+from FhirCapstoneProject.fhirtypepkg.circuitbreaker import CircuitBreaker
 from FhirCapstoneProject.fhirtypepkg.endpoint import Endpoint
+from FhirCapstoneProject.fhirtypepkg.fhirtype import ExceptionCircuitOpen
 from FhirCapstoneProject.fhirtypepkg.fhirtype import ExceptionNPI
 from FhirCapstoneProject.fhirtypepkg.fhirtype import fhir_logger
+from FhirCapstoneProject.fhirtypepkg.fhirtype import loads_json
+from FhirCapstoneProject.fhirtypepkg.latency import (
+    CONNECT,
+    PRACTITIONER,
+    REFERENCE,
+    ROLE,
+    HedgeBudget,
+    LatencyTracker,
+    LatencyTrackingAdapter,
+    current_operation,
+    operation,
+)
 from FhirCapstoneProject.fhirtypepkg.flatten import (
+    register_field_mappings,
     validate_npi,
 )
 from FhirCapstoneProject.fhirtypepkg.localization import localize
+from FhirCapstoneProject.fhirtypepkg.ratelimit import RateLimiter
+from FhirCapstoneProject.fhirtypepkg.ratelimit import parse_retry_after
+from FhirCapstoneProject.fhirtypepkg.retry import RetryPolicy
+from FhirCapstoneProject.fhirtypepkg.singleflight import SingleFlight
+
+
+# Where each endpoint's Capability Statement is kept between boots
+capability_cache_dir = os.environ.get(
+    "FHIRTYPE_CAPABILITY_CACHE_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "cache",
+        "capabilities",
+    ),
+)
+
+# Resolved Locations and Organizations, shared by every SmartClient and keyed by (endpoint URL, absolute reference)
+reference_cache = TTLCache(
+    maxsize=int(os.environ.get("FHIRTYPE_REFERENCE_CACHE_SIZE", 2048)),
+    ttl=float(os.environ.get("FHIRTYPE_REFERENCE_CACHE_TTL", 900)),
+)
+
+# Practitioner search responses, shared by every SmartClient and revalidated upstream once stale
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get("FHIRTYPE_RESPONSE_CACHE_BYTES", 64 * 1024 * 1024)),
+    policy=os.environ.get("FHIRTYPE_RESPONSE_CACHE_POLICY", "lru"),
+)
+
+# Compressed transfer encodings to ask upstream for, aiohttp decompresses each as it streams in. Brotli needs the
+# optional Brotli (or brotlicffi) package.
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+_ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+# Identical searches and reference fetches in flight at once, shared by every SmartClient so that concurrent callers
+# asking the same endpoint the same thing share one upstream request and one parse
+search_flights = SingleFlight()
+
+# Seconds a cached response is served without revalidation when upstream does not say (via Cache-Control)
+_RESPONSE_CACHE_DEFAULT_MAX_AGE = float(
+    os.environ.get("FHIRTYPE_RESPONSE_CACHE_MAX_AGE", 60)
+)
+
+# Longest search URL sent when many NPIs are ORed into one search, well under the limits servers and proxies set
+_MAX_SEARCH_URL_LENGTH = int(os.environ.get("FHIRTYPE_MAX_SEARCH_URL_LENGTH", 2000))
+
+
+def response_max_age(headers) -> float or None:
+    """
+    Reads how long a response may be served from cache from its Cache-Control header.
+    :param headers: The headers of the response
+    :return: Seconds the response is fresh for, or None if it must not be cached at all
+    """
+    directives = fhirtypepkg.fhirtype.parse_cache_control_header(
+        headers.get("Cache-Control", None)
+    )
+
+    if "no-store" in directives:
+        return None
+
+    if "no-cache" in directives:
+        return 0.0
+
+    try:
+        return float(directives["max-age"])
+    except (KeyError, TypeError, ValueError):
+        return _RESPONSE_CACHE_DEFAULT_MAX_AGE
 
 
 def resolve_reference(_smart, reference: fhirclient.models.fhirreference.FHIRReference):
@@ -48,7 +140,290 @@ def resolve_reference(_smart, reference: fhirclient.models.fhirreference.FHIRRef
     if reference is None:
         raise TypeError("FHIRReference to None")
 
-    return _smart._http_json_query(reference, [])
+    cache_key = _smart._reference_cache_key(reference)
+    resource_json = reference_cache.get(cache_key)
+
+    if resource_json is None:
+        resource_json = _smart._http_json_query(reference, [])
+
+        if resource_json:
+            reference_cache.set(cache_key, resource_json)
+
+    return resource_json
+
+
+# The references on a DomainResource that are resolved, and the DomainResource each one is resolved to
+_RESOLVABLE_REFERENCES = {
+    localize("location"): loc.Location,
+    localize("organization"): org.Organization,
+}
+
+# The most ids that will be put into a single `_id=a,b,c` search when resolving references
+_REFERENCE_BATCH_SIZE = 50
+
+
+def split_reference(reference: str) -> tuple[str, str] or None:
+    """
+    Splits a relative or absolute reference into its resource type and id, ignoring any version.
+
+    Example:
+        "Location/123" or "https://site.com/fhir/Location/123/_history/2"
+        # yields ("Location", "123")
+
+    :param reference: The reference string of a FHIRReference
+    :return: A 2-tuple of (resource type, id), or None if the reference isn't of that form
+    """
+    parts = reference.split("/_history/")[0].rstrip("/").split("/")
+
+    if len(parts) < 2 or not parts[-2] or not parts[-1]:
+        return None
+
+    return parts[-2], parts[-1]
+
+
+def collect_unresolved_references(resources: list) -> dict:
+    """
+    Finds every LOCATION and ORGANIZATION reference on the given DomainResources that has not been resolved yet.
+    References that appear more than once are collected once.
+
+    :param resources: A list of DomainResources (e.g. PractitionerRoles)
+    :return: A dict of reference string to every place it appears, each as a 3-tuple of
+    (DomainResource, attribute name, index into that attribute's list or None if the attribute is not a list)
+    """
+    unresolved = {}
+
+    for resource in resources:
+        for attribute in _RESOLVABLE_REFERENCES:
+            value = getattr(resource, attribute, None)
+
+            if type(value) is list:
+                targets = list(enumerate(value))
+            else:
+                targets = [(None, value)]
+
+            for index, reference in targets:
+                if (
+                    type(reference) is fhirclient.models.fhirreference.FHIRReference
+                    and reference.reference is not None
+                ):
+                    unresolved.setdefault(reference.reference, []).append(
+                        (resource, attribute, index)
+                    )
+
+    return unresolved
+
+
+def apply_resolved_references(unresolved: dict, resolved: dict):
+    """
+    Replaces each unresolved reference with the DomainResource it resolved to. A reference that could not be
+    resolved becomes an empty DomainResource, as it would have been when resolved one at a time.
+
+    :param unresolved: The output of `collect_unresolved_references`
+    :param resolved: A dict of reference string to the JSON Object (or already built DomainResource) it resolved to
+    """
+    for reference, targets in unresolved.items():
+        resource_json = resolved.get(reference) or {}
+
+        # Every place a reference appears shares the one DomainResource built for it
+        domain_resources = {}
+
+        for resource, attribute, index in targets:
+            if isinstance(resource_json, DomainResource):
+                domain_resources[attribute] = resource_json
+            elif attribute not in domain_resources:
+                try:
+                    domain_resources[attribute] = _RESOLVABLE_REFERENCES[attribute](
+                        resource_json
+                    )
+                except FHIRValidationError as e:
+                    fhir_logger().warning(
+                        "Could not resolve reference %s, left unresolved. (%s)",
+                        reference,
+                        e,
+                    )
+                    domain_resources[attribute] = None
+
+            if domain_resources[attribute] is None:
+                continue
+
+            if index is None:
+                setattr(resource, attribute, domain_resources[attribute])
+            else:
+                getattr(resource, attribute)[index] = domain_resources[attribute]
+
+
+def bundle_next_url(bundle: dict) -> str or None:
+    """
+    Finds where the next page of a search Bundle is, from its `link[relation=next]`.
+    :param bundle: JSON Object of a search Bundle
+    :return: The URL of the next page, or None if this is the last page
+    """
+    for link in bundle.get("link", None) or []:
+        if link.get("relation", None) == "next" and link.get("url", None):
+            return link["url"]
+
+    return None
+
+
+def check_response_status(response: aiohttp.ClientResponse):
+    """
+    Raises for any response that is not an HTTP 200.
+    :param response: A (released) aiohttp response
+    """
+    if response.status != 200:
+        raise aiohttp.ClientResponseError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message=response.reason,
+            headers=response.headers,
+        )
+
+
+def check_search_npi(npi: str or None):
+    """
+    Raises a ValueError if the given NPI cannot be used to search for a practitioner.
+    """
+    if not npi or len(npi) < 10:
+        raise ValueError(f"Error npi not correct for search parameters value: {npi}")
+
+
+def filter_practitioners_by_npi(resources: list, npi: str) -> list:
+    """
+    Picks out the Practitioners that carry the given NPI from a list of DomainResources, each at most once.
+
+    :param resources: A list of DomainResources, which may include resources other than Practitioners
+    :param npi: [formatted 0000000000] National Physician Identifier
+    :return: A list of Practitioners, in the order they were given
+    """
+    prac_resources = []
+    unique_identifiers = set()
+
+    if resources and len(resources) > 0:
+        for practitioner in resources:
+            if type(practitioner) is prac.Practitioner and practitioner.identifier:
+
+                for _id in practitioner.identifier:
+                    if (
+                        _id.system == "http://hl7.org/fhir/sid/us-npi"
+                        and _id.value == npi
+                    ):
+                        if practitioner.id not in unique_identifiers:
+                            unique_identifiers.add(practitioner.id)
+                            prac_resources.append(practitioner)
+
+    return prac_resources
+
+
+def filter_practitioners_by_npi_json(resources: list, npi: str) -> list:
+    """
+    Picks out the Practitioners that carry the given NPI from a list of JSON resources, each at most once, as
+    `::fhirtypepkg.client.filter_practitioners_by_npi` does for DomainResources.
+
+    :param resources: A list of JSON Objects, which may include resources other than Practitioners
+    :param npi: [formatted 0000000000] National Physician Identifier
+    :return: A list of Practitioner JSON Objects, in the order they were given
+    """
+    prac_resources = []
+    unique_identifiers = set()
+
+    for practitioner in resources:
+        if practitioner.get("resourceType", None) != "Practitioner":
+            continue
+
+        for _id in practitioner.get("identifier", None) or []:
+            if (
+                _id.get("system", None) == "http://hl7.org/fhir/sid/us-npi"
+                and _id.get("value", None) == npi
+                and practitioner.get("id", None) not in unique_identifiers
+            ):
+                unique_identifiers.add(practitioner.get("id", None))
+                prac_resources.append(practitioner)
+
+    return prac_resources
+
+
+def select_practitioner_roles_json(candidate_roles: list, practitioners: list) -> list:
+    """
+    Picks out the PractitionerRoles of the given practitioners from a list of JSON resources, each at most once.
+
+    :param candidate_roles: A list of JSON Objects, which may include resources other than PractitionerRoles
+    :param practitioners: A list of Practitioner JSON Objects
+    :return: A list of PractitionerRole JSON Objects, in the order they were given
+    """
+    practitioner_ids = set(practitioner.get("id") for practitioner in practitioners)
+
+    practitioner_roles = []
+    seen_roles = set()  # Track seen roles to avoid duplicates
+    for role in candidate_roles:
+        if (
+            role.get("resourceType", None) != "PractitionerRole"
+            or role.get("id", None) in seen_roles
+        ):
+            continue
+
+        reference = (role.get("practitioner", None) or {}).get("reference", None)
+        split = split_reference(reference) if reference else None
+        if split is not None and split[1] in practitioner_ids:
+            seen_roles.add(role.get("id", None))
+            practitioner_roles.append(role)
+
+    return practitioner_roles
+
+
+def practitioner_json_matches_name(
+    practitioner: dict, name_family: str or None, name_given: str or None
+) -> bool:
+    """
+    Checks a Practitioner JSON Object against a family and given name the way a FHIR string search would, each must
+    be the start of one of the practitioner's names of that kind, ignoring case. Used to tell apart the results of a
+    search that did not filter by name.
+
+    :param practitioner: A Practitioner JSON Object
+    :param name_family: The last name searched for, or None to match any
+    :param name_given: The first name searched for, or None to match any
+    :return: Whether the practitioner would have been found by a search for the names
+    """
+    families = []
+    givens = []
+    for name in practitioner.get("name", None) or []:
+        families.append(name.get("family", None) or "")
+        givens.extend(name.get("given", None) or [])
+
+    def matches(searched: str or None, names: list) -> bool:
+        return not searched or any(
+            name.lower().startswith(searched.lower()) for name in names
+        )
+
+    return matches(name_family, families) and matches(name_given, givens)
+
+
+def http_build_identifier_values(npis: list, max_length: int) -> list:
+    """
+    Joins NPIs into values for an `identifier` search that ORs them (system|npi,system|npi,...), starting a new value
+    whenever the next NPI would make the URL-encoded value longer than `max_length`.
+
+    :param npis: A list of [formatted 0000000000] National Physician Identifiers
+    :param max_length: The most characters an encoded value may take, each value holds at least one NPI
+    :return: A list of values, one per search
+    """
+    values = []
+    current = ""
+
+    for npi in npis:
+        token = "http://hl7.org/fhir/sid/us-npi|" + npi
+        joined = current + "," + token if current else token
+
+        if current and len(quote(joined, safe="/,:")) > max_length:
+            values.append(current)
+            current = token
+        else:
+            current = joined
+
+    if current:
+        values.append(current)
+
+    return values
 
 
 def http_build_search(parameters: dict) -> list:
@@ -147,8 +522,10 @@ class SmartClient:
     the querying method from the user. This SmartClient may make queries via the Smart on FHIR library or an HTTP
     request depending on the state of the system.
 
-    Upon initialization: GETs a capability statement from the endpoint to check versioning and other important
-    metadata. This connection remains persistent and is monitored for the life of the SmartClient.
+    Upon initialization: loads the capability statement saved on a previous boot, if any, then GETs a fresh one from
+    the endpoint in the background to check versioning and other important metadata. Initialization does not block
+    on the endpoint, see `::fhirtypepkg.client.SmartClient.wait_until_ready`. The capability statement is refreshed
+    in the background for the life of the SmartClient.
 
     Attributes
     -----------
@@ -161,35 +538,100 @@ class SmartClient:
     http_session
         Persistent HTTP connection, used to make queries
 
+    _async_session
+        Persistent, pooled aiohttp session shared by every asynchronous query made by this SmartClient, created
+        lazily on first use and released by `::fhirtypepkg.client.SmartClient.close`
+
     _http_session_confirmed
         Whenever an HTTP request is made, the status is checked and updated here
+
+    _ready
+        Set once the first attempt to reach the endpoint (successful or not) has finished
+
+    circuit_breaker
+        Health of the endpoint, requests to an endpoint that keeps failing are refused with ExceptionCircuitOpen
+        rather than waiting on it
+
+    latency
+        Latency histograms of the endpoint per operation, every request's timeouts are derived from them
+
+    hedge_budget
+        Limits how many duplicate requests hedging may send, see `Endpoint.hedge_requests`
+
+    rate_limiter
+        Keeps requests to the endpoint under its configured rate and number in flight, and holds them back while the
+        endpoint asks to be left alone (HTTP 429 with Retry-After)
+
+    retry_policy
+        Which failed requests to the endpoint are sent again, and how long to back off first
     """
 
     # def __init__(self, endpoint: Endpoint, enable_http=True, get_metadata=True):
-    def __init__(self, _endpoint: Endpoint):
+    def __init__(self, _endpoint: Endpoint, _capability_cache_dir: str or None = None):
         """
         Initializes a SmartClient for the given Endpoint. Assumes the Endpoint is properly initialized.
 
         :param _endpoint: A valid Endpoint object
-        :param get_metadata: Whether to perform `::fhirtypepkg.client.SmartClient.find_endpoint_metadata`
-        upon instantiation, if set to false this can always be called later.
+        :param _capability_cache_dir: Directory the endpoint's Capability Statement is saved to and loaded from,
+        defaults to `capability_cache_dir`
         """
         self._can_search_by_npi = _endpoint.can_search_by_npi
 
         self.endpoint = _endpoint
 
-        # TODO: Fail gracefully when an endpoint is down
+        # Fail fast while the endpoint is down, see `::fhirtypepkg.circuitbreaker.CircuitBreaker`
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=self.endpoint.breaker_failure_threshold,
+            minimum_requests=self.endpoint.breaker_minimum_requests,
+            window_seconds=self.endpoint.breaker_window_seconds,
+            open_seconds=self.endpoint.breaker_open_seconds,
+        )
+
+        # Cut off slow outliers, see `::fhirtypepkg.latency.LatencyTracker`
+        self.latency = LatencyTracker(
+            default_timeout=self.endpoint.default_timeout,
+            default_connect_timeout=self.endpoint.default_connect_timeout,
+            min_timeout=self.endpoint.min_timeout,
+            max_timeout=self.endpoint.max_timeout,
+            headroom=self.endpoint.timeout_headroom,
+        )
+        self.hedge_budget = HedgeBudget(
+            ratio=self.endpoint.hedge_budget_ratio,
+            burst=self.endpoint.hedge_budget_burst,
+        )
+
+        # Keep from overwhelming the endpoint, see `::fhirtypepkg.ratelimit.RateLimiter`
+        self.rate_limiter = RateLimiter(
+            rate=self.endpoint.rate_limit,
+            burst=self.endpoint.rate_limit_burst,
+            max_in_flight=self.endpoint.max_in_flight,
+        )
+
+        # Compile how this endpoint's resources are flattened once, up front
+        register_field_mappings(self.endpoint.name, self.endpoint.field_mappings)
+
+        # Ride out network blips, see `::fhirtypepkg.retry.RetryPolicy`
+        self.retry_policy = RetryPolicy(
+            max_attempts=self.endpoint.retry_max_attempts,
+            backoff_base=self.endpoint.retry_backoff_base,
+            backoff_max=self.endpoint.retry_backoff_max,
+            jitter=self.endpoint.retry_jitter,
+            retryable_statuses=self.endpoint.retry_statuses,
+            retryable_exceptions=self.endpoint.retry_exceptions,
+        )
+
         self.smart = client.FHIRClient(
             settings={
                 localize("app id"): fhirtypepkg.fhirtype.get_app_id(),
                 localize("api base"): _endpoint.get_url(),
             }
         )
+        self._track_latency(self.smart.server.session)
 
         if self.endpoint.enable_http:
             self.http_session = requests.Session()
+            self._track_latency(self.http_session)
             self._http_session_confirmed = False
-            self._initialize_http_session()
         else:
             self._http_session_confirmed = None
             fhir_logger().info(
@@ -198,9 +640,11 @@ class SmartClient:
                 self.get_endpoint_url(),
             )
 
+        # Created lazily, see _get_async_session
+        self._async_session = None
+        self._async_session_loop = None
+
         self._enable_http_client = False
-        self._http_client_list = []
-        self._http_client_mutex = 0
         if self.endpoint.use_http_client:
             fhir_logger().info(
                 "USE CLIENT.HTTP Connection per config for endpoint %s (%s), this will override use of the FHIR Client.",
@@ -209,51 +653,257 @@ class SmartClient:
             )
             self._enable_http_client = True
 
+            # The HTTP Client accepts any certificate the endpoint presents, as `curl -k` did
+            self.http_client_session = requests.Session()
+            self.http_client_session.verify = False
+            self._track_latency(self.http_client_session)
+
+            # Only this endpoint's unverified requests go unwarned, not those of every other connection
+            warnings.filterwarnings(
+                "ignore",
+                message=re.escape(
+                    "Unverified HTTPS request is being made to host '%s'"
+                    % urlparse(self.get_endpoint_url()).hostname
+                ),
+                category=urllib3.exceptions.InsecureRequestWarning,
+            )
+
+        self.metadata = None
+        self._search_params = {}
+        self._search_params_by_type = {}
+        self._search_includes_by_type = {}
+        self._search_rev_includes_by_type = {}
+
         # If there has been a metadata endpoint configured for this endpoint, and it doesn't use the HTTP Client method,
         # attempt to collect its metadata.
-        if (
+        self._use_metadata = (
             self.endpoint.get_metadata_on_init is not False
             and not self._enable_http_client
-        ):
-            self.metadata = self.find_endpoint_metadata(
-                self.endpoint.get_metadata_on_init
+        )
+        self._capability_cache_path = os.path.join(
+            _capability_cache_dir or capability_cache_dir,
+            re.sub(r"[^A-Za-z0-9_-]", "_", self.get_endpoint_name()) + ".json",
+        )
+
+        # Start with what was learned about the endpoint on a previous boot, it is refreshed below
+        if self._use_metadata:
+            cached_metadata = self._read_cached_capability_statement()
+            if cached_metadata is not None:
+                self._load_capabilities(cached_metadata)
+
+        self._ready = threading.Event()
+        self._closed = threading.Event()
+
+        if self.endpoint.enable_http or self._use_metadata:
+            threading.Thread(
+                target=self._maintain_endpoint_connection,
+                name=f"SmartClient-{self.get_endpoint_name()}",
+                daemon=True,
+            ).start()
+        else:
+            self._ready.set()
+
+    def _load_capabilities(self, metadata: CapabilityStatement):
+        """
+        Reads the search capabilities of the endpoint from its Capability Statement. Queries may be running while
+        the capabilities are reloaded, so each one is built aside and then swapped in.
+        :param metadata: The Capability Statement of the endpoint
+        """
+        _search_params = {}
+        search_params_by_type = {}
+        search_includes_by_type = {}
+        search_rev_includes_by_type = {}
+
+        rest_capability = metadata.rest[0]
+
+        if rest_capability is not None:
+            # Search parameters supported across all resources
+            server_params = set()
+            if rest_capability.searchParam is not None:
+                for param in rest_capability.searchParam:
+                    server_params.add(param.name)
+
+            for domain_resource in rest_capability.resource:
+                search_params_by_type[domain_resource.type] = set(server_params)
+                search_includes_by_type[domain_resource.type] = set(
+                    domain_resource.searchInclude or []
+                )
+                search_rev_includes_by_type[domain_resource.type] = set(
+                    domain_resource.searchRevInclude or []
+                )
+
+                search_params = domain_resource.searchParam
+                if search_params is not None:
+                    _search_params[domain_resource.profile] = []
+                    for param in search_params:
+                        _search_params[domain_resource.profile].append(param.name)
+                        search_params_by_type[domain_resource.type].add(param.name)
+
+        self.metadata = metadata
+        self._search_params = _search_params
+        self._search_params_by_type = search_params_by_type
+        self._search_includes_by_type = search_includes_by_type
+        self._search_rev_includes_by_type = search_rev_includes_by_type
+
+        prac_params = self._search_params.get(localize("npi code"), None)
+
+        if prac_params is not None and localize("identifier") in prac_params:
+            self._can_search_by_npi = True
+
+    def _read_cached_capability_statement(self) -> CapabilityStatement or None:
+        """
+        Loads the Capability Statement saved for this endpoint on a previous boot.
+        :return: The Capability Statement, or None if there is none (or it cannot be read)
+        """
+        try:
+            with open(self._capability_cache_path, "r") as fi:
+                return CapabilityStatement(json.load(fi))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, FHIRValidationError) as e:
+            fhir_logger().warning(
+                "Ignoring unreadable cached Capability Statement for %s at %s. (%s)",
+                self.get_endpoint_name(),
+                self._capability_cache_path,
+                e,
+            )
+            return None
+
+    def _write_cached_capability_statement(self, metadata: CapabilityStatement):
+        """
+        Saves the Capability Statement so that the next boot can start with it.
+        :param metadata: The Capability Statement of the endpoint
+        """
+        try:
+            os.makedirs(os.path.dirname(self._capability_cache_path), exist_ok=True)
+
+            # Write aside and swap in, so a reader never sees half a file
+            temporary_path = self._capability_cache_path + ".tmp"
+            with open(temporary_path, "w") as fo:
+                json.dump(metadata.as_json(), fo)
+            os.replace(temporary_path, self._capability_cache_path)
+        except (OSError, FHIRValidationError) as e:
+            fhir_logger().warning(
+                "Could not save the Capability Statement for %s to %s. (%s)",
+                self.get_endpoint_name(),
+                self._capability_cache_path,
+                e,
+            )
+
+    def refresh_endpoint_metadata(self) -> bool:
+        """
+        GETs a fresh Capability Statement from the endpoint, loads its capabilities and saves it for the next boot.
+        A failure is logged and the capabilities already loaded (if any) are kept.
+        :return: Whether the Capability Statement was refreshed
+        """
+        try:
+            metadata = self.find_endpoint_metadata(self.endpoint.get_metadata_on_init)
+        except Exception as e:
+            fhir_logger().error(
+                "Could not GET the Capability Statement of %s (%s), %s. (%s)",
+                self.get_endpoint_name(),
+                self.get_endpoint_url(),
+                (
+                    "keeping the one loaded before"
+                    if self.metadata is not None
+                    else "continuing without one"
+                ),
+                e,
             )
-            self._search_params = {}
+            return False
 
-            rest_capability = self.metadata.rest[0]
+        self._load_capabilities(metadata)
+        self._write_cached_capability_statement(metadata)
 
-            if rest_capability is not None:
-                for domain_resource in rest_capability.resource:
-                    search_params = domain_resource.searchParam
-                    if search_params is not None:
-                        self._search_params[domain_resource.profile] = []
-                        for param in search_params:
-                            self._search_params[domain_resource.profile].append(
-                                param.name
-                            )
+        return True
+
+    def _maintain_endpoint_connection(self):
+        """
+        Runs on a background thread for the life of the SmartClient: reaches the endpoint for the first time, marks
+        the SmartClient ready, then refreshes the Capability Statement every `capability_refresh_interval` seconds.
+        """
+        try:
+            if self.endpoint.enable_http:
+                self._initialize_http_session()
+
+            if self._use_metadata:
+                self.refresh_endpoint_metadata()
+        finally:
+            self._ready.set()
+
+        while self._use_metadata and not self._closed.wait(
+            self.endpoint.capability_refresh_interval
+        ):
+            self.refresh_endpoint_metadata()
+
+    def is_ready(self) -> bool:
+        """
+        Whether the first attempt to reach the endpoint has finished. A SmartClient may be queried before it is
+        ready, it will use the capabilities it loaded from disk (if any).
+        """
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: float or None = None) -> bool:
+        """
+        Blocks until the first attempt to reach the endpoint has finished, or the timeout passes.
+        :param timeout: Seconds to wait, or None to wait as long as it takes
+        :return: Whether the SmartClient is ready
+        """
+        return self._ready.wait(timeout)
+
+    def _supports_search_param(self, resource_type: str, param: str) -> bool:
+        """
+        Whether the endpoint's Capability Statement lists the given search parameter for the given resource type.
+        An endpoint with no Capability Statement loaded supports nothing.
+        """
+        return param in self._search_params_by_type.get(resource_type, ())
+
+    def _graph_search_params(self) -> list or None:
+        """
+        Builds the `_revinclude`/`_include` parameters that let a single Practitioner search also return each
+        practitioner's PractitionerRoles and, where supported, their Locations and Organizations.
+        :return: A list of 2-tuples of parameters, or None if the endpoint cannot `_revinclude` PractitionerRoles
+        """
+        rev_include = (
+            localize("title case PractitionerRole") + ":" + localize("practitioner")
+        )
 
-            prac_params = self._search_params.get(localize("npi code"), None)
+        if rev_include not in self._search_rev_includes_by_type.get(
+            localize("titlecase practitioner"), ()
+        ):
+            return None
+
+        params = [("_revinclude", rev_include)]
+
+        # Servers declare the include on either end of the relationship
+        includes = self._search_includes_by_type.get(
+            localize("title case PractitionerRole"), set()
+        ) | self._search_includes_by_type.get(localize("titlecase practitioner"), set())
 
-            if prac_params is not None and localize("identifier") in prac_params:
-                self._can_search_by_npi = True
+        for attribute in _RESOLVABLE_REFERENCES:
+            include = localize("title case PractitionerRole") + ":" + attribute
+            if include in includes:
+                params.append(("_include:iterate", include))
+
+        return params
 
     # def init_flatten_class(self):
     #     self.Flatten = FlattenSmartOnFHIRObject(self.get_endpoint_name())
 
-    def _get_http_client(self) -> http.client.HTTPSConnection:
-        self._http_client_mutex += 1
-        connection = http.client.HTTPSConnection(self.endpoint.host)
-        self._http_client_list.append(connection)
-
-        return connection
+    def _track_latency(self, session: requests.Session):
+        """
+        Applies this SmartClient's derived timeouts to every request the session sends, and records their latency.
+        :param session: A Requests session used to reach the endpoint
+        """
+        adapter = LatencyTrackingAdapter(self.latency)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
 
-    def _release_http_client(self):
-        self._http_client_mutex -= 1
-        if len(self._http_client_list) > 0 and self._http_client_mutex <= 0:
-            for client in self._http_client_list:
-                client.close()
+    async def _on_connection_create_start(self, session, context, params):
+        context.connection_started = time.monotonic()
 
-            self._http_client_list = []
+    async def _on_connection_create_end(self, session, context, params):
+        self.latency.record(CONNECT, time.monotonic() - context.connection_started)
 
     def _is_http_session_confirmed(self) -> bool or None:
         """
@@ -285,7 +935,7 @@ class SmartClient:
                 self._http_session_confirmed = True
             elif 400 <= response.status_code < 600:
                 fhir_logger().error(
-                    "ERROR Connecting to %s (%s).",
+                    "ERROR Connecting to %s (%s), status %s.",
                     self.get_endpoint_name(),
                     self.get_endpoint_url(),
                     response.status_code,
@@ -298,10 +948,10 @@ class SmartClient:
 
         except requests.RequestException as e:
             fhir_logger().error(
-                f"Error making HTTP request, unhandled by status code check:", e
+                "Error making HTTP request, unhandled by status code check: %s", e
             )
         except ssl.SSLCertVerificationError as e:
-            fhir_logger().error(f"SSLCertVerificationError:", e, exc_info=True)
+            fhir_logger().error("SSLCertVerificationError: %s", e, exc_info=True)
 
         if self._http_session_confirmed is not None:
             if self._http_session_confirmed:
@@ -323,6 +973,77 @@ class SmartClient:
                 self.get_endpoint_url(),
             )
 
+    async def _get_async_session(self) -> aiohttp.ClientSession:
+        """
+        Returns this SmartClient's pooled aiohttp session, creating it on first use. The session keeps connections
+        to the endpoint alive and caches DNS lookups so that consecutive queries skip DNS, TCP and TLS setup.
+
+        An aiohttp session is bound to the event loop it was created on, if the running loop has changed since then
+        the old session is detached and a new one is created for the current loop.
+        :return: An open aiohttp.ClientSession
+        """
+        loop = asyncio.get_running_loop()
+
+        if self._async_session is not None and self._async_session_loop is not loop:
+            # The loop the session was made on is gone (or is not this one), it cannot be awaited from here
+            self._async_session.detach()
+            self._async_session = None
+
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(
+                # The HTTP Client accepts any certificate the endpoint presents, as `curl -k` did
+                ssl=False if self._enable_http_client else True,
+                limit=self.endpoint.pool_limit,
+                limit_per_host=self.endpoint.pool_limit_per_host,
+                ttl_dns_cache=self.endpoint.dns_cache_ttl,
+                keepalive_timeout=self.endpoint.keepalive_timeout,
+            )
+            headers = {
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "Accept-Encoding": _ACCEPT_ENCODING,
+            }
+
+            # Measure how long new connections take, for the connect timeout
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_start.append(
+                self._on_connection_create_start
+            )
+            trace_config.on_connection_create_end.append(self._on_connection_create_end)
+
+            # Each request sets its own timeouts, see _async_http_url_request
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.endpoint.max_timeout),
+                headers=headers,
+                trace_configs=[trace_config],
+            )
+            self._async_session_loop = loop
+
+        return self._async_session
+
+    async def close(self):
+        """
+        Closes the pooled connections held by this SmartClient, any later query will open a new pool. Also stops
+        the background refresh of the Capability Statement.
+        """
+        self._closed.set()
+
+        if self._async_session is not None:
+            if self._async_session_loop is asyncio.get_running_loop():
+                await self._async_session.close()
+            else:
+                self._async_session.detach()
+
+            self._async_session = None
+            self._async_session_loop = None
+
+        if self.endpoint.enable_http:
+            self.http_session.close()
+
+        if self._enable_http_client:
+            self.http_client_session.close()
+
     def get_endpoint_url(self) -> str:
         """
         Calls `::fhirtypepkg.endpoint.Endpoint.get_url` on the internal endpoint
@@ -357,84 +1078,104 @@ class SmartClient:
         query_url = self.endpoint.get_url() + query
         response = None
 
-        if self._enable_http_client:
-            """
-            Attempt the query using the HTTP Client
-            """
-
-            # Update query_url to contain the params
-            query_url += "?"
-            for param in params:
-                query_url += param[0]
-                query_url += "="
-                query_url += param[1]
-                query_url += "&"
-            query_url = query_url[:-1]
-
-            # Generate an HTTP Response from a curl
-            # Perform an OS level https request and store the output bytes
-            try:
-                output = subprocess.check_output(
-                    ["curl", "-s", "-k", "-D", "-", query_url]
-                )
-
-                # Decode the output and parse it as JSON
+        if not self._enable_http_client and not self._http_session_confirmed:
+            # Checks HTTP session and attempts to reestablish if unsuccessful.
+            self._initialize_http_session()
+            fhir_logger().exception("No HTTP Connection, try reestablishing")
+            raise Exception("No HTTP Connection, reestablishing.")
+
+        attempt, requeues = 1, 0
+        while True:
+            retry_delay = None
+
+            # Wait for our turn, and for any Retry-After the endpoint asked for, before sending
+            with self.rate_limiter.acquire_blocking():
+                self._check_circuit()
+
+                try:
+                    if self._enable_http_client:
+                        """
+                        Attempt the query using the HTTP Client
+                        """
+
+                        # Pooled, in-process session that does not verify certificates
+                        response = self.http_client_session.get(
+                            query_url, params=params
+                        )
 
-                curl_wrapper = FakeSocket(output)
-                curl_response = FakeHTTPResponse(curl_wrapper)
+                    else:
+                        """
+                        Attempt the query using the HTTP Session
+                        """
+                        # Only include the params list if there are params to include, otherwise Requests gets mad
+                        if len(params) > 0:
+                            response = self.http_session.get(query_url, params=params)
+                        else:
+                            response = self.http_session.get(
+                                self.endpoint.get_url() + query
+                            )
+                except requests.RequestException as e:
+                    self.circuit_breaker.record_failure()
 
-                request_parse = requests.PreparedRequest()
-                request_parse.url = query_url
+                    retry_delay = self._retry_delay(query_url, attempt, exception=e)
+                    if retry_delay is None:
+                        raise
 
-                adapter = requests.adapters.HTTPAdapter()
-                response = adapter.build_response(request_parse, curl_response)
+            if retry_delay is None:
+                self._record_status(response.status_code)
 
-            except subprocess.CalledProcessError as e:
-                response = FakeHTTPResponse(None)
+                if self._requeue_throttled(
+                    query_url, response.status_code, response.headers, requeues
+                ):
+                    requeues += 1
+                    continue
 
-        else:
-            """
-            Attempt the query using the HTTP Session
-            """
-            # Checks HTTP session and attempts to reestablish if unsuccessful.
-            if not self._http_session_confirmed:
-                self._initialize_http_session()
-                fhir_logger().exception("No HTTP Connection, try reestablishing")
-                raise Exception("No HTTP Connection, reestablishing.")
+                retry_delay = self._retry_delay(
+                    query_url, attempt, status=response.status_code
+                )
+                if retry_delay is None:
+                    break
 
-            # Only include the params list if there are params to include, otherwise Requests gets mad
-            if len(params) > 0:
-                response = self.http_session.get(query_url, params=params)
-            else:
-                response = self.http_session.get(self.endpoint.get_url() + query)
+            # Back off outside the rate limiter, so other requests may be sent meanwhile
+            time.sleep(retry_delay)
+            attempt += 1
 
         # Check the status
         if 200 <= response.status_code < 300:
             self._http_session_confirmed = True
         else:
-            if self._enable_http_client:
-                raise requests.RequestException(response=response)
-            else:
-                raise requests.RequestException(
-                    response=response, request=response.request
-                )
+            raise requests.RequestException(response=response, request=response.request)
 
         return response
 
-    async def _async_http_query(self, query: str, params: list) -> str:
+    async def _async_http_query(self, query: str, params: list) -> bytes:
         """
-        Sends a query to the API via an asynchronous HTTP GET request and returns the body string unchanged. Cannot
-        be used with HTTP_Client_Enabled
+        Sends a query to the API via an asynchronous HTTP GET request and returns the body bytes undecoded. With
+        HTTP_Client_Enabled the endpoint's certificate is not verified.
 
         :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
         :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
         or an empty list to include no parameters
-        :return: A string, the body of the response
+        :return: The (decompressed) bytes of the body of the response
+        """
+        response, body = await self._async_http_request(query, params)
+        check_response_status(response)
+
+        return body
+
+    async def _async_http_request(
+        self, query: str, params: list, headers: dict or None = None
+    ) -> tuple[aiohttp.ClientResponse, bytes]:
         """
-        # Stage the connection to this endpoint
-        connector = aiohttp.TCPConnector(limit=400)
-        headers = {"Accept": "application/json", "Content-Type": "application/json"}
+        Sends an asynchronous HTTP GET request over this SmartClient's pooled session and reads the whole body,
+        whatever the status of the response.
 
+        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
+        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
+        or an empty list to include no parameters
+        :param headers: Extra request headers, or None
+        :return: A 2-tuple of the (released) response, for its status and headers, and the (decompressed) body bytes
+        """
         # Build the query url
         query_url = self.endpoint.get_url() + query
         query_url += "?"
@@ -445,27 +1186,326 @@ class SmartClient:
             query_url += "&"
         query_url = query_url[:-1]
 
-        async with aiohttp.ClientSession(
-            connector=connector, timeout=aiohttp.ClientTimeout(6000), headers=headers
-        ) as session:
-            async with session.get(query_url) as response:
-                if response.status != 200:
-                    fhir_logger().error("Query Url: ", query_url)
-                    raise aiohttp.ClientResponseError
-                else:
-                    return await response.text()
+        return await self._async_http_url_request(query_url, headers)
 
-    def _http_json_query(self, query: str, params: list) -> dict:
+    async def _async_http_url_request(
+        self, query_url: str, headers: dict or None = None
+    ) -> tuple[aiohttp.ClientResponse, bytes]:
         """
-        Sends a query to the API via an HTTP GET request, accepts as json and deserializes.
-        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
-        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
-        or an empty list to include no parameters
-        :return: A list, deserialized from json response
+        Sends an asynchronous HTTP GET request for a complete URL (e.g. the next page of a Bundle) over this
+        SmartClient's pooled session and reads the whole body, whatever the status of the response.
+
+        With `hedge_requests` enabled on the endpoint, a request that has not been answered by the endpoint's p95
+        latency for the operation is sent a second time, and whichever answers first is used (the other is
+        cancelled). Hedges are limited by `::fhirtypepkg.client.SmartClient.hedge_budget`.
+
+        :param query_url: The URL to GET, relative URLs are taken against the endpoint's URL
+        :param headers: Extra request headers, or None
+        :return: A 2-tuple of the (released) response, for its status and headers, and the (decompressed) body bytes
         """
-        try:
-            response = self._http_query(query, params=params)
-        except requests.RequestException as e:
+        if not self.endpoint.hedge_requests:
+            return await self._async_http_url_attempt(query_url, headers)
+
+        self.hedge_budget.deposit()
+
+        # Only hedge once there are enough samples to know what a slow request is
+        operation_name = current_operation.get()
+        hedge_delay = None
+        if self.latency.count(operation_name) >= self.latency.min_samples:
+            hedge_delay = self.latency.percentile(operation_name, 0.95)
+
+        if hedge_delay is None:
+            return await self._async_http_url_attempt(query_url, headers)
+
+        first = asyncio.create_task(self._async_http_url_attempt(query_url, headers))
+        attempts = {first}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=hedge_delay)
+
+            if not done and self.hedge_budget.withdraw():
+                attempts.add(
+                    asyncio.create_task(
+                        self._async_http_url_attempt(query_url, headers)
+                    )
+                )
+
+            # Take the first attempt to answer, unless it failed and another is still running
+            while True:
+                done, pending = await asyncio.wait(
+                    attempts, return_when=asyncio.FIRST_COMPLETED
+                )
+                answered = [task for task in done if task.exception() is None]
+
+                if answered or not pending:
+                    winner = answered[0] if answered else done.pop()
+                    if winner is not first:
+                        self.hedge_budget.record_win()
+                    return winner.result()
+
+                attempts = pending
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def _async_http_url_attempt(
+        self, query_url: str, headers: dict or None = None
+    ) -> tuple[aiohttp.ClientResponse, bytes]:
+        """
+        Sends a single attempt of `::fhirtypepkg.client.SmartClient._async_http_url_request`, reporting its outcome to
+        the circuit breaker and its latency to the latency histograms.
+
+        :param query_url: The URL to GET, relative URLs are taken against the endpoint's URL
+        :param headers: Extra request headers, or None
+        :return: A 2-tuple of the (released) response, for its status and headers, and the (decompressed) body bytes
+        """
+        query_url = urljoin(self.endpoint.get_url(), query_url)
+
+        attempt, requeues = 1, 0
+        while True:
+            retry_delay = None
+
+            # Wait for our turn, and for any Retry-After the endpoint asked for, before sending
+            async with self.rate_limiter.acquire():
+                self._check_circuit()
+
+                # Reuse the pooled connection to this endpoint
+                session = await self._get_async_session()
+
+                # Timeouts derived from how long this kind of request usually takes on this endpoint
+                operation_name = current_operation.get()
+                connect_timeout, read_timeout = self.latency.timeouts(operation_name)
+                timeout = aiohttp.ClientTimeout(
+                    total=connect_timeout + read_timeout, sock_connect=connect_timeout
+                )
+
+                started = time.monotonic()
+                try:
+                    async with session.get(
+                        query_url, headers=headers, timeout=timeout
+                    ) as response:
+                        if (
+                            not (200 <= response.status < 400)
+                            and response.status != 429
+                        ):
+                            fhir_logger().error("Query Url: %s", query_url)
+
+                        body = await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.circuit_breaker.record_failure()
+
+                    # Recorded at the timeout it hit, so that the timeouts of an endpoint that has slowed down grow
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.latency.record(operation_name, time.monotonic() - started)
+
+                    retry_delay = self._retry_delay(query_url, attempt, exception=e)
+                    if retry_delay is None:
+                        raise
+
+            if retry_delay is None:
+                if response.status < 500 and response.status != 429:
+                    self.latency.record(operation_name, time.monotonic() - started)
+                self._record_status(response.status)
+
+                if self._requeue_throttled(
+                    query_url, response.status, response.headers, requeues
+                ):
+                    requeues += 1
+                    continue
+
+                retry_delay = self._retry_delay(
+                    query_url, attempt, status=response.status
+                )
+                if retry_delay is None:
+                    return response, body
+
+            # Back off outside the rate limiter, so other requests may be sent meanwhile
+            await asyncio.sleep(retry_delay)
+            attempt += 1
+
+    def _retry_delay(
+        self,
+        query_url: str,
+        attempt: int,
+        status: int or None = None,
+        exception: BaseException or None = None,
+    ) -> float or None:
+        """
+        Decides whether a request that failed (or was answered) is sent again under the endpoint's retry policy, see
+        `::fhirtypepkg.retry.RetryPolicy`.
+
+        :param query_url: The URL that was requested
+        :param attempt: The number of attempts made so far
+        :param status: The status of the response, if there was one
+        :param exception: The exception the request raised, if it did
+        :return: Seconds to wait before sending it again, or None if it should not be sent again
+        """
+        if exception is not None:
+            retryable = self.retry_policy.is_retryable_exception(exception)
+        else:
+            retryable = self.retry_policy.is_retryable_status(status)
+
+        if not retryable:
+            if exception is None:
+                self.retry_policy.record_outcome(attempt)
+            return None
+
+        delay = self.retry_policy.next_delay(attempt)
+
+        if delay is not None:
+            fhir_logger().warning(
+                "Attempt %s of %s on %s (%s) failed (%s), retrying in %.2fs.",
+                attempt,
+                self.retry_policy.max_attempts,
+                self.get_endpoint_name(),
+                query_url,
+                exception if exception is not None else status,
+                delay,
+            )
+
+        return delay
+
+    def _requeue_throttled(
+        self, query_url: str, status: int, headers, requeues: int
+    ) -> bool:
+        """
+        Decides whether a request the endpoint throttled (HTTP 429) is sent again. If so, every request to the
+        endpoint is held back for the Retry-After it asked for (1 second if it did not say), so the request goes back
+        in line rather than being lost. A request is sent again at most `max_requeues` times, and never if the
+        endpoint asks to wait longer than `max_retry_after`.
+
+        :param query_url: The URL that was requested
+        :param status: The status of the response
+        :param headers: The headers of the response
+        :param requeues: How many times this request has been sent again already
+        :return: True if the request should be sent again
+        """
+        if status != 429:
+            return False
+
+        retry_after = parse_retry_after(headers.get("Retry-After", None))
+        if retry_after is None:
+            retry_after = 1.0
+
+        if (
+            requeues >= self.endpoint.max_requeues
+            or retry_after > self.endpoint.max_retry_after
+        ):
+            fhir_logger().warning(
+                "%s throttled %s (Retry-After %ss), giving up after %s attempts.",
+                self.get_endpoint_name(),
+                query_url,
+                retry_after,
+                requeues + 1,
+            )
+            return False
+
+        self.rate_limiter.pause(retry_after)
+        self.rate_limiter.record_requeue()
+        fhir_logger().warning(
+            "%s throttled %s, sending it again in %ss.",
+            self.get_endpoint_name(),
+            query_url,
+            retry_after,
+        )
+        return True
+
+    def _check_circuit(self):
+        """
+        Raises ExceptionCircuitOpen, without contacting the endpoint, if its circuit breaker refuses the request.
+        """
+        if not self.circuit_breaker.allow_request():
+            raise ExceptionCircuitOpen(
+                f"{self.get_endpoint_name()} is unavailable, its circuit is open"
+            )
+
+    def _record_status(self, status: int):
+        """
+        Reports a response to the circuit breaker, the endpoint is only held at fault for server errors.
+        :param status: The HTTP status of the response
+        """
+        if status >= 500:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+    def can_search_by_npi(self) -> bool:
+        """
+        Whether the endpoint supports searching practitioners by identifier, so that NPIs are searched upstream
+        rather than only filtered from the results.
+        """
+        return self._can_search_by_npi
+
+    def is_available(self) -> bool:
+        """
+        Whether the endpoint's circuit breaker would let a request through right now.
+        """
+        return self.circuit_breaker.is_available()
+
+    async def _async_http_cached_json_query(self, query: str, params: list) -> dict:
+        """
+        Performs `::fhirtypepkg.client.SmartClient._async_http_json_query` through the shared response cache. A fresh
+        cached response is returned without contacting the endpoint, a stale one is revalidated with its ETag or
+        Last-Modified date so that an unchanged response (HTTP 304) is neither downloaded nor decoded again.
+
+        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
+        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
+        or an empty list to include no parameters
+        :return: A dict, deserialized from json response
+        """
+        cache_key = (self.get_endpoint_url(), query, tuple(sorted(params)))
+        cached = response_cache.lookup(cache_key)
+
+        if cached is not None and response_cache.is_fresh(cached):
+            return cached.value
+
+        headers = {}
+        if cached is not None and cached.can_revalidate():
+            if cached.etag is not None:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified is not None:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response, body = await self._async_http_request(query, params, headers)
+
+        max_age = response_max_age(response.headers)
+
+        if response.status == 304 and cached is not None:
+            response_cache.refresh(cache_key, max_age or 0.0)
+            return cached.value
+
+        check_response_status(response)
+
+        output = loads_json(body)
+
+        if max_age is not None:
+            response_cache.store(
+                cache_key,
+                output,
+                len(body),
+                response.headers.get("ETag", None),
+                response.headers.get("Last-Modified", None),
+                max_age,
+            )
+
+        return output
+
+    def _http_json_query(self, query: str, params: list) -> dict:
+        """
+        Sends a query to the API via an HTTP GET request, accepts as json and deserializes.
+        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
+        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
+        or an empty list to include no parameters
+        :return: A list, deserialized from json response
+        """
+        try:
+            response = self._http_query(query, params=params)
+        except (requests.RequestException, ExceptionCircuitOpen) as e:
+            fhir_logger().warning(
+                "Query %s to %s failed, returning no results. (%s)",
+                query,
+                self.get_endpoint_name(),
+                e,
+            )
             return {}
 
         # Used to check the content type of the response, only accepts those types specified in fhirtype
@@ -473,10 +1513,7 @@ class SmartClient:
             response.headers["content-type"]
         )
 
-        output = json.loads(response.text)
-
-        if self._enable_http_client:
-            self._release_http_client()
+        output = loads_json(response.content)
 
         try:
             # dict (analog of Location) / dict (analog of Organization)
@@ -539,13 +1576,203 @@ class SmartClient:
         except requests.RequestException as e:
             return {}
 
-        output = json.loads(response)
+        output = loads_json(response)
 
         return output
 
+    async def _async_http_url_json_query(self, query_url: str) -> dict:
+        """
+        Sends an ASYNCHRONOUS HTTP GET request for a complete URL, accepts as json and deserializes.
+        :param query_url: The URL to GET (e.g. the next page of a Bundle)
+        :return: A dict, deserialized from json response
+        """
+        response, body = await self._async_http_url_request(query_url)
+        check_response_status(response)
+
+        return loads_json(body)
+
+    async def iterate_search_pages(
+        self,
+        query: str,
+        params: list,
+        cached: bool = True,
+        max_pages: int or None = None,
+        prefetch: int or None = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Performs a search and yields each page of the resulting Bundle as JSON, following `link[relation=next]`. The
+        next pages are fetched in the background while the caller works through the current one, but never more than
+        `prefetch` pages ahead, so memory stays flat however many pages there are. Stopping early (or closing the
+        iterator) cancels any page still being fetched.
+
+        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
+        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
+        or an empty list to include no parameters
+        :param cached: Whether the first page goes through the shared response cache, see
+        `::fhirtypepkg.client.SmartClient._async_http_cached_json_query`
+        :param max_pages: The most pages to fetch, None to follow every next link
+        :param prefetch: How many pages may be fetched ahead of the caller, defaults to the endpoint's `page_prefetch`
+        :return: An async iterator of JSON Objects, one per page
+        """
+        if prefetch is None:
+            prefetch = self.endpoint.page_prefetch
+
+        pages = asyncio.Queue(maxsize=max(1, prefetch))
+
+        async def fetch_pages():
+            try:
+                if cached:
+                    page = await self._async_http_cached_json_query(query, params)
+                else:
+                    page = await self._async_http_json_query(query, params)
+                page_count = 1
+
+                while True:
+                    next_url = bundle_next_url(page)
+                    await pages.put(page)
+
+                    if next_url is None:
+                        break
+
+                    if max_pages is not None and page_count >= max_pages:
+                        fhir_logger().warning(
+                            "Stopped following %s results from %s after %s pages.",
+                            query,
+                            self.get_endpoint_name(),
+                            page_count,
+                        )
+                        break
+
+                    page = await self._async_http_url_json_query(next_url)
+                    page_count += 1
+
+            except Exception as e:
+                await pages.put(e)
+            else:
+                await pages.put(None)
+
+        producer = asyncio.create_task(fetch_pages())
+        try:
+            while True:
+                page = await pages.get()
+
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+
+                yield page
+        finally:
+            producer.cancel()
+
+    async def iterate_search(
+        self,
+        query: str,
+        params: list,
+        cached: bool = True,
+        max_pages: int or None = None,
+        prefetch: int or None = None,
+    ) -> AsyncIterator[DomainResource]:
+        """
+        Performs a search and yields each resource of the resulting Bundle as it is parsed, across every page (see
+        `::fhirtypepkg.client.SmartClient.iterate_search_pages`). References are left unresolved. Callers that stop
+        early should close the iterator, e.g. with `contextlib.aclosing`.
+
+        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
+        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
+        or an empty list to include no parameters
+        :param cached: Whether the first page goes through the shared response cache
+        :param max_pages: The most pages to fetch, None to follow every next link
+        :param prefetch: How many pages may be fetched ahead of the caller, defaults to the endpoint's `page_prefetch`
+        :return: An async iterator of FHIR Resources
+        """
+        pages = self.iterate_search_pages(query, params, cached, max_pages, prefetch)
+        try:
+            async for page in pages:
+                for entry in page.get("entry", None) or []:
+                    try:
+                        resource = fhirclient.models.bundle.BundleEntry(entry).resource
+                    except FHIRValidationError as e:
+                        fhir_logger().warning(
+                            "Skipping an entry of %s results from %s that could not be parsed. (%s)",
+                            query,
+                            self.get_endpoint_name(),
+                            e,
+                        )
+                        continue
+
+                    if resource is not None:
+                        yield resource
+        finally:
+            await pages.aclose()
+
+    async def _collect_search(self, query: str, params: list, cached=True) -> list:
+        """
+        Performs a search and collects every resource of the resulting Bundle, up to the endpoint's
+        `max_search_pages`.
+        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
+        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
+        or an empty list to include no parameters
+        :param cached: Whether the first page goes through the shared response cache
+        :return: A list of FHIR Resources
+        """
+
+        async def collect():
+            return [
+                resource
+                async for resource in self.iterate_search(
+                    query, params, cached, self.endpoint.max_search_pages
+                )
+            ]
+
+        # Concurrent callers with the same search share its result, each gets a list of its own
+        flight_key = (self.get_endpoint_url(), query, tuple(sorted(params)), cached)
+        return list(await search_flights.do(flight_key, collect))
+
+    async def _collect_search_json(
+        self, query: str, params: list, cached=True, combined_searches: int = 1
+    ) -> list:
+        """
+        Performs a search and collects every resource of the resulting Bundle as JSON, up to the endpoint's
+        `max_search_pages`. No fhirclient models are built, so nothing is validated. The JSON Objects may be shared
+        with the response cache and with concurrent callers, they must not be changed.
+        :param query: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
+        :param params: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
+        or an empty list to include no parameters
+        :param cached: Whether the first page goes through the shared response cache
+        :param combined_searches: How many searches this one stands for, e.g. the NPIs ORed into it, each of which
+        may follow `max_search_pages` pages
+        :return: A list of JSON Objects
+        """
+
+        async def collect():
+            resources = []
+            async for page in self.iterate_search_pages(
+                query,
+                params,
+                cached,
+                self.endpoint.max_search_pages * combined_searches,
+            ):
+                for entry in page.get("entry", None) or []:
+                    resource = entry.get("resource", None)
+                    if resource:
+                        resources.append(resource)
+            return resources
+
+        flight_key = (
+            self.get_endpoint_url(),
+            query,
+            tuple(sorted(params)),
+            cached,
+            combined_searches,
+            "json",
+        )
+        return list(await search_flights.do(flight_key, collect))
+
     def _parse_json_to_domain_resources(self, res: dict) -> list:
         """
-        Sends a query to the API via an HTTP GET request, parses to a list of FHIR Resources.
+        Parses a JSON response to a list of FHIR Resources, references are left unresolved (see
+        `::fhirtypepkg.client.SmartClient._async_resolve_references`).
         :param self: The query to perform against the endpoint's URL (e.g. endpoint.com/QUERY)
         :param res: A list of 2-tuples of parameters (e.g. [(A, 1)] would yield endpoint.com/QUERY?A=1),
         or an empty list to include no parameters
@@ -571,47 +1798,181 @@ class SmartClient:
         else:
             parsed = [res]
 
-        try:
-            # If the response has a LOCATION or ORGANIZATION reference, resolve that to a DomainResources
-            for h in range(len(parsed)):
-                domain_resource = parsed[h]
-                if hasattr(domain_resource, localize("location")):
-                    if type(domain_resource.location) is list:
-                        for i in range(len(domain_resource.location)):
-                            parsed[h].location[i] = loc.Location(
-                                resolve_reference(self, domain_resource.location[i])
-                            )
+        return parsed
 
-                    elif (
-                        type(domain_resource.location)
-                        is fhirclient.models.fhirreference.FHIRReference
-                    ):
-                        parsed[h].location = loc.Location(
-                            resolve_reference(self, domain_resource.location)
-                        )
+    def _reference_cache_key(self, reference: str) -> tuple[str, str]:
+        """
+        Builds the key that a reference from this endpoint is stored under in the shared reference cache.
+        :param reference: A relative or absolute reference
+        :return: A 2-tuple of (endpoint URL, absolute reference)
+        """
+        if reference.startswith("http://") or reference.startswith("https://"):
+            return self.get_endpoint_url(), reference
 
-                if hasattr(domain_resource, localize("organization")):
-                    if type(domain_resource.organization) is list:
-                        for i in range(len(domain_resource.organization)):
-                            parsed[h].organization[i] = org.Organization(
-                                resolve_reference(self, domain_resource.organization[i])
-                            )
+        return self.get_endpoint_url(), self.get_endpoint_url() + reference
 
-                    elif (
-                        type(domain_resource.organization)
-                        is fhirclient.models.fhirreference.FHIRReference
-                    ):
-                        parsed[h].organization = org.Organization(
-                            resolve_reference(self, domain_resource.organization)
-                        )
+    def _resolve_references(self, resources: list):
+        """
+        Resolves the LOCATION and ORGANIZATION references of the given DomainResources in place, blocking while each
+        distinct reference is fetched. Prefer `::fhirtypepkg.client.SmartClient._async_resolve_references`.
+        :param resources: A list of DomainResources (e.g. PractitionerRoles)
+        """
+        unresolved = collect_unresolved_references(resources)
 
-        except TypeError as e:
+        resolved = {}
+        for reference in unresolved:
+            cache_key = self._reference_cache_key(reference)
+            resolved[reference] = reference_cache.get(cache_key)
+
+            if resolved[reference] is None:
+                with operation(REFERENCE):
+                    resolved[reference] = self._http_json_query(reference, [])
+
+                if resolved[reference]:
+                    reference_cache.set(cache_key, resolved[reference])
+
+        apply_resolved_references(unresolved, resolved)
+
+    async def _async_fetch_reference(self, reference: str) -> dict:
+        """
+        GETs a single reference, an unreachable reference is logged and resolves to an empty JSON Object.
+        :param reference: A relative reference (e.g. Location/123)
+        :return: JSON Object of the referenced resource
+        """
+        try:
+            return await search_flights.do(
+                (self.get_endpoint_url(), reference),
+                lambda: self._async_http_json_query(reference, []),
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, ExceptionCircuitOpen) as e:
             fhir_logger().warning(
-                "Caught a TypeError while resolving a reference, could have been a None reference. (%s)",
+                "Could not fetch reference %s from %s. (%s)",
+                reference,
+                self.get_endpoint_name(),
                 e,
             )
+            return {}
 
-        return parsed
+    async def _async_fetch_references_by_id(
+        self, resource_type: str, ids: list
+    ) -> dict:
+        """
+        Fetches many resources of one type with a single `_id=a,b,c` search.
+        :param resource_type: The type of each resource (e.g. Location)
+        :param ids: The ids of the resources to fetch
+        :return: A dict of id to JSON Object, ids the endpoint did not return are left out
+        """
+        found = {}
+        try:
+            async for bundle in self.iterate_search_pages(
+                resource_type,
+                [("_id", ",".join(ids))],
+                cached=False,
+                max_pages=self.endpoint.max_search_pages,
+            ):
+                for entry in bundle.get("entry", None) or []:
+                    resource = entry.get("resource", None) or {}
+                    if (
+                        resource.get("resourceType") == resource_type
+                        and resource.get("id") in ids
+                    ):
+                        found[resource.get("id")] = resource
+        except (aiohttp.ClientError, asyncio.TimeoutError, ExceptionCircuitOpen) as e:
+            fhir_logger().warning(
+                "Could not search %s by _id on %s. (%s)",
+                resource_type,
+                self.get_endpoint_name(),
+                e,
+            )
+
+        return found
+
+    async def _async_fetch_references(self, references: list) -> dict:
+        """
+        Fetches every given reference at once. References to a resource type that the endpoint can search by `_id`
+        are fetched in batches with `_id=a,b,c` searches, any others (or any a batch did not return) are fetched with
+        concurrent GETs.
+        :param references: A list of distinct reference strings
+        :return: A dict of reference string to JSON Object
+        """
+        resolved = {}
+        single_references = []
+        batches = {}
+
+        for reference in references:
+            # A reference that was fetched recently, by any SmartClient for this endpoint, is not fetched again
+            cached = reference_cache.get(self._reference_cache_key(reference))
+            if cached is not None:
+                resolved[reference] = cached
+                continue
+
+            split = split_reference(reference)
+
+            if split is not None and self._supports_search_param(split[0], "_id"):
+                resource_type, _id = split
+                batches.setdefault(resource_type, {}).setdefault(_id, []).append(
+                    reference
+                )
+            else:
+                single_references.append(reference)
+
+        batch_searches = []
+        for resource_type, id_references in batches.items():
+            # A lone id is as cheap to GET directly
+            if len(id_references) == 1:
+                for references_to_id in id_references.values():
+                    single_references.extend(references_to_id)
+                continue
+
+            ids = list(id_references)
+            for i in range(0, len(ids), _REFERENCE_BATCH_SIZE):
+                batch_searches.append(
+                    (resource_type, ids[i : i + _REFERENCE_BATCH_SIZE])
+                )
+
+        batch_responses = await asyncio.gather(
+            *(
+                self._async_fetch_references_by_id(resource_type, ids)
+                for resource_type, ids in batch_searches
+            )
+        )
+
+        fetched = {}
+        for (resource_type, ids), found in zip(batch_searches, batch_responses):
+            for _id in ids:
+                for reference in batches[resource_type][_id]:
+                    if _id in found:
+                        fetched[reference] = found[_id]
+                    else:
+                        single_references.append(reference)
+
+        single_responses = await asyncio.gather(
+            *(self._async_fetch_reference(reference) for reference in single_references)
+        )
+        fetched.update(zip(single_references, single_responses))
+
+        for reference, resource_json in fetched.items():
+            if resource_json:
+                reference_cache.set(self._reference_cache_key(reference), resource_json)
+
+        resolved.update(fetched)
+
+        return resolved
+
+    async def _async_resolve_references(self, resources: list):
+        """
+        Resolves the LOCATION and ORGANIZATION references of the given DomainResources in place. Every distinct
+        reference across all the resources is fetched once, and all of them are fetched together.
+        :param resources: A list of DomainResources (e.g. PractitionerRoles)
+        """
+        unresolved = collect_unresolved_references(resources)
+
+        if not unresolved:
+            return
+
+        with operation(REFERENCE):
+            resolved = await self._async_fetch_references(list(unresolved))
+        apply_resolved_references(unresolved, resolved)
 
     def _fhir_query(self, search: FHIRSearch, resolve_references=True) -> list:
         """
@@ -623,60 +1984,63 @@ class SmartClient:
         """
         output = None
 
-        try:
-            output = search.perform_resources(self.smart.server)
-        except FHIRValidationError as e:
-            fhir_logger().exception(
-                f"## FHIRValidationError: {e}"
-            )  # TODO: Need to understand this exception
-        except HTTPError as e:
-            fhir_logger().exception(f"## HTTPError: {e}")
-        except SSLError as e:
-            fhir_logger().exception(f"## SSLError: {e}")
-
-        if resolve_references:
+        attempt, requeues = 1, 0
+        while True:
             try:
-                # List of prac.Practitioner / List of pracrole.PractitionerRole
-                # If the response has a LOCATION or ORGANIZATION reference, resolve that to a DomainResources
-                for h in range(len(output)):
-                    domain_resource = output[h]
-                    if hasattr(domain_resource, localize("location")):
-                        if type(domain_resource.location) is list:
-                            for i in range(len(domain_resource.location)):
-                                output[h].location[i] = loc.Location(
-                                    resolve_reference(self, domain_resource.location[i])
-                                )
-
-                        elif (
-                            type(domain_resource.location)
-                            is fhirclient.models.fhirreference.FHIRReference
-                        ):
-                            output[h].location = loc.Location(
-                                resolve_reference(self, domain_resource.location)
-                            )
+                # Wait for our turn, and for any Retry-After the endpoint asked for, before sending
+                with self.rate_limiter.acquire_blocking():
+                    self._check_circuit()
+                    output = search.perform_resources(self.smart.server)
+                self.circuit_breaker.record_success()
+                self.retry_policy.record_outcome(attempt)
+            except FHIRValidationError as e:
+                self.circuit_breaker.record_success()
+                fhir_logger().exception(
+                    f"## FHIRValidationError: {e}"
+                )  # TODO: Need to understand this exception
+            except HTTPError as e:
+                if e.response is not None:
+                    self._record_status(e.response.status_code)
+
+                    if self._requeue_throttled(
+                        search.construct(),
+                        e.response.status_code,
+                        e.response.headers,
+                        requeues,
+                    ):
+                        requeues += 1
+                        continue
+
+                    retry_delay = self._retry_delay(
+                        search.construct(), attempt, status=e.response.status_code
+                    )
+                    if retry_delay is not None:
+                        time.sleep(retry_delay)
+                        attempt += 1
+                        continue
+                else:
+                    self.circuit_breaker.record_failure()
+                fhir_logger().exception(f"## HTTPError: {e}")
+            except SSLError as e:
+                self.circuit_breaker.record_failure()
+                fhir_logger().exception(f"## SSLError: {e}")
+            except requests.RequestException as e:
+                self.circuit_breaker.record_failure()
+
+                retry_delay = self._retry_delay(
+                    search.construct(), attempt, exception=e
+                )
+                if retry_delay is None:
+                    raise
 
-                    if hasattr(domain_resource, localize("organization")):
-                        if type(domain_resource.organization) is list:
-                            for i in range(len(domain_resource.organization)):
-                                output[h].organization[i] = org.Organization(
-                                    resolve_reference(
-                                        self, domain_resource.organization[i]
-                                    )
-                                )
-
-                        elif (
-                            type(domain_resource.organization)
-                            is fhirclient.models.fhirreference.FHIRReference
-                        ):
-                            output[h].organization = org.Organization(
-                                resolve_reference(self, domain_resource.organization)
-                            )
+                time.sleep(retry_delay)
+                attempt += 1
+                continue
 
-            except TypeError as e:
-                fhir_logger().warning(
-                    "Caught a TypeError while resolving a reference, could have been a None reference. (%s)",
-                    e,
-                )
+            break
+
+        if resolve_references and output is not None:
+            self._resolve_references(output)
 
         return output
 
@@ -697,10 +2061,56 @@ class SmartClient:
         else:
             search = http_build_search_practitioner(name_family, name_given, None)
 
-        res = await self._async_http_json_query(
-            localize("titlecase practitioner"), search
+        with operation(PRACTITIONER):
+            return await self._collect_search(
+                localize("titlecase practitioner"), search
+            )
+
+    async def _http_query_practitioner_graph(
+        self, name_family: str, name_given: str, npi: str, graph_params: list
+    ) -> list:
+        """
+        Searches for practitioners as `::fhirtypepkg.client.SmartClient._http_query_practitioner` does, but also
+        includes each practitioner's PractitionerRoles, Locations and Organizations in the same response. References
+        between the returned resources are resolved locally, any that the endpoint did not include are fetched.
+        :param name_given: Given name, or first name, of the search
+        :param name_family: Family name, or last name, of the search
+        :param npi: [formatted 0000000000] National Physician Identifier
+        :param graph_params: The output of `::fhirtypepkg.client.SmartClient._graph_search_params`
+        :rtype: list
+        :return: Every resource in the response, Practitioners and PractitionerRoles alike
+        """
+        if self._can_search_by_npi:
+            search = http_build_search_practitioner(name_family, name_given, npi)
+        else:
+            search = http_build_search_practitioner(name_family, name_given, None)
+
+        with operation(PRACTITIONER):
+            resources = await self._collect_search(
+                localize("titlecase practitioner"), search + graph_params
+            )
+
+        # Resources that were included to be referenced by the others
+        included = {}
+        for resource in resources:
+            if isinstance(resource, tuple(_RESOLVABLE_REFERENCES.values())):
+                included[(resource.resource_type, resource.id)] = resource
+
+        unresolved = collect_unresolved_references(resources)
+
+        resolved = {}
+        for reference in unresolved:
+            split = split_reference(reference)
+            if split in included:
+                resolved[reference] = included[split]
+
+        apply_resolved_references(
+            {ref: unresolved[ref] for ref in resolved},
+            resolved,
         )
-        return self._parse_json_to_domain_resources(res)
+        await self._async_resolve_references(resources)
+
+        return resources
 
     def _fhir_query_practitioner(
         self,
@@ -744,11 +2154,15 @@ class SmartClient:
         :rtype: list
         :return: Results of the search
         """
-        res = await self._async_http_json_query(
-            localize("title case PractitionerRole"),
-            http_build_search_practitioner_role(practitioner),
-        )
-        return self._parse_json_to_domain_resources(res)
+        with operation(ROLE):
+            practitioner_roles = await self._collect_search(
+                localize("title case PractitionerRole"),
+                http_build_search_practitioner_role(practitioner),
+                cached=False,
+            )
+        await self._async_resolve_references(practitioner_roles)
+
+        return practitioner_roles
 
     def _fhir_query_practitioner_role(
         self, practitioner: prac.Practitioner, resolve_references=False
@@ -760,9 +2174,10 @@ class SmartClient:
         :rtype: list
         :return: Results of the search
         """
-        return self._fhir_query(
-            fhir_build_search_practitioner_role(practitioner), resolve_references
-        )
+        with operation(ROLE):
+            return self._fhir_query(
+                fhir_build_search_practitioner_role(practitioner), resolve_references
+            )
 
     def find_endpoint_metadata(self, request_string: str) -> CapabilityStatement:
         """
@@ -804,31 +2219,14 @@ class SmartClient:
                 - list: A list of practitioners (as FHIR resources) that match the first name and last name. If a practitioner also matches the NPI, the list will contain only that practitioner.
                 - list: A list of dictionaries of standardized data for the practitioner that matches the NPI. If no practitioner matches the NPI, an empty dictionary is returned.
         """
-        if not npi or len(npi) < 10:
-            raise ValueError(
-                f"Error npi not correct for search parameters value: {npi}"
-            )
+        check_search_npi(npi)
 
         # We only use HTTP, this supports async requests whereas SmartOnFhir does not
         practitioners_response = await self._http_query_practitioner(
             name_family, name_given, npi
         )
 
-        prac_resources, filtered_prac = [], []
-        unique_identifiers = set()
-
-        if practitioners_response and len(practitioners_response) > 0:
-            for practitioner in practitioners_response:
-                if type(practitioner) is prac.Practitioner and practitioner.identifier:
-
-                    for _id in practitioner.identifier:
-                        if (
-                            _id.system == "http://hl7.org/fhir/sid/us-npi"
-                            and _id.value == npi
-                        ):
-                            if practitioner.id not in unique_identifiers:
-                                unique_identifiers.add(practitioner.id)
-                                prac_resources.append(practitioner)
+        prac_resources = filter_practitioners_by_npi(practitioners_response, npi)
 
         if len(prac_resources) == 0:
             return None
@@ -865,10 +2263,14 @@ class SmartClient:
                 practitioner
             )
         else:
-            practitioner_roles_response = self._fhir_query_practitioner_role(
-                practitioner, resolve_references
+            # The FHIR Client is blocking, run it off the event loop so other endpoints can be queried meanwhile
+            practitioner_roles_response = await asyncio.to_thread(
+                self._fhir_query_practitioner_role, practitioner, False
             )
 
+            if resolve_references and practitioner_roles_response:
+                await self._async_resolve_references(practitioner_roles_response)
+
         if not practitioner_roles_response:
             return None
 
@@ -946,24 +2348,20 @@ class SmartClient:
         Returns:
         """
 
-        # Find all associated practitioners from this client's remote endpoint
-        practitioners = await self.find_practitioner(
-            name_family, name_given, npi, resolve_references
-        )
-
-        if practitioners is None:
-            return None, None, None
+        # Fetch the whole Practitioner -> PractitionerRole -> Location/Organization graph at once, if possible
+        graph_params = self._graph_search_params() if resolve_references else None
 
-        # Find all associated practitioners roles from this client's remote endpoint
-        practitioner_roles = []
-        for practitioner in practitioners:
-            practitioner_roles_response = await self.find_practitioner_role(
-                practitioner, resolve_references
+        if graph_params is not None:
+            practitioners, practitioner_roles = await self._find_practitioner_graph(
+                name_family, name_given, npi, graph_params
+            )
+        else:
+            practitioners, practitioner_roles = await self._find_practitioner_and_roles(
+                name_family, name_given, npi, resolve_references
             )
 
-            if practitioner_roles_response is not None:
-                for role in practitioner_roles_response:
-                    practitioner_roles.append(role)
+        if practitioners is None:
+            return None, None, None
 
         if practitioner_roles is None:
             return practitioners, None, None
@@ -979,3 +2377,391 @@ class SmartClient:
             return practitioners, practitioner_roles, None
 
         return practitioners, practitioner_roles, practitioner_locations
+
+    async def find_all_practitioner_json(
+        self,
+        name_family: str,
+        name_given: str,
+        npi: str or None,
+    ):
+        """
+        Searches for the same practitioners, roles, locations and organizations as
+        `::fhirtypepkg.client.SmartClient.find_all_practitioner_data`, but leaves every resource as the JSON Object
+        the endpoint sent, without building fhirclient models. Flatten the result with
+        `::fhirtypepkg.flatten.flatten_practitioners_json`.
+
+        Parameters:
+        :param name_given: The first name of the practitioner.
+        :type name_given: string
+        :param name_family: The last name of the practitioner.
+        :type name_family: string
+        :param npi: The National Provider Identifier of the practitioner.
+        :type npi: string
+
+        Returns:
+        :return tuple: A 3-tuple of (practitioners, practitioner roles, resolved references), where resolved
+        references is a dict of each location and organization reference of the roles to the JSON Object it
+        resolved to. Practitioners is None if none matched.
+        """
+        check_search_npi(npi)
+
+        graph_params = self._graph_search_params()
+
+        search = http_build_search_practitioner(
+            name_family, name_given, npi if self._can_search_by_npi else None
+        )
+
+        with operation(PRACTITIONER):
+            resources = await self._collect_search_json(
+                localize("titlecase practitioner"), search + (graph_params or [])
+            )
+
+        practitioners = filter_practitioners_by_npi_json(resources, npi)
+
+        if len(practitioners) == 0:
+            return None, None, None
+
+        if graph_params is not None:
+            candidate_roles = resources
+        else:
+            candidate_roles = await self._find_practitioner_roles_json(practitioners)
+
+        practitioner_roles = select_practitioner_roles_json(
+            candidate_roles, practitioners
+        )
+
+        resolved = await self._resolve_role_references_json(
+            practitioner_roles, resources
+        )
+
+        return practitioners, practitioner_roles, resolved
+
+    async def find_all_practitioner_json_batch(self, searches: list) -> list:
+        """
+        Performs `::fhirtypepkg.client.SmartClient.find_all_practitioner_json` for many practitioners at once, see
+        `::fhirtypepkg.client.SmartClient.iterate_all_practitioner_json_batch`.
+
+        :param searches: A list of 3-tuples of (family name, given name, NPI), each NPI formatted 0000000000
+        :return: A list holding, for each search in the order given, the 3-tuple
+        `::fhirtypepkg.client.SmartClient.find_all_practitioner_json` would have returned for it
+        """
+        found = [(None, None, None) for _ in searches]
+        async for index, practitioner_data in self.iterate_all_practitioner_json_batch(
+            searches
+        ):
+            found[index] = practitioner_data
+
+        return found
+
+    async def iterate_all_practitioner_json_batch(self, searches: list):
+        """
+        Performs `::fhirtypepkg.client.SmartClient.find_all_practitioner_json` for many practitioners at once. Rather
+        than one search per practitioner, the NPIs are ORed into as few `identifier=system|npi,system|npi,...`
+        searches as keep each URL under `_MAX_SEARCH_URL_LENGTH`, and the resources found are handed back to the
+        practitioner they belong to by NPI and name. Only for endpoints that can search by NPI, see
+        `::fhirtypepkg.client.SmartClient.can_search_by_npi`.
+
+        The ORed searches run at the same time, and the practitioners of each are yielded as soon as it and their
+        roles and references are found. Each ORed search may follow `max_search_pages` pages per NPI in it, as many
+        as the searches it replaces. A search that fails is logged and its practitioners are not found, unless every
+        search failed, in which case the error is raised.
+
+        :param searches: A list of 3-tuples of (family name, given name, NPI), each NPI formatted 0000000000
+        :return: An asynchronous generator of 2-tuples of (index of the search, the 3-tuple
+        `::fhirtypepkg.client.SmartClient.find_all_practitioner_json` would have returned for it), once for every
+        search
+        """
+        for _, _, npi in searches:
+            check_search_npi(npi)
+
+        graph_params = self._graph_search_params() or []
+        query = localize("titlecase practitioner")
+
+        npis = list(dict.fromkeys(npi for _, _, npi in searches))
+        identifier_values = http_build_identifier_values(
+            npis,
+            _MAX_SEARCH_URL_LENGTH
+            - len(self.endpoint.get_url() + query)
+            - len(quote("?" + localize("identifier") + "="))
+            - sum(
+                len(quote("&" + key + "=" + value, safe="/&=:"))
+                for key, value in graph_params
+            ),
+        )
+
+        async def find_chunk(value: str):
+            chunk_npis = {token.split("|")[-1] for token in value.split(",")}
+            chunk_searches = [
+                (index, search)
+                for index, search in enumerate(searches)
+                if search[2] in chunk_npis
+            ]
+            try:
+                return chunk_searches, await self._find_practitioner_json_chunk(
+                    query,
+                    [(localize("identifier"), value)] + graph_params,
+                    len(chunk_npis),
+                    chunk_searches,
+                    len(graph_params) > 0,
+                )
+            except Exception as e:
+                return chunk_searches, e
+
+        tasks = [
+            asyncio.ensure_future(find_chunk(value)) for value in identifier_values
+        ]
+        failures = []
+        try:
+            for answered in asyncio.as_completed(tasks):
+                chunk_searches, chunk = await answered
+
+                if isinstance(chunk, Exception):
+                    fhir_logger().error(
+                        "Search of %s NPIs on %s failed, their practitioners were not found. (%s: %s)",
+                        len({npi for _, (_, _, npi) in chunk_searches}),
+                        self.get_endpoint_name(),
+                        type(chunk).__name__,
+                        chunk,
+                    )
+                    failures.append((chunk_searches, chunk))
+                    continue
+
+                for found in chunk:
+                    yield found
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if failures and len(failures) == len(identifier_values):
+            raise failures[0][1]
+
+        for chunk_searches, _ in failures:
+            for index, _ in chunk_searches:
+                yield index, (None, None, None)
+
+    async def _find_practitioner_json_chunk(
+        self,
+        query: str,
+        params: list,
+        combined_searches: int,
+        searches: list,
+        graph_search: bool,
+    ) -> list:
+        """
+        Runs one ORed search of `::fhirtypepkg.client.SmartClient.iterate_all_practitioner_json_batch` and hands the
+        practitioners, roles and references it found back to the searches it was made for.
+
+        :param query: The resource type to search
+        :param params: A list of 2-tuples of the search parameters, including the ORed identifiers
+        :param combined_searches: How many NPIs were ORed into the search
+        :param searches: A list of 2-tuples of (index of the search, 3-tuple of (family name, given name, NPI)) of
+        the searches whose NPI was ORed into it
+        :param graph_search: Whether the parameters include the practitioners' roles, see
+        `::fhirtypepkg.client.SmartClient._graph_search_params`
+        :return: A list of 2-tuples of (index of the search, the 3-tuple
+        `::fhirtypepkg.client.SmartClient.find_all_practitioner_json` would have returned for it)
+        """
+        with operation(PRACTITIONER):
+            resources = await self._collect_search_json(
+                query, params, combined_searches=combined_searches
+            )
+
+        matches = [
+            [
+                practitioner
+                for practitioner in filter_practitioners_by_npi_json(resources, npi)
+                if practitioner_json_matches_name(practitioner, name_family, name_given)
+            ]
+            for _, (name_family, name_given, npi) in searches
+        ]
+
+        if graph_search:
+            candidate_roles = resources
+        else:
+            # One role search per practitioner found, however many searches it matched
+            found = {}
+            for practitioners in matches:
+                for practitioner in practitioners:
+                    found.setdefault(practitioner.get("id", None), practitioner)
+            candidate_roles = (
+                await self._find_practitioner_roles_json(list(found.values()))
+                if found
+                else []
+            )
+
+        roles = [
+            select_practitioner_roles_json(candidate_roles, practitioners)
+            for practitioners in matches
+        ]
+
+        # Each reference is resolved once for the whole search
+        resolved = await self._resolve_role_references_json(
+            [role for practitioner_roles in roles for role in practitioner_roles],
+            resources,
+        )
+
+        return [
+            (
+                index,
+                (
+                    (practitioners, practitioner_roles, resolved)
+                    if len(practitioners) > 0
+                    else (None, None, None)
+                ),
+            )
+            for (index, _), practitioners, practitioner_roles in zip(
+                searches, matches, roles
+            )
+        ]
+
+    async def _resolve_role_references_json(self, roles: list, resources: list) -> dict:
+        """
+        Resolves the location and organization references of PractitionerRole JSON Objects, taking those the search
+        already included and fetching the rest.
+
+        :param roles: A list of PractitionerRole JSON Objects
+        :param resources: The JSON Objects the search returned, which may include Locations and Organizations
+        :return: A dict of each reference to the JSON Object it resolved to, or None if it could not be fetched
+        """
+        # Resources that were included to be referenced by the others
+        included = {}
+        for resource in resources:
+            if resource.get("resourceType", None) in ("Location", "Organization"):
+                included[(resource["resourceType"], resource.get("id", None))] = (
+                    resource
+                )
+
+        resolved = {}
+        for role in roles:
+            references = [
+                (role.get("organization", None) or {}).get("reference", None)
+            ] + [
+                location.get("reference", None)
+                for location in role.get("location", None) or []
+            ]
+
+            for reference in references:
+                if reference is not None and reference not in resolved:
+                    resolved[reference] = included.get(split_reference(reference), None)
+
+        unresolved = [ref for ref, resource in resolved.items() if resource is None]
+        if unresolved:
+            with operation(REFERENCE):
+                resolved.update(await self._async_fetch_references(unresolved))
+
+        return resolved
+
+    async def _find_practitioner_roles_json(self, practitioners: list) -> list:
+        """
+        Looks up the roles of each practitioner, with no more than role_lookup_concurrency lookups in flight.
+        :param practitioners: JSON Objects of the Practitioners
+        :return: A list of JSON Objects of their roles, in the order the practitioners were given
+        """
+        semaphore = asyncio.Semaphore(self.endpoint.role_lookup_concurrency)
+
+        async def find_roles_bounded(practitioner: dict):
+            params = http_build_search(
+                {localize("practitioner"): practitioner.get("id", None)}
+            )
+
+            async with semaphore:
+                with operation(ROLE):
+                    if self._enable_http_client:
+                        return await self._collect_search_json(
+                            localize("title case PractitionerRole"),
+                            params,
+                            cached=False,
+                        )
+
+                    # The FHIR Client is blocking, run it off the event loop so other endpoints can be queried meanwhile
+                    roles = await asyncio.to_thread(
+                        self._fhir_query,
+                        fhir_build_search(prac_role.PractitionerRole, dict(params)),
+                        False,
+                    )
+                    return [role.as_json() for role in roles or []]
+
+        roles_responses = await asyncio.gather(
+            *(find_roles_bounded(practitioner) for practitioner in practitioners)
+        )
+
+        return [role for roles in roles_responses for role in roles]
+
+    async def _find_practitioner_graph(
+        self, name_family: str, name_given: str, npi: str, graph_params: list
+    ):
+        """
+        Finds the practitioners matching the NPI and their roles with a single `_revinclude`/`_include` search.
+        :return: A 2-tuple of (practitioners, practitioner roles), practitioners is None if none matched
+        """
+        check_search_npi(npi)
+
+        resources = await self._http_query_practitioner_graph(
+            name_family, name_given, npi, graph_params
+        )
+
+        practitioners = filter_practitioners_by_npi(resources, npi)
+
+        if len(practitioners) == 0:
+            return None, None
+
+        practitioner_ids = set(practitioner.id for practitioner in practitioners)
+
+        practitioner_roles = []
+        seen_roles = set()  # Track seen roles to avoid duplicates
+        for role in resources:
+            if type(role) is not prac_role.PractitionerRole or role.id in seen_roles:
+                continue
+
+            # Only keep the roles of the practitioners that matched the NPI
+            if role.practitioner is None or role.practitioner.reference is None:
+                continue
+
+            split = split_reference(role.practitioner.reference)
+            if split is not None and split[1] in practitioner_ids:
+                seen_roles.add(role.id)
+                practitioner_roles.append(role)
+
+        return practitioners, practitioner_roles
+
+    async def _find_practitioner_and_roles(
+        self,
+        name_family: str,
+        name_given: str,
+        npi: str or None,
+        resolve_references=True,
+    ):
+        """
+        Finds the practitioners matching the NPI, then looks up each one's roles.
+        :return: A 2-tuple of (practitioners, practitioner roles), practitioners is None if none matched
+        """
+        # Find all associated practitioners from this client's remote endpoint
+        practitioners = await self.find_practitioner(
+            name_family, name_given, npi, resolve_references
+        )
+
+        if practitioners is None:
+            return None, None
+
+        # Find all associated practitioners roles from this client's remote endpoint, all practitioners at once but
+        # with no more than role_lookup_concurrency lookups in flight
+        semaphore = asyncio.Semaphore(self.endpoint.role_lookup_concurrency)
+
+        async def find_roles_bounded(_practitioner: prac.Practitioner):
+            async with semaphore:
+                return await self.find_practitioner_role(
+                    _practitioner, resolve_references
+                )
+
+        # gather returns in the order the practitioners were given, regardless of which lookup finished first
+        practitioner_roles_responses = await asyncio.gather(
+            *(find_roles_bounded(practitioner) for practitioner in practitioners)
+        )
+
+        practitioner_roles = []
+        for practitioner_roles_response in practitioner_roles_responses:
+            if practitioner_roles_response is not None:
+                for role in practitioner_roles_response:
+                    practitioner_roles.append(role)
+
+        return practitioners, practitioner_roles
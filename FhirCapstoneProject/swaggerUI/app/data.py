@@ -1,7 +1,9 @@
 api_description = {
-    "getdata": "Retrieve data from all endpoints or specified endpoints. Given a first name, last name, and NPI the routes retrieve data from all endpoints or specified endpoints. This will return data as JSON, a file, or web page based on their queries. Optionally it could contain an attribute to limit or specify the endpoints used to gather data.",
-    "getlistdata": "Retrieve data from all endpoints or specified endpoints. Given a first name, last name, and NPI returns list of standard objects indexed by NPI number. This will return data as JSON, a file, or web page based on their queries. Replace npi to real value, and fill out the body. Format can be null. (options = page, file)",
+    "getdata": 'Retrieve data from all endpoints or specified endpoints. Given a first name, last name, and NPI the routes retrieve data from all endpoints or specified endpoints. This will return data as JSON, a file, or web page based on their queries, or stream it as newline delimited JSON (format NDJSON) with each record written as soon as its endpoint has answered and the consensus records, if asked for, once every endpoint has. Optionally it could contain an attribute to limit or specify the endpoints used to gather data. Endpoints left out of the results are listed in the X-Timed-Out-Endpoints (missed the request deadline), X-Unavailable-Endpoints (circuit open) and X-Failed-Endpoints (search failed) response headers. Every NDJSON line is an object with a single key: {"record": {...}} for each record, then, if any endpoints were left out, a last line {"partial_results": {...}} with the X-Timed-Out-Endpoints, X-Unavailable-Endpoints and X-Failed-Endpoints values that would otherwise be headers, or a last line {"error": {"message": ..., "status_code": ...}} if a record was invalid once the stream had started.',
+    "getlistdata": 'Retrieve data from all endpoints or specified endpoints. Given a first name, last name, and NPI returns list of standard objects indexed by NPI number. This will return data as JSON, a file, or web page based on their queries, or stream it as newline delimited JSON (format NDJSON) with each record, which carries its NPI, written as soon as its endpoint has found it and the consensus records of each practitioner, if asked for, as soon as every endpoint has answered for them. Replace npi to real value, and fill out the body. Format can be null. (options = page, file) Endpoints left out of the results are listed in the X-Timed-Out-Endpoints, X-Unavailable-Endpoints and X-Failed-Endpoints response headers. Every NDJSON line is an object with a single key: {"record": {...}} for each record, then, if any endpoints were left out, a last line {"partial_results": {...}} with the X-Timed-Out-Endpoints, X-Unavailable-Endpoints and X-Failed-Endpoints values that would otherwise be headers, or a last line {"error": {"message": ..., "status_code": ...}} if a record was invalid once the stream had started.',
     "getconsensus": "Given a group of matched records, return those records with a consensus result and an accuracy score built in.",
     "matchdata": "Given a list of JSON of flattened data, the service should attempt to match records and return all records as list of lists.",
+    "health": "Report the health of each endpoint: whether it has been reached since startup, and the state of its circuit breaker (closed, open or half-open) with its recent request and failure counts. Endpoints whose circuit is open are skipped by searches and listed in the X-Unavailable-Endpoints response header.",
+    "latency": "Export the rolling latency histogram of each endpoint per operation (practitioner search, role search, reference resolve and new connections), with p50, p95 and p99 and the timeout currently derived from them. Buckets are cumulative counts under each upper bound, in seconds. Also reports how many requests were hedged, and how many hedges answered first, on endpoints with hedging enabled, and how many requests were held back by each endpoint's rate limit or sent again after a 429, and how many failed requests were retried, recovered, or gave up (after every attempt, or because the request deadline would have passed).",
     "askai": "The AI will group the provided data into separate lists based off of their NPI, and Street address. Will return the most accurate information to the user.",
 }
@@ -1,6 +1,9 @@
 import asyncio
+import atexit
 import configparser
 import os
+import threading
+import time
 
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -8,7 +11,13 @@ from flask_restx import Api
 
 from FhirCapstoneProject.fhirtypepkg import fhirtype
 from FhirCapstoneProject.fhirtypepkg.endpoint import Endpoint
+from FhirCapstoneProject.fhirtypepkg.eventloop import EventLoopThread
+from FhirCapstoneProject.fhirtypepkg.fhirtype import ExceptionCircuitOpen
 from FhirCapstoneProject.fhirtypepkg.flatten import FlattenSmartOnFHIRObject
+from FhirCapstoneProject.fhirtypepkg.flatten import compile_field_mappings
+from FhirCapstoneProject.fhirtypepkg.flatten import flatten_practitioners_json
+from FhirCapstoneProject.fhirtypepkg.retry import deadline as retry_deadline
+from FhirCapstoneProject.fhirtypepkg.retry import retryable_exception_classes
 from FhirCapstoneProject.fhirtypepkg.smartclient import SmartClient
 from FhirCapstoneProject.model.accuracy import calc_accuracy
 from FhirCapstoneProject.model.analysis import predict
@@ -34,6 +43,41 @@ endpoint_config_parser = configparser.ConfigParser()
 endpoint_config_parser.read_file(open(endpoint_config_path, "r"))
 endpoint_configs = endpoint_config_parser.sections()
 
+
+def get_config_list(section: str, option: str, fallback: str) -> tuple:
+    # A comma separated option of the endpoint config, e.g. "retry_statuses = 502, 503, 504"
+    value = endpoint_config_parser.get(section, option, fallback=fallback)
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+def get_config_field_mappings(section: str) -> dict:
+    # The field mappings of the endpoint config, e.g. "map.location.phone = telecom[system=phone].value | phone"
+    field_mappings = {}
+    for option in endpoint_config_parser.options(section):
+        parts = option.split(".")
+        if len(parts) == 3 and parts[0] == "map":
+            field_mappings.setdefault(parts[1], {})[parts[2]] = (
+                endpoint_config_parser.get(section, option, raw=True)
+            )
+
+    # Refuse invalid mappings here, with the rest of the section, rather than when its Smart Client starts
+    compile_field_mappings(field_mappings)
+
+    return field_mappings
+
+
+def get_config_retry_exceptions(section: str) -> tuple:
+    # The names of the exceptions the endpoint retries, e.g. "retry_exceptions = connection, timeout, payload"
+    retry_exceptions = get_config_list(
+        section, "retry_exceptions", fallback="connection, timeout"
+    )
+
+    # Refuse unknown names here, with the rest of the section, rather than when its Smart Client starts
+    retryable_exception_classes(retry_exceptions)
+
+    return retry_exceptions
+
+
 endpoints = []
 for (
     section
@@ -64,6 +108,101 @@ for (
                 id_prefix=endpoint_config_parser.get(
                     section, "id_prefix", fallback=None
                 ),
+                pool_limit=endpoint_config_parser.getint(
+                    section, "pool_limit", fallback=400
+                ),
+                pool_limit_per_host=endpoint_config_parser.getint(
+                    section, "pool_limit_per_host", fallback=100
+                ),
+                dns_cache_ttl=endpoint_config_parser.getint(
+                    section, "dns_cache_ttl", fallback=300
+                ),
+                keepalive_timeout=endpoint_config_parser.getfloat(
+                    section, "keepalive_timeout", fallback=30.0
+                ),
+                role_lookup_concurrency=endpoint_config_parser.getint(
+                    section, "role_lookup_concurrency", fallback=8
+                ),
+                capability_refresh_interval=endpoint_config_parser.getfloat(
+                    section, "capability_refresh_interval", fallback=3600.0
+                ),
+                max_search_pages=endpoint_config_parser.getint(
+                    section, "max_search_pages", fallback=10
+                ),
+                page_prefetch=endpoint_config_parser.getint(
+                    section, "page_prefetch", fallback=1
+                ),
+                breaker_failure_threshold=endpoint_config_parser.getfloat(
+                    section, "breaker_failure_threshold", fallback=0.5
+                ),
+                breaker_minimum_requests=endpoint_config_parser.getint(
+                    section, "breaker_minimum_requests", fallback=5
+                ),
+                breaker_window_seconds=endpoint_config_parser.getfloat(
+                    section, "breaker_window_seconds", fallback=60.0
+                ),
+                breaker_open_seconds=endpoint_config_parser.getfloat(
+                    section, "breaker_open_seconds", fallback=30.0
+                ),
+                default_timeout=endpoint_config_parser.getfloat(
+                    section, "default_timeout", fallback=30.0
+                ),
+                default_connect_timeout=endpoint_config_parser.getfloat(
+                    section, "default_connect_timeout", fallback=10.0
+                ),
+                min_timeout=endpoint_config_parser.getfloat(
+                    section, "min_timeout", fallback=1.0
+                ),
+                max_timeout=endpoint_config_parser.getfloat(
+                    section, "max_timeout", fallback=120.0
+                ),
+                timeout_headroom=endpoint_config_parser.getfloat(
+                    section, "timeout_headroom", fallback=3.0
+                ),
+                hedge_requests=endpoint_config_parser.getboolean(
+                    section, "hedge_requests", fallback=False
+                ),
+                hedge_budget_ratio=endpoint_config_parser.getfloat(
+                    section, "hedge_budget_ratio", fallback=0.1
+                ),
+                hedge_budget_burst=endpoint_config_parser.getfloat(
+                    section, "hedge_budget_burst", fallback=10.0
+                ),
+                rate_limit=endpoint_config_parser.getfloat(
+                    section, "rate_limit", fallback=0.0
+                ),
+                rate_limit_burst=endpoint_config_parser.getfloat(
+                    section, "rate_limit_burst", fallback=10.0
+                ),
+                max_in_flight=endpoint_config_parser.getint(
+                    section, "max_in_flight", fallback=32
+                ),
+                max_retry_after=endpoint_config_parser.getfloat(
+                    section, "max_retry_after", fallback=60.0
+                ),
+                max_requeues=endpoint_config_parser.getint(
+                    section, "max_requeues", fallback=3
+                ),
+                retry_max_attempts=endpoint_config_parser.getint(
+                    section, "retry_max_attempts", fallback=3
+                ),
+                retry_backoff_base=endpoint_config_parser.getfloat(
+                    section, "retry_backoff_base", fallback=0.2
+                ),
+                retry_backoff_max=endpoint_config_parser.getfloat(
+                    section, "retry_backoff_max", fallback=5.0
+                ),
+                retry_jitter=endpoint_config_parser.getfloat(
+                    section, "retry_jitter", fallback=0.5
+                ),
+                retry_statuses=tuple(
+                    int(status)
+                    for status in get_config_list(
+                        section, "retry_statuses", fallback="502, 503, 504"
+                    )
+                ),
+                retry_exceptions=get_config_retry_exceptions(section),
+                field_mappings=get_config_field_mappings(section),
             )
         )
     except ValueError as e:
@@ -77,22 +216,94 @@ def init_smart_client(endpoint: Endpoint):
     smart_clients[endpoint.name] = SmartClient(endpoint)
 
 
+async def close_all_smart_clients():
+    # Release the pooled connections held by each Smart Client
+    for client in smart_clients.values():
+        await client.close()
+
+
 def init_all_smart_clients():
-    # Instantiate each endpoint as a Smart Client
+    # Instantiate each endpoint as a Smart Client, each one reaches its endpoint in the background
     for endpoint in endpoints:
         init_smart_client(endpoint)
 
+    fhirtype.fhir_logger().info("*** CONNECTING TO ALL ENDPOINTS IN THE BACKGROUND ***")
+    threading.Thread(target=wait_for_all_smart_clients, daemon=True).start()
+
+
+def wait_for_all_smart_clients(timeout: float or None = None) -> bool:
+    # Block until every Smart Client has made its first attempt to reach its endpoint, or the timeout passes
+    loop_deadline = None if timeout is None else time.monotonic() + timeout
+    for client in smart_clients.values():
+        remaining = (
+            None
+            if loop_deadline is None
+            else max(0.0, loop_deadline - time.monotonic())
+        )
+        if not client.wait_until_ready(remaining):
+            return False
+
     fhirtype.fhir_logger().info("*** CONNECTION ESTABLISHED TO ALL ENDPOINTS ***")
+    return True
 
 
 init_all_smart_clients()
 
+# One event loop per worker process, shared by every request it serves
+event_loop = EventLoopThread()
+
+
+def run_async(coroutine):
+    # Run a coroutine on the worker's event loop and block until it finishes, use instead of asyncio.run
+    return event_loop.run(coroutine)
+
+
+def iterate_async(async_iterator):
+    # Iterate an async generator on the worker's event loop from synchronous code, e.g. to stream a response
+    return event_loop.iterate(async_iterator)
+
+
+def shutdown_event_loop():
+    # Release the pooled connections on the loop they were opened on, then stop it
+    event_loop.run(close_all_smart_clients())
+    event_loop.stop(timeout=5)
+
+
+atexit.register(shutdown_event_loop)
+
 
 def get_endpoint_names():
     endpoint_names = [endpoint.name for endpoint in endpoints]
     return ["All"] + endpoint_names
 
 
+def get_endpoint_latency():
+    # The latency histograms and current timeouts of each Smart Client, keyed by endpoint name then operation
+    return {
+        name: {
+            "operations": client.latency.export(),
+            "hedging": client.hedge_budget.stats(),
+            "rate_limit": client.rate_limiter.stats(),
+            "retry": client.retry_policy.stats(),
+        }
+        for name, client in smart_clients.items()
+    }
+
+
+def get_endpoint_health():
+    # The circuit breaker state of each Smart Client, keyed by endpoint name
+    return {
+        name: {"ready": client.is_ready(), **client.circuit_breaker.snapshot()}
+        for name, client in smart_clients.items()
+    }
+
+
+# Time budget, in seconds, that a single search may spend waiting on the endpoints
+request_deadline_seconds = float(os.environ.get("FHIRTYPE_REQUEST_DEADLINE", 30))
+
+# How search results are flattened, "json" straight from the endpoints' responses or "models" through fhirclient
+flatten_engine = os.environ.get("FHIRTYPE_FLATTEN_ENGINE", "json").lower()
+
 api = Api(version="0.0", title="FHIR API", description="FHIR API from PacificSource")
 limiter = Limiter(key_func=get_remote_address)
 
@@ -192,105 +403,611 @@ def search_location(family_name: str, given_name: str, npi: str or None):
     return responses, flatten_data if responses else None
 
 
+async def search_endpoint_practitioner_data(
+    client: SmartClient,
+    family_name: str,
+    given_name: str,
+    npi: str or None,
+):
+    """
+    Searches a single endpoint for a practitioner and flattens every (practitioner, role, location) it returns.
+    Unless FHIRTYPE_FLATTEN_ENGINE is "models", the records are flattened straight from the JSON responses
+    without building fhirclient models, see `::fhirtypepkg.flatten.flatten_practitioners_json`.
+
+    :param client: The SmartClient of the endpoint to search
+    :param family_name: The family name of the practitioner.
+    :param given_name: The given name of the practitioner.
+    :param npi: The NPI of the practitioner.
+    :return: A list of flattened records from this endpoint
+    """
+    if flatten_engine != "models":
+        practitioners, practitioner_roles, resolved = (
+            await client.find_all_practitioner_json(family_name, given_name, npi)
+        )
+
+        if practitioners is None or practitioner_roles is None:
+            return []
+
+        return flatten_practitioners_json(
+            client.get_endpoint_name(), practitioners, practitioner_roles, resolved
+        )
+
+    triples = []
+    flattener = FlattenSmartOnFHIRObject(client.get_endpoint_name())
+
+    practitioners, practitioner_roles, _ = await client.find_all_practitioner_data(
+        family_name, given_name, npi
+    )
+
+    if practitioners is None or practitioner_roles is None:
+        return []
+
+    for practitioner in practitioners:
+        for role in practitioner_roles:
+
+            # Match roles to current practitioner
+            if hasattr(role, "practitioner") and hasattr(
+                role.practitioner, "reference"
+            ):
+                role_id = role.practitioner.reference.split("/")[1]
+            else:
+                continue
+
+            if role_id != practitioner.id:
+                continue
+
+            locations = client.find_practitioner_role_locations(role)
+
+            for location in locations:
+                triples.append((practitioner, role, location))
+
+    # Every record of the endpoint is flattened at once
+    return flattener.flatten_batch(triples)
+
+
+async def search_endpoint_practitioner_batch(client: SmartClient, searches: list):
+    """
+    Searches a single endpoint for many practitioners and flattens what it returns for each, see
+    `iterate_endpoint_practitioner_batch`.
+
+    :param client: The SmartClient of the endpoint to search
+    :param searches: A list of 3-tuples of (family name, given name, NPI)
+    :return: A list holding, for each search in the order given, a list of flattened records from this endpoint
+    """
+    flatten_data = [[] for _ in searches]
+    async for index, records in iterate_endpoint_practitioner_batch(client, searches):
+        flatten_data[index] = records
+
+    return flatten_data
+
+
+async def iterate_endpoint_practitioner_batch(client: SmartClient, searches: list):
+    """
+    Searches a single endpoint for many practitioners and yields the flattened records of each as soon as they are
+    found. An endpoint that can search by NPI is asked in as few searches as the NPIs fit in, see
+    `::fhirtypepkg.client.SmartClient.iterate_all_practitioner_json_batch`, otherwise (or with
+    FHIRTYPE_FLATTEN_ENGINE "models") each practitioner is searched for on its own with
+    `search_endpoint_practitioner_data`. A search that fails is logged and its practitioner is not found, unless
+    every search failed, in which case the error is raised.
+
+    :param client: The SmartClient of the endpoint to search
+    :param searches: A list of 3-tuples of (family name, given name, NPI)
+    :return: An asynchronous generator of 2-tuples of (index of the search, a list of flattened records from this
+    endpoint), once for every search
+    """
+    if flatten_engine == "models" or not client.can_search_by_npi():
+
+        async def search(family_name: str, given_name: str, npi: str or None):
+            try:
+                return await search_endpoint_practitioner_data(
+                    client, family_name, given_name, npi
+                )
+            except Exception as e:
+                return e
+
+        failures = []
+        async for index, response in as_answered(
+            [
+                search(family_name, given_name, npi)
+                for family_name, given_name, npi in searches
+            ]
+        ):
+            if isinstance(response, Exception):
+                fhirtype.fhir_logger().error(
+                    "Search of NPI %s on %s failed, its practitioner was not found. (%s: %s)",
+                    searches[index][2],
+                    client.get_endpoint_name(),
+                    type(response).__name__,
+                    response,
+                )
+                failures.append((index, response))
+            else:
+                yield index, response
+
+        # As when every ORed search fails, the endpoint itself failed
+        if failures and len(failures) == len(searches):
+            raise failures[0][1]
+
+        for index, _ in failures:
+            yield index, []
+
+        return
+
+    async for index, (
+        practitioners,
+        practitioner_roles,
+        resolved,
+    ) in client.iterate_all_practitioner_json_batch(searches):
+        if practitioners is None or practitioner_roles is None:
+            yield index, []
+            continue
+
+        yield index, flatten_practitioners_json(
+            client.get_endpoint_name(),
+            practitioners,
+            practitioner_roles,
+            resolved,
+        )
+
+
+class PartialResults:
+    """
+    Overview
+    --------
+    Which endpoints were left out of a request's results, and why. One is made per request and handed to every
+    search it runs, the searches add the name of each endpoint they leave out.
+
+    Attributes
+    -----------
+    timed_out
+        Names of endpoints that missed the request deadline
+
+    unavailable
+        Names of endpoints that were skipped because their circuit is open
+
+    failed
+        Names of endpoints whose search raised an error
+    """
+
+    def __init__(self):
+        self.timed_out = []
+        self.unavailable = []
+        self.failed = []
+
+    def headers(self) -> dict:
+        """
+        :return: The response headers that tell the client which endpoints were left out of the results, e.g.
+        {"X-Timed-Out-Endpoints": "Cigna, Humana"}, empty if none were
+        """
+        headers = {}
+
+        if self.timed_out:
+            headers["X-Timed-Out-Endpoints"] = ", ".join(sorted(set(self.timed_out)))
+
+        if self.unavailable:
+            headers["X-Unavailable-Endpoints"] = ", ".join(
+                sorted(set(self.unavailable))
+            )
+
+        if self.failed:
+            headers["X-Failed-Endpoints"] = ", ".join(sorted(set(self.failed)))
+
+        return headers
+
+    def message(self) -> str:
+        """
+        :return: A note for an error message on which endpoints were left out of the results, empty if none were
+        """
+        notes = []
+
+        if self.timed_out:
+            notes.append("timed out: " + ", ".join(sorted(set(self.timed_out))))
+
+        if self.unavailable:
+            notes.append("unavailable: " + ", ".join(sorted(set(self.unavailable))))
+
+        if self.failed:
+            notes.append("failed: " + ", ".join(sorted(set(self.failed))))
+
+        if not notes:
+            return ""
+
+        return " (" + "; ".join(notes) + ")"
+
+
+async def run_endpoint_search_until(
+    client: SmartClient,
+    search,
+    missed,
+    deadline: float,
+    partial_results: PartialResults,
+):
+    """
+    Runs a search against one endpoint, but gives up once the event loop's clock passes the deadline. An endpoint
+    that misses the deadline contributes no records and is added to the timed out endpoints. An endpoint whose
+    circuit is open is skipped without being contacted and is added to the unavailable endpoints. An endpoint whose
+    search raised any other error, e.g. an error status left after every retry, contributes no records and is added
+    to the failed endpoints, so that one endpoint cannot fail the search of all the others.
+
+    :param search: Function of no arguments returning the coroutine of the search, only called if the endpoint is
+    available
+    :param missed: What to return in place of the search's result if it timed out, was skipped or failed
+    :param deadline: Absolute time, in terms of the running loop's clock, by which the endpoint must answer
+    :param partial_results: Collects the endpoints left out of the results
+    :return: The result of the search, or missed
+    """
+    if not client.is_available():
+        partial_results.unavailable.append(client.get_endpoint_name())
+        return missed
+
+    remaining = deadline - asyncio.get_running_loop().time()
+
+    try:
+        # Retries that could not finish before the deadline are not attempted
+        with retry_deadline(deadline):
+            return await asyncio.wait_for(search(), timeout=max(remaining, 0))
+    except asyncio.TimeoutError:
+        fhirtype.fhir_logger().warning(
+            "Endpoint %s missed the request deadline, returning partial results.",
+            client.get_endpoint_name(),
+        )
+        client.circuit_breaker.record_failure()
+        partial_results.timed_out.append(client.get_endpoint_name())
+        return missed
+    except ExceptionCircuitOpen:
+        fhirtype.fhir_logger().warning(
+            "Endpoint %s became unavailable, returning partial results.",
+            client.get_endpoint_name(),
+        )
+        partial_results.unavailable.append(client.get_endpoint_name())
+        return missed
+    except Exception:
+        fhirtype.fhir_logger().exception(
+            "Search of endpoint %s failed, returning partial results.",
+            client.get_endpoint_name(),
+        )
+        partial_results.failed.append(client.get_endpoint_name())
+        return missed
+
+
+async def search_endpoint_practitioner_data_until(
+    client: SmartClient,
+    family_name: str,
+    given_name: str,
+    npi: str or None,
+    deadline: float,
+    partial_results: PartialResults,
+):
+    """
+    Runs `search_endpoint_practitioner_data` against one endpoint by the deadline, see `run_endpoint_search_until`.
+
+    :param deadline: Absolute time, in terms of the running loop's clock, by which the endpoint must answer
+    :param partial_results: Collects the endpoints left out of the results
+    :return: A list of flattened records from this endpoint, empty if it timed out, was skipped or failed
+    """
+    return await run_endpoint_search_until(
+        client,
+        lambda: search_endpoint_practitioner_data(client, family_name, given_name, npi),
+        [],
+        deadline,
+        partial_results,
+    )
+
+
+def get_search_clients(endpoint: str or None) -> list:
+    """
+    :param endpoint: The name of a single endpoint, or None for all endpoints
+    :return: A list of the SmartClients to search
+    """
+    # unspecified endpoint
+    if endpoint is None:
+        return list(smart_clients.values())
+    elif endpoint in smart_clients:  # specified endpoint
+        return [smart_clients[endpoint]]
+    else:
+        fhirtype.fhir_logger().warning("Endpoint %s not found among clients.", endpoint)
+        return []
+
+
+def start_search(
+    endpoint: str or None,
+    deadline_seconds: float or None,
+    partial_results: PartialResults or None,
+):
+    """
+    Sets up a search of every endpoint (or only the given one), to be called from the event loop that runs it.
+
+    :param endpoint: The name of a single endpoint to search, or None to search all endpoints
+    :param deadline_seconds: Time budget for the request, defaults to FHIRTYPE_REQUEST_DEADLINE
+    :param partial_results: Collects the endpoints left out of the results, a new one if None
+    :return: A 3-tuple of (the SmartClients to search, the deadline in terms of the running loop's clock, the
+    PartialResults to collect into)
+    """
+    if deadline_seconds is None:
+        deadline_seconds = request_deadline_seconds
+
+    if partial_results is None:
+        partial_results = PartialResults()
+
+    deadline = asyncio.get_running_loop().time() + deadline_seconds
+
+    return get_search_clients(endpoint), deadline, partial_results
+
+
+def consensus_records(flatten_data: list) -> list:
+    """
+    Drops duplicate records, scores the rest against the model's prediction and appends the prediction.
+
+    :param flatten_data: A list of flattened records of one practitioner, from any number of endpoints
+    :return: The unique records with their accuracy, followed by the predicted record
+    """
+    unique_records = {}
+    for data in flatten_data:
+        key = create_key(data)
+        if key not in unique_records:
+            unique_records[key] = data
+
+    updated_flatten = list(unique_records.values())
+
+    predicted = predict(updated_flatten)
+    consensus_data = calc_accuracy(updated_flatten, predicted)
+    consensus_data.append(predicted)
+
+    return consensus_data
+
+
 async def search_all_practitioner_data(
     family_name: str,
     given_name: str,
     npi: str or None,
     endpoint: str or None = None,
     consensus: bool = False,
+    deadline_seconds: float or None = None,
+    partial_results: PartialResults or None = None,
 ):
-    flatten_data = []
-    flattener = FlattenSmartOnFHIRObject("none")
+    """
+    Searches every endpoint (or only the given one) for a practitioner at the same time, waiting at most
+    deadline_seconds for all of them. Endpoints that miss the deadline, whose circuit is open or whose search fails
+    are left out of the results.
+
+    :param family_name: The family name of the practitioner.
+    :param given_name: The given name of the practitioner.
+    :param npi: The NPI of the practitioner.
+    :param endpoint: The name of a single endpoint to search, or None to search all endpoints
+    :param consensus: Whether to append the model's consensus result
+    :param deadline_seconds: Time budget for this request, defaults to FHIRTYPE_REQUEST_DEADLINE
+    :param partial_results: If given, the endpoints left out of the results are added to it
+    :return: A list of flattened records
+    """
+    clients, deadline, partial_results = start_search(
+        endpoint, deadline_seconds, partial_results
+    )
 
-    # unspecified endpoint
-    if endpoint is None:
-        for client_name in smart_clients:
-            print("ALL: CLIENT NAME IS ", client_name)
-            client = smart_clients[client_name]
-            practitioners, practitioner_roles, _ = (
-                await client.find_all_practitioner_data(family_name, given_name, npi)
+    responses = await asyncio.gather(
+        *(
+            search_endpoint_practitioner_data_until(
+                client, family_name, given_name, npi, deadline, partial_results
             )
+            for client in clients
+        )
+    )
+
+    # Keep the endpoint order stable regardless of which endpoint answered first
+    flatten_data = [data for response in responses for data in response]
+
+    if consensus and len(flatten_data) > 0:
+        return consensus_records(flatten_data)
+
+    return flatten_data
+
 
-            if practitioners is not None:
-                for practitioner in practitioners:
-                    for role in practitioner_roles:
-
-                        # Match roles to current practitioner
-                        if hasattr(role, "practitioner") and hasattr(
-                            role.practitioner, "reference"
-                        ):
-                            role_id = role.practitioner.reference.split("/")[1]
-                        else:
-                            continue
-
-                        if role_id != practitioner.id:
-                            continue
-
-                        locations = client.find_practitioner_role_locations(role)
-
-                        for location in locations:
-                            flattener.reset_flattened_data(client.get_endpoint_name())
-                            flattener.prac_obj = practitioner
-                            flattener.prac_role_obj = [role]
-                            flattener.prac_loc_obj = [location]
-                            flattener.flatten_all()
-                            flatten_data.append(flattener.get_flattened_data())
-
-    else:  # specified endpoint
-        if endpoint in smart_clients:
-            print("SPECIFIC: CLIENT NAME IS ", endpoint)
-            client = smart_clients[endpoint]
-            practitioners, practitioner_roles, _ = (
-                await client.find_all_practitioner_data(family_name, given_name, npi)
+async def search_all_practitioner_data_batch(
+    searches: list,
+    endpoint: str or None = None,
+    consensus: bool = False,
+    deadline_seconds: float or None = None,
+    partial_results: PartialResults or None = None,
+):
+    """
+    Performs `search_all_practitioner_data` for many practitioners at once, asking each endpoint for all of them
+    together with `search_endpoint_practitioner_batch` rather than once per practitioner.
+
+    :param searches: A list of 3-tuples of (family name, given name, NPI)
+    :param endpoint: The name of a single endpoint to search, or None to search all endpoints
+    :param consensus: Whether to append the model's consensus result to each practitioner's records
+    :param deadline_seconds: Time budget for this request, defaults to FHIRTYPE_REQUEST_DEADLINE
+    :param partial_results: If given, the endpoints left out of the results are added to it
+    :return: A list holding, for each search in the order given, the list of flattened records
+    `search_all_practitioner_data` would have returned for it
+    """
+    clients, deadline, partial_results = start_search(
+        endpoint, deadline_seconds, partial_results
+    )
+
+    responses = await asyncio.gather(
+        *(
+            run_endpoint_search_until(
+                client,
+                lambda client=client: search_endpoint_practitioner_batch(
+                    client, searches
+                ),
+                [[] for _ in searches],
+                deadline,
+                partial_results,
             )
+            for client in clients
+        )
+    )
 
-            if practitioners is not None:
-                for practitioner in practitioners:
-                    for role in practitioner_roles:
-
-                        # Match roles to current practitioner
-                        if hasattr(role, "practitioner") and hasattr(
-                            role.practitioner, "reference"
-                        ):
-                            role_id = role.practitioner.reference.split("/")[1]
-                        else:
-                            continue
-
-                        if role_id != practitioner.id:
-                            continue
-
-                        locations = client.find_practitioner_role_locations(role)
-
-                        for location in locations:
-                            flattener.reset_flattened_data(client.get_endpoint_name())
-                            flattener.prac_obj = practitioner
-                            flattener.prac_role_obj = [role]
-                            flattener.prac_loc_obj = [location]
-                            flattener.flatten_all()
-                            flatten_data.append(flattener.get_flattened_data())
-        else:
-            print(f"Warning: Endpoint '{endpoint}' not found among clients.")
+    results = []
+    for index in range(len(searches)):
+        # Keep the endpoint order stable regardless of which endpoint answered first
+        flatten_data = [data for response in responses for data in response[index]]
 
-    if consensus and len(flatten_data) > 0:
-        unique_records = {}
-        for data in flatten_data:
-            key = create_key(data)
-            if key not in unique_records:
-                unique_records[key] = data
+        if consensus and len(flatten_data) > 0:
+            flatten_data = consensus_records(flatten_data)
 
-        updated_flatten = list(unique_records.values())
+        results.append(flatten_data)
 
-        predicted = predict(updated_flatten)
-        consensus_data = calc_accuracy(updated_flatten, predicted)
-        consensus_data.append(predicted)
+    return results
 
-        return consensus_data
 
-    return flatten_data
+async def as_answered(coroutines: list):
+    """
+    Runs the coroutines at the same time and yields each result as soon as it is ready. Those still running when
+    the generator is closed early are cancelled.
+
+    :param coroutines: The coroutines, e.g. one search per endpoint
+    :return: An asynchronous generator of 2-tuples of (index of the coroutine, its result), in the order they finish
+    """
+
+    async def indexed(index: int, coroutine):
+        return index, await coroutine
 
+    tasks = [
+        asyncio.ensure_future(indexed(index, coroutine))
+        for index, coroutine in enumerate(coroutines)
+    ]
+    try:
+        for answered in asyncio.as_completed(tasks):
+            yield await answered
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def stream_all_practitioner_data(
+    family_name: str,
+    given_name: str,
+    npi: str or None,
+    endpoint: str or None = None,
+    consensus: bool = False,
+    deadline_seconds: float or None = None,
+    partial_results: PartialResults or None = None,
+):
+    """
+    Performs `search_all_practitioner_data`, but yields the records of each endpoint as soon as it has answered
+    rather than all of them once the slowest has. With consensus, the consensus records (see `consensus_records`)
+    follow once every endpoint has answered, the same as `search_all_practitioner_data` would have returned.
+
+    :param family_name: The family name of the practitioner.
+    :param given_name: The given name of the practitioner.
+    :param npi: The NPI of the practitioner.
+    :param endpoint: The name of a single endpoint to search, or None to search all endpoints
+    :param consensus: Whether to follow the records with the model's consensus result
+    :param deadline_seconds: Time budget for this request, defaults to FHIRTYPE_REQUEST_DEADLINE
+    :param partial_results: If given, the endpoints left out of the results are added to it
+    :return: An asynchronous generator of flattened records
+    """
+    clients, deadline, partial_results = start_search(
+        endpoint, deadline_seconds, partial_results
+    )
+
+    responses = [[] for _ in clients]
+    async for index, response in as_answered(
+        [
+            search_endpoint_practitioner_data_until(
+                client, family_name, given_name, npi, deadline, partial_results
+            )
+            for client in clients
+        ]
+    ):
+        responses[index] = response
+        for data in response:
+            yield data
 
-async def gather_all_data(tasks):
-    return await asyncio.gather(*tasks)
+    # The consensus is taken in endpoint order, as it is when the records are returned all at once
+    flatten_data = [data for response in responses for data in response]
+
+    if consensus and len(flatten_data) > 0:
+        for data in consensus_records(flatten_data):
+            yield data
+
+
+async def stream_all_practitioner_data_batch(
+    searches: list,
+    endpoint: str or None = None,
+    consensus: bool = False,
+    deadline_seconds: float or None = None,
+    partial_results: PartialResults or None = None,
+):
+    """
+    Performs `search_all_practitioner_data_batch`, but yields the records each endpoint found for a practitioner as
+    soon as it has found them, see `iterate_endpoint_practitioner_batch`, rather than all of them once the slowest
+    endpoint has answered for every practitioner. With consensus, the consensus records of each practitioner follow
+    as soon as every endpoint has answered for them.
+
+    :param searches: A list of 3-tuples of (family name, given name, NPI)
+    :param endpoint: The name of a single endpoint to search, or None to search all endpoints
+    :param consensus: Whether to follow each practitioner's records with the model's consensus result
+    :param deadline_seconds: Time budget for this request, defaults to FHIRTYPE_REQUEST_DEADLINE
+    :param partial_results: If given, the endpoints left out of the results are added to it
+    :return: An asynchronous generator of flattened records
+    """
+    clients, deadline, partial_results = start_search(
+        endpoint, deadline_seconds, partial_results
+    )
+
+    answered = asyncio.Queue()
+
+    async def pump(client_index: int, client: SmartClient):
+        async for index, flatten_data in iterate_endpoint_practitioner_batch(
+            client, searches
+        ):
+            answered.put_nowait((client_index, index, flatten_data))
+
+    async def search(client_index: int, client: SmartClient):
+        await run_endpoint_search_until(
+            client,
+            lambda: pump(client_index, client),
+            None,
+            deadline,
+            partial_results,
+        )
+        # An endpoint that is done has answered every practitioner it has not yet, with nothing
+        answered.put_nowait((client_index, None, None))
+
+    # None until the endpoint has answered for the practitioner
+    responses = [[None for _ in searches] for _ in clients]
+    tasks = [
+        asyncio.ensure_future(search(client_index, client))
+        for client_index, client in enumerate(clients)
+    ]
+    pending = len(clients)
+    try:
+        while pending > 0:
+            client_index, index, flatten_data = await answered.get()
+
+            if index is None:
+                pending -= 1
+                indexes = [
+                    index
+                    for index, response in enumerate(responses[client_index])
+                    if response is None
+                ]
+                for index in indexes:
+                    responses[client_index][index] = []
+            else:
+                indexes = [index]
+                responses[client_index][index] = flatten_data
+                for data in flatten_data:
+                    yield data
+
+            if consensus:
+                for index in indexes:
+                    if any(response[index] is None for response in responses):
+                        continue
+
+                    # The consensus is taken in endpoint order, as it is when the records are returned all at once
+                    flatten_data = [
+                        data for response in responses for data in response[index]
+                    ]
+                    if len(flatten_data) > 0:
+                        for data in consensus_records(flatten_data):
+                            yield data
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 def match_data(collection: list, use_taxonomy=False):
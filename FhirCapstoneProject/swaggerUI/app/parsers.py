@@ -24,7 +24,7 @@ get_data_parser.add_argument(
 get_data_parser.add_argument(
     "format",
     type=str,
-    choices=("JSON", "File", "Page"),
+    choices=("JSON", "File", "Page", "NDJSON"),
     required=True,
     default="JSON",
     help="The type of the returned data (default: JSON)",
@@ -53,7 +53,7 @@ get_list_data_parser.add_argument(
     "format",
     required=True,
     type=str,
-    choices=("JSON", "File", "Page"),
+    choices=("JSON", "File", "Page", "NDJSON"),
     default="JSON",
     help="The type of the returned data - returns JSON format by default.",
 )
@@ -2,21 +2,34 @@ import json
 import os
 from io import BytesIO
 
-import asyncio
 from dotenv import load_dotenv
-from flask import make_response, render_template, send_file, request, jsonify
+from flask import (
+    Response,
+    make_response,
+    render_template,
+    send_file,
+    request,
+    jsonify,
+)
 from flask_restx import Resource, Namespace, abort
 from memory_profiler import profile
 
 from FhirCapstoneProject.fhirtypepkg.fhirtype import decorate_if
 from .data import api_description
 from .extensions import (
+    PartialResults,
     search_all_practitioner_data,
+    search_all_practitioner_data_batch,
+    stream_all_practitioner_data,
+    stream_all_practitioner_data_batch,
+    get_endpoint_health,
+    get_endpoint_latency,
     match_data,
     predict,
     calc_accuracy,
-    gather_all_data,
     limiter,
+    run_async,
+    iterate_async,
 )
 from .models import error, practitioners_list_model, consensus_fields, askai_fields
 from .models import practitioner
@@ -30,6 +43,74 @@ load_dotenv()
 ns = Namespace("api", description="API endpoints related to Practitioner.")
 
 
+def ndjson_response(
+    records,
+    partial_results: PartialResults,
+    not_found_message: str or None = None,
+    validate=None,
+):
+    """
+    Streams flattened records as newline delimited JSON, one record per line, each written as soon as it is ready.
+    The response only starts once the first record is ready, so that a search that finds nothing can still be
+    answered with an error. Every line is an object with a single key telling what it holds, so that no line can be
+    mistaken for a record:
+
+    - {"record": {...}} for each flattened record
+    - {"error": {"message": ..., "status_code": ...}} as the last line, if a record was invalid after the stream
+      had started
+    - {"partial_results": {"X-Timed-Out-Endpoints": ..., ...}} as the last line, if any endpoints were left out of
+      the results, with the headers `PartialResults.headers` would have set, as this is only known at the end
+
+    :param records: An asynchronous generator of flattened records
+    :param partial_results: The PartialResults the generator adds the endpoints left out of the results to
+    :param not_found_message: If given, a search that finds nothing is answered with 404 and this message
+    :param validate: If given, a function checking each record (see `validate_inputs`), an invalid record is
+    answered with its status code, or ends the stream with an error line once the stream has started
+    """
+    lines = iterate_async(records)
+    first = next(lines, None)
+
+    if first is None and not_found_message is not None:
+        abort(404, not_found_message + partial_results.message())
+
+    if first is not None and validate is not None:
+        validation_result = validate(first)
+        if not validation_result["success"]:
+            lines.close()
+            abort(
+                validation_result["status_code"], message=validation_result["message"]
+            )
+
+    def generate():
+        try:
+            if first is not None:
+                yield json.dumps({"record": first}) + "\n"
+
+            for data in lines:
+                if validate is not None:
+                    validation_result = validate(data)
+                    if not validation_result["success"]:
+                        yield json.dumps(
+                            {
+                                "error": {
+                                    "message": validation_result["message"],
+                                    "status_code": validation_result["status_code"],
+                                }
+                            }
+                        ) + "\n"
+                        return
+
+                yield json.dumps({"record": data}) + "\n"
+
+            headers = partial_results.headers()
+            if headers:
+                yield json.dumps({"partial_results": headers}) + "\n"
+        finally:
+            lines.close()
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
 # api/getdata
 @ns.route("/getdata")
 class GetData(Resource):
@@ -54,11 +135,43 @@ class GetData(Resource):
         return_type = args["format"]
         consensus = True if args["consensus"][0] == "T" else False
 
-        flatten_data = asyncio.run(
+        partial_results = PartialResults()
+
+        # Each record is written as soon as its endpoint has answered
+        if return_type == "NDJSON":
+            if not (first_name and last_name and npi):
+                abort(400, message="All required queries must be provided")
+
+            return ndjson_response(
+                stream_all_practitioner_data(
+                    last_name,
+                    first_name,
+                    npi,
+                    endpoint,
+                    consensus=consensus,
+                    partial_results=partial_results,
+                ),
+                partial_results,
+                not_found_message="Could not find practitioner with name "
+                + first_name
+                + " "
+                + last_name
+                + " and npi: "
+                + npi,
+                validate=validate_inputs,
+            )
+
+        flatten_data = run_async(
             search_all_practitioner_data(
-                last_name, first_name, npi, endpoint, consensus=consensus
+                last_name,
+                first_name,
+                npi,
+                endpoint,
+                consensus=consensus,
+                partial_results=partial_results,
             )
         )
+        headers = partial_results.headers()
 
         # Validate the user's queries
         # If they are invalid, throw status code 400 with an error message
@@ -72,6 +185,7 @@ class GetData(Resource):
                     + " and npi: "
                     + npi
                 )
+                abort_message += partial_results.message()
                 abort(404, abort_message)
             else:
                 for data in flatten_data:
@@ -82,20 +196,24 @@ class GetData(Resource):
                             message=validate_inputs(data)["message"],
                         )
                 if return_type == "Page":
-                    return make_response(
+                    response = make_response(
                         render_template("app.html", json_data=flatten_data)
                     )
+                    response.headers.update(headers)
+                    return response
                 elif return_type == "File":
                     json_data = flatten_data
                     json_str = json.dumps(json_data, indent=4)
                     file_bytes = BytesIO()
                     file_bytes.write(json_str.encode("utf-8"))
                     file_bytes.seek(0)
-                    return send_file(
+                    response = send_file(
                         file_bytes, as_attachment=True, download_name="getdata.json"
                     )
+                    response.headers.update(headers)
+                    return response
                 else:
-                    return flatten_data
+                    return flatten_data, 200, headers
 
         else:
             abort(400, message="All required queries must be provided")
@@ -122,25 +240,38 @@ class GetData(Resource):
         data_list = request_body["practitioners"]
         res = {"message": "No practitioners were found"}
 
-        tasks = []
+        searches = []
+        partial_results = PartialResults()
         for data in data_list:
             if validate_npi(data["npi"]):
                 npi = data["npi"]
                 first_name = data["first_name"]
                 last_name = data["last_name"]
-                tasks.append(
-                    search_all_practitioner_data(
-                        last_name,
-                        first_name,
-                        npi,
-                        endpoint=endpoints,
-                        consensus=consensus,
-                    )
-                )
+                searches.append((last_name, first_name, npi))
             else:
                 abort(400, message="Invalid NPI: NPI should be 10 digit number")
 
-        all_responses = asyncio.run(gather_all_data(tasks))
+        if return_type == "NDJSON":
+            # Each endpoint's records are written as soon as it has answered, rather than grouped by NPI
+            return ndjson_response(
+                stream_all_practitioner_data_batch(
+                    searches,
+                    endpoint=endpoints,
+                    consensus=consensus,
+                    partial_results=partial_results,
+                ),
+                partial_results,
+            )
+
+        # Each endpoint is asked for all the practitioners together, by NPI where it supports it
+        all_responses = run_async(
+            search_all_practitioner_data_batch(
+                searches,
+                endpoint=endpoints,
+                consensus=consensus,
+                partial_results=partial_results,
+            )
+        )
 
         if all_responses[0] is not None:
             res = {}
@@ -152,6 +283,8 @@ class GetData(Resource):
                         else:
                             res[data["NPI"]] = [data]
 
+        headers = partial_results.headers()
+
         # Processing the output format
         if return_type == "File":
             json_data = res
@@ -159,13 +292,17 @@ class GetData(Resource):
             file_bytes = BytesIO()
             file_bytes.write(json_str.encode("utf-8"))
             file_bytes.seek(0)
-            return send_file(
+            response = send_file(
                 file_bytes, as_attachment=True, download_name="getdata.json"
             )
+            response.headers.update(headers)
+            return response
         elif return_type == "Page":
-            return make_response(render_template("list.html", json_data=res))
+            response = make_response(render_template("list.html", json_data=res))
+            response.headers.update(headers)
+            return response
         else:
-            return res
+            return res, 200, headers
 
 
 @ns.route("/matchdata")
@@ -230,9 +367,18 @@ class ConsensusResult(Resource):
         endpoint = args["endpoint"] if args["endpoint"] != "All" else None
         consensus = True if args["consensus"][0] == "T" else False
 
-        flatten_data = asyncio.run(
-            search_all_practitioner_data(last_name, first_name, npi, consensus=consensus, endpoint=endpoint)
+        partial_results = PartialResults()
+        flatten_data = run_async(
+            search_all_practitioner_data(
+                last_name,
+                first_name,
+                npi,
+                consensus=consensus,
+                endpoint=endpoint,
+                partial_results=partial_results,
+            )
         )
+        headers = partial_results.headers()
 
         # Validate the user's queries
         # If they are invalid, throw status code 400 with an error message
@@ -246,6 +392,7 @@ class ConsensusResult(Resource):
                     + " and npi: "
                     + npi
                 )
+                abort_message += partial_results.message()
                 abort(404, abort_message)
             else:
                 for data in flatten_data:
@@ -256,25 +403,51 @@ class ConsensusResult(Resource):
                             message=validate_inputs(data)["message"],
                         )
                 if return_type == "page":
-                    return make_response(
+                    response = make_response(
                         render_template("app.html", json_data=flatten_data)
                     )
+                    response.headers.update(headers)
+                    return response
                 elif return_type == "file":
                     json_data = flatten_data
                     json_str = json.dumps(json_data, indent=4)
                     file_bytes = BytesIO()
                     file_bytes.write(json_str.encode("utf-8"))
                     file_bytes.seek(0)
-                    return send_file(
+                    response = send_file(
                         file_bytes, as_attachment=True, download_name="getdata.json"
                     )
+                    response.headers.update(headers)
+                    return response
                 else:
-                    return flatten_data
+                    return flatten_data, 200, headers
 
         else:
             abort(400, message="All required queries must be provided")
 
 
+# The circuit breaker state of each endpoint
+@ns.route("/health")
+class EndpointHealth(Resource):
+    @ns.response(200, "The health of each endpoint was successfully retrieved.")
+    @ns.response(429, "Too Many Requests response", error)
+    @ns.doc(description=api_description["health"])
+    @limiter.limit("10/second")
+    def get(self):
+        return get_endpoint_health(), 200
+
+
+# The latency histograms and current timeouts of each endpoint, for dashboards
+@ns.route("/latency")
+class EndpointLatency(Resource):
+    @ns.response(200, "The latency of each endpoint was successfully retrieved.")
+    @ns.response(429, "Too Many Requests response", error)
+    @ns.doc(description=api_description["latency"])
+    @limiter.limit("10/second")
+    def get(self):
+        return get_endpoint_latency(), 200
+
+
 # TODO Middleware functions
 @ns.route("/askai")
 class AskAI(Resource):
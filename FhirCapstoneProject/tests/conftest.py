@@ -0,0 +1,110 @@
+# Description: Fixtures shared by the tests: a fake clock, Smart Clients of a test endpoint, a local FHIR server and
+# the endpoints searched by the app
+
+import asyncio
+import contextlib
+
+import pytest
+from aiohttp import web
+
+from FhirCapstoneProject.fhirtypepkg.endpoint import Endpoint
+from FhirCapstoneProject.fhirtypepkg.smartclient import SmartClient
+
+
+class FakeClock:
+    """
+    A clock for the `clock` argument of the caches, limiters and breakers, which only moves when `now` is set.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def make_smart_client():
+    """
+    Makes SmartClients of a test endpoint that is never reached on startup, e.g. `make_smart_client(rate_limit=2.0)`.
+    Keyword arguments are those of Endpoint, and replace the defaults, but for capability_cache_dir, the directory
+    the SmartClient keeps its Capability Statement in. Every client made is closed after the test.
+    """
+    clients = []
+
+    def make(capability_cache_dir: str or None = None, **kwargs) -> SmartClient:
+        settings = dict(
+            name="Test Endpoint",
+            host="host.name",
+            address="/address/",
+            enable_http=False,
+            use_http_client=False,
+            get_metadata_on_init=False,
+            secure_connection_needed=False,
+        )
+        settings.update(kwargs)
+
+        client = SmartClient(Endpoint(**settings), capability_cache_dir)
+        clients.append(client)
+        return client
+
+    yield make
+
+    for client in clients:
+        asyncio.run(client.close())
+
+
+@pytest.fixture
+def fhir_server():
+    """
+    Serves a FHIR API on a free local port, to run inside the test's event loop, e.g.
+    `async with fhir_server({"/fhir/Practitioner": handler}) as host:`. Each route is answered by an aiohttp handler
+    for GET, and the host (address and port) is given to `make_smart_client(host=host, address="/fhir/")`.
+    """
+
+    @contextlib.asynccontextmanager
+    async def serve(routes: dict):
+        app = web.Application()
+        for path, handler in routes.items():
+            app.router.add_get(path, handler)
+
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        try:
+            yield f"127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        finally:
+            await runner.cleanup()
+
+    return serve
+
+
+@pytest.fixture
+def endpoints(make_smart_client, monkeypatch):
+    """
+    Replaces the Smart Clients of the app with test endpoints, each searched by the given function in place of
+    `search_endpoint_practitioner_data`, e.g. `endpoints(Answers=answer, Late=answer_late)`.
+    """
+
+    # The app connects to the configured endpoints when first imported
+    import FhirCapstoneProject.swaggerUI.app.extensions as extensions
+
+    def make(**searches):
+        clients = {name: make_smart_client(name=name) for name in searches}
+
+        async def search(client, family_name, given_name, npi):
+            return await searches[client.get_endpoint_name()](
+                client, family_name, given_name, npi
+            )
+
+        monkeypatch.setattr(extensions, "smart_clients", clients)
+        monkeypatch.setattr(extensions, "search_endpoint_practitioner_data", search)
+        return clients
+
+    return make
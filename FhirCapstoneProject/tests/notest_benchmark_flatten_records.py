@@ -0,0 +1,66 @@
+# Description: Benchmarks the per-record cost of building flattened records, pydantic against PractitionerRecord.
+# Not collected by pytest, run with `python -m FhirCapstoneProject.tests.notest_benchmark_flatten_records`
+
+import timeit
+
+from FhirCapstoneProject.fhirtypepkg.flatten import (
+    PractitionerRecord,
+    StandardProcessModel,
+)
+
+_RECORDS = 1000
+
+combined = {
+    "Endpoint": "Benchmark",
+    "DateRetrieved": "2024-01-01T00:00:00+00:00Z",
+    "Accuracy": -1.0,
+    "FullName": "JANE Q SMITH",
+    "NPI": "1234567890",
+    "FirstName": "JANE",
+    "LastName": "SMITH",
+    "Gender": "Female",
+    "LastPracUpdate": "2024-02-01T10:00:00-08:00",
+    "GroupName": "NORTH VALLEY CLINIC",
+    "Taxonomy": "207Q00000X",
+    "LastPracRoleUpdate": "2024-01-31",
+    "ADD1": "1 A ST",
+    "ADD2": None,
+    "City": "BEND",
+    "State": "OR",
+    "Zip": "97701",
+    "Phone": "5415550100",
+    "Fax": "5415550101",
+    "Email": "front@clinic.example",
+    "lat": 44,
+    "lng": -121.3,
+    "LastLocationUpdate": "2023-12-24T08:30:00Z",
+}
+
+
+def pydantic_records():
+    return [StandardProcessModel(**combined).model_dump() for _ in range(_RECORDS)]
+
+
+def practitioner_records():
+    return [PractitionerRecord.from_fields(combined).to_dict() for _ in range(_RECORDS)]
+
+
+def practitioner_records_kept():
+    return [PractitionerRecord.from_fields(combined) for _ in range(_RECORDS)]
+
+
+def main():
+    assert pydantic_records()[0] == practitioner_records()[0]
+
+    print(f"{'path':<48}{'us/record':>10}")
+    for name, function in (
+        ("StandardProcessModel(...).model_dump()", pydantic_records),
+        ("PractitionerRecord.from_fields(...).to_dict()", practitioner_records),
+        ("PractitionerRecord.from_fields(...)", practitioner_records_kept),
+    ):
+        best = min(timeit.repeat(function, number=1, repeat=7))
+        print(f"{name:<48}{best / _RECORDS * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
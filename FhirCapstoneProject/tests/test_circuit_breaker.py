@@ -0,0 +1,92 @@
+# Description: Tests the circuit breaker that lets requests to an endpoint that is down fail fast
+
+import asyncio
+
+import pytest
+
+from FhirCapstoneProject.fhirtypepkg.circuitbreaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+)
+from FhirCapstoneProject.fhirtypepkg.fhirtype import ExceptionCircuitOpen
+
+
+def make_open_breaker(clock):
+    breaker = CircuitBreaker(
+        failure_threshold=0.5, minimum_requests=4, open_seconds=30, clock=clock
+    )
+    for _ in range(4):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker(failure_threshold=0.5, minimum_requests=4)
+
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()["rejected_count"] == 1
+
+
+def test_breaker_forgets_outcomes_outside_window(clock):
+    breaker = CircuitBreaker(
+        failure_threshold=0.5, minimum_requests=3, window_seconds=60, clock=clock
+    )
+
+    breaker.record_failure()
+    clock.now = 61.0
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_success_closes(clock):
+    breaker = make_open_breaker(clock)
+
+    clock.now = 30.0
+    assert breaker.is_available()
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+
+    # Only one trial request at a time
+    assert not breaker.is_available()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["requests_in_window"] == 0
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = make_open_breaker(clock)
+
+    clock.now = 30.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.opened_count == 2
+    clock.now = 59.0
+    assert not breaker.allow_request()
+
+
+def test_open_circuit_refuses_without_contacting_endpoint(make_smart_client):
+    client = make_smart_client()
+    for _ in range(client.endpoint.breaker_minimum_requests):
+        client.circuit_breaker.record_failure()
+
+    assert not client.is_available()
+    with pytest.raises(ExceptionCircuitOpen):
+        asyncio.run(client._async_http_url_request("Practitioner"))
+
+    asyncio.run(client.close())
@@ -0,0 +1,102 @@
+# Description: Tests the long-lived event loop that request handlers run their coroutines on
+
+import asyncio
+import threading
+
+import pytest
+
+from FhirCapstoneProject.fhirtypepkg.eventloop import EventLoopThread
+
+
+async def get_running_loop():
+    return asyncio.get_running_loop()
+
+
+def test_coroutines_share_one_loop():
+    event_loop = EventLoopThread()
+
+    first = event_loop.run(get_running_loop())
+    second = event_loop.run(get_running_loop())
+
+    assert first is second
+    assert first.is_running()
+    event_loop.stop(timeout=5)
+
+
+def test_concurrent_callers_run_together():
+    event_loop = EventLoopThread()
+    # Each caller only finishes once the other has started, on the same loop
+    both_started = asyncio.Event()
+    started = []
+
+    async def wait_for_the_other():
+        started.append(True)
+        if len(started) == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), 5)
+        return True
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(event_loop.run(wait_for_the_other()))
+        )
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [True, True]
+    event_loop.stop(timeout=5)
+
+
+def test_exceptions_reach_the_caller():
+    event_loop = EventLoopThread()
+
+    async def fail():
+        raise ValueError("upstream")
+
+    with pytest.raises(ValueError):
+        event_loop.run(fail())
+    event_loop.stop(timeout=5)
+
+
+def test_loop_restarts_after_stop():
+    event_loop = EventLoopThread()
+
+    first = event_loop.run(get_running_loop())
+    event_loop.stop(timeout=5)
+    second = event_loop.run(get_running_loop())
+
+    assert first.is_closed()
+    assert second is not first
+    event_loop.stop(timeout=5)
+
+
+def test_iterate_yields_items_as_they_are_ready():
+    event_loop = EventLoopThread()
+    release = threading.Event()
+    closed = []
+
+    async def produce():
+        try:
+            yield "first"
+            # The second item is only produced once the caller has the first
+            await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+            yield "second"
+            yield "third"
+        finally:
+            closed.append(True)
+
+    items = event_loop.iterate(produce())
+
+    assert next(items) == "first"
+    release.set()
+    assert next(items) == "second"
+
+    # Closing early closes the generator on the loop
+    items.close()
+    assert closed == [True]
+    event_loop.stop(timeout=5)
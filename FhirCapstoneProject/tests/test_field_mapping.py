@@ -0,0 +1,190 @@
+# Description: Tests compiling declarative field mappings into the functions flattening JSON resources
+
+import asyncio
+
+import pytest
+
+import FhirCapstoneProject.fhirtypepkg.flatten as FlattenNamespace
+from FhirCapstoneProject.fhirtypepkg.fieldmap import (
+    compile_mapping,
+    merge_mappings,
+    parse_field,
+    parse_path,
+)
+from FhirCapstoneProject.fhirtypepkg.flatten import (
+    FIELD_TRANSFORMS,
+    combine_fragments,
+    field_flatteners,
+    flatten_loc_json,
+    flatten_practitioners_json,
+    register_field_mappings,
+)
+
+_TAXONOMY = "http://nucc.org/provider-taxonomy"
+
+location = {
+    "resourceType": "Location",
+    "id": "l1",
+    "address": {
+        "line": ["1 Main St"],
+        "city": "Bend",
+        "state": "OR",
+        "postalCode": "97701",
+    },
+    "telecom": [
+        {"system": "phone", "value": "541-555-0100"},
+        {"system": "email", "value": "first@clinic.org"},
+        {"system": "PHONE", "value": "541-555-0199"},
+        {"system": "email", "value": "last@clinic.org"},
+    ],
+    "position": {"latitude": 44.05, "longitude": -121.31},
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_field_mappings():
+    yield
+    FlattenNamespace._endpoint_flatteners.clear()
+    FlattenNamespace.fragment_cache.clear()
+
+
+def test_parse_path():
+    assert parse_path("name[0].given[-1]") == (
+        None,
+        [("key", "name"), ("index", 0), ("key", "given"), ("index", -1)],
+    )
+    assert parse_path(f"specialty[*].coding[system={_TAXONOMY}].code") == (
+        None,
+        [
+            ("key", "specialty"),
+            ("all",),
+            ("key", "coding"),
+            ("match", "system", _TAXONOMY),
+            ("key", "code"),
+        ],
+    )
+    assert parse_path("$organization.name") == ("organization", [("key", "name")])
+
+    for path in ("name[x]", "name..given", "name.$organization"):
+        with pytest.raises(ValueError):
+            parse_path(path)
+
+
+def test_parse_field():
+    assert parse_field("", FIELD_TRANSFORMS) is None
+    assert parse_field("telecom[system=fax].value | last | phone", FIELD_TRANSFORMS)[
+        2:
+    ] == ("last", ["phone"])
+
+    for spec in ("gender | shout", "gender | upper | last", " | upper"):
+        with pytest.raises(ValueError):
+            parse_field(spec, FIELD_TRANSFORMS)
+
+
+def test_compiled_mapping_picks_and_transforms():
+    flatten = compile_mapping(
+        "Location",
+        {
+            "City": "address.city | upper",
+            "FirstPhone": "telecom[system=phone].value",
+            "LastPhone": "telecom[system=phone].value | last | phone",
+            "Email": "telecom[system=email].value | last",
+            "Fax": "telecom[system=fax].value | phone",
+            "Empty": "",
+            "lat": "position.latitude",
+        },
+        FIELD_TRANSFORMS,
+    )
+
+    assert flatten.__name__ == "flatten_location_mapping"
+    assert flatten(location) == {
+        "City": "BEND",
+        "FirstPhone": "541-555-0100",
+        "LastPhone": "5415550199",
+        "Email": "last@clinic.org",
+        "Fax": None,
+        "Empty": None,
+        "lat": 44.05,
+    }
+
+    # Paths through missing or mistyped values find nothing rather than raise
+    assert set(flatten({"address": "1 Main St", "telecom": [None, "x"]}).values()) == {
+        None
+    }
+
+
+def test_merge_mappings_ignores_case():
+    defaults = {"Practitioner": {"NPI": "a"}, "Location": {"Phone": "b", "Fax": "c"}}
+
+    assert merge_mappings(defaults, {"location": {"phone": "d", "FAX": "e"}}) == {
+        "Practitioner": {"NPI": "a"},
+        "Location": {"Phone": "d", "Fax": "e"},
+    }
+
+    # Every field stays flattened from the one resource type that has it
+    for overrides in (
+        {"location": {"npi": "id"}},
+        {"Location": {"NPI": "id"}},
+        {"Location": {"Pager": "telecom"}},
+        {"Organization": {"Phone": "telecom"}},
+    ):
+        with pytest.raises(ValueError):
+            merge_mappings(defaults, overrides)
+
+
+def test_endpoint_overrides_its_field_mappings(make_smart_client):
+    client = make_smart_client(
+        field_mappings={
+            "location": {"phone": "telecom[system=phone].value | first | phone"}
+        }
+    )
+
+    assert flatten_loc_json(location)["Phone"] == "5415550199"
+    assert field_flatteners("Test Endpoint")["Location"](location)["Phone"] == (
+        "5415550100"
+    )
+    assert field_flatteners("Other Endpoint")["Location"] is (
+        FlattenNamespace._default_flatteners["Location"]
+    )
+
+    practitioner = {"resourceType": "Practitioner", "id": "p1"}
+    role = {
+        "resourceType": "PractitionerRole",
+        "id": "r1",
+        "practitioner": {"reference": "Practitioner/p1"},
+        "location": [{"reference": "Location/l1"}],
+    }
+    records = flatten_practitioners_json(
+        "Test Endpoint", [practitioner], [role], {"Location/l1": location}
+    )
+    assert records[0]["Phone"] == 5415550100
+    assert records[0]["City"] == "Bend"
+
+    asyncio.run(client.close())
+
+
+def test_invalid_field_mappings_are_refused():
+    with pytest.raises(ValueError):
+        register_field_mappings("Test Endpoint", {"Location": {"Phone": "telecom[?]"}})
+
+    with pytest.raises(ValueError):
+        register_field_mappings("Test Endpoint", {"Location": {"Pager": "telecom"}})
+
+    # As read from ServerEndpoints.ini, where option names are lowercase
+    with pytest.raises(ValueError):
+        register_field_mappings("Test Endpoint", {"location": {"npi": "id"}})
+
+    assert "Test Endpoint" not in FlattenNamespace._endpoint_flatteners
+
+
+def test_records_refuse_fragments_that_overlap_or_are_not_fields():
+    assert combine_fragments({"NPI": "1234567890"}, {"City": "Bend"}) == {
+        "NPI": "1234567890",
+        "City": "Bend",
+    }
+
+    with pytest.raises(ValueError):
+        combine_fragments({"NPI": "1234567890"}, {"City": "Bend", "NPI": "5"})
+
+    with pytest.raises(ValueError):
+        combine_fragments({"City": "Bend"}, {"npi": "5"})
@@ -132,3 +132,31 @@ def test_flatten_all_with_all_resource_data():
     flatten_data["DateRetrieved"] = "stub"
 
     assert flatten_data == expected_data
+
+
+def test_flatten_batch_matches_flatten_all():
+    # Arrange
+    test_endpoint = "Mock"
+    flatten_smart = FlattenSmartOnFHIRObject(endpoint=test_endpoint)
+    practitioner = Practitioner(prac_sample_resource)
+    practitioner_role = PractitionerRole(prac_role_sample_resource)
+    practitioner_location = Location(prac_loc_sample_resource)
+
+    # Act
+    rows = flatten_smart.flatten_batch(
+        [
+            (practitioner, practitioner_role, practitioner_location),
+            (practitioner, practitioner_role, practitioner_location),
+            (practitioner, practitioner_role, None),
+        ]
+    )
+
+    # Assert
+    assert len(rows) == 3
+    assert rows[2]["City"] is None
+
+    for row in rows:
+        row["DateRetrieved"] = "stub"
+
+    assert rows[0] == rows[1] == prac_all_prac_res_sample_output
+    assert rows[2]["FullName"] == prac_all_prac_res_sample_output["FullName"]
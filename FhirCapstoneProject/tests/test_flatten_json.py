@@ -0,0 +1,331 @@
+# Description: Tests that flattening raw JSON gives the same records as flattening fhirclient models
+
+import asyncio
+import copy
+
+import pytest
+from fhirclient.models.location import Location
+from fhirclient.models.practitioner import Practitioner
+from fhirclient.models.practitionerrole import PractitionerRole
+
+import FhirCapstoneProject.fhirtypepkg.flatten as FlattenNamespace
+import FhirCapstoneProject.fhirtypepkg.smartclient as ClientNamespace
+from FhirCapstoneProject.fhirtypepkg.flatten import (
+    FlattenSmartOnFHIRObject,
+    PractitionerRecord,
+    StandardProcessModel,
+    flatten_fragment,
+    flatten_practitioners_json,
+    flatten_prac_json,
+    flatten_role_json,
+    standardize_record,
+)
+from FhirCapstoneProject.tests.assets.mock_resource_and_flatten_samples import (
+    prac_all_prac_res_sample_output,
+    prac_loc_sample_resource,
+    prac_role_sample_resource,
+    prac_sample_resource,
+)
+
+_NPI = "1234567890"
+
+
+def flatten_models(endpoint: str, practitioner, roles: list, locations: list) -> dict:
+    flattener = FlattenSmartOnFHIRObject(endpoint)
+    flattener.prac_obj = practitioner
+    flattener.prac_role_obj = roles
+    flattener.prac_loc_obj = locations
+    flattener.flatten_all()
+
+    return flattener.get_flattened_data()
+
+
+def test_json_record_matches_model_record():
+    role_json = copy.deepcopy(prac_role_sample_resource)
+    role_json["practitioner"]["reference"] = (
+        "Practitioner/" + prac_sample_resource["id"]
+    )
+    role_json["location"] = [{"reference": "Location/sample-location-id"}]
+
+    records = flatten_practitioners_json(
+        "Mock",
+        [prac_sample_resource],
+        [role_json],
+        {"Location/sample-location-id": prac_loc_sample_resource},
+    )
+
+    expected = flatten_models(
+        "Mock",
+        Practitioner(prac_sample_resource),
+        [PractitionerRole(prac_role_sample_resource)],
+        [Location(prac_loc_sample_resource)],
+    )
+
+    assert len(records) == 1
+    assert list(records[0]) == list(expected)
+
+    records[0]["DateRetrieved"] = expected["DateRetrieved"] = "stub"
+    assert records[0] == expected
+    assert records[0] == prac_all_prac_res_sample_output
+
+
+def test_standardize_record_converts_like_pydantic():
+    record = standardize_record({"Phone": "0015551234567", "lat": 45, "NPI": 12.0})
+
+    assert (
+        record
+        == StandardProcessModel(Phone="0015551234567", lat=45, NPI=12.0).model_dump()
+    )
+    assert record["Phone"] == 15551234567
+    assert record["lat"] == 45.0 and type(record["lat"]) is float
+    assert record["NPI"] == 12 and type(record["NPI"]) is int
+
+    with pytest.raises(ValueError):
+        standardize_record({"Phone": ""})
+
+
+def test_values_of_the_wrong_type_are_left_to_pydantic():
+    # As read from raw upstream JSON, which nothing has checked
+    for combined in ({"City": ["Bend"]}, {"Zip": 97701}, {"Phone": 12.7}):
+        with pytest.raises(ValueError):
+            standardize_record(combined)
+
+    # Which pydantic converts where it can
+    for combined in (
+        {"NPI": "1234567890", "lat": "44.05"},
+        {"NPI": 1234567890.0, "lat": 44.05},
+    ):
+        record = standardize_record(combined)
+        assert record["NPI"] == 1234567890 and type(record["NPI"]) is int
+        assert record["lat"] == 44.05 and type(record["lat"]) is float
+
+
+def test_strict_records_are_validated_by_pydantic(monkeypatch):
+    # Text flattened from fhirclient models is taken as it is
+    assert standardize_record({"City": 5}, trusted=True)["City"] == 5
+
+    monkeypatch.setattr(FlattenNamespace, "strict_records", True)
+    with pytest.raises(ValueError):
+        standardize_record({"City": 5}, trusted=True)
+
+    with pytest.raises(ValueError):
+        PractitionerRecord.from_fields({"City": 5}).validate()
+
+
+def test_practitioner_record():
+    record = PractitionerRecord.from_fields(
+        {"Endpoint": "Mock", "NPI": "1234567890", "lng": -121}
+    )
+
+    assert record.NPI == 1234567890
+    assert record.lng == -121.0
+    assert record.City is None
+    assert record.validate() == record
+    assert list(record.to_dict()) == list(StandardProcessModel.model_fields)
+
+
+graph_bundle = {
+    "resourceType": "Bundle",
+    "type": "searchset",
+    "entry": [
+        {
+            "resource": {
+                "resourceType": "Practitioner",
+                "id": "p1",
+                "meta": {"lastUpdated": "2024-02-01T10:00:00.123-08:00"},
+                "identifier": [
+                    {"system": "http://hl7.org/fhir/sid/us-npi", "value": _NPI}
+                ],
+                "name": [{"family": "SMITH", "given": ["JANE-ANN", "Q"]}],
+                "gender": "female",
+            }
+        },
+        {
+            "resource": {
+                "resourceType": "PractitionerRole",
+                "id": "r1",
+                "meta": {"lastUpdated": "2024-01-31"},
+                "practitioner": {"reference": "Practitioner/p1"},
+                "organization": {"reference": "Organization/o1"},
+                "location": [
+                    {"reference": "Location/l1"},
+                    {"reference": "Location/l2"},
+                    {"reference": "Location/l1"},
+                ],
+                "specialty": [
+                    {"coding": [{"system": "other", "code": "x"}]},
+                    {
+                        "coding": [
+                            {
+                                "system": "http://nucc.org/provider-taxonomy",
+                                "code": "207Q00000X",
+                            }
+                        ]
+                    },
+                ],
+            }
+        },
+        {
+            "resource": {
+                "resourceType": "PractitionerRole",
+                "id": "r2",
+                "practitioner": {"reference": "Practitioner/someone-else"},
+                "location": [{"reference": "Location/l1"}],
+            }
+        },
+        {
+            "resource": {
+                "resourceType": "Organization",
+                "id": "o1",
+                "name": "NORTH_VALLEY_CLINIC",
+            }
+        },
+        {
+            "resource": {
+                "resourceType": "Location",
+                "id": "l1",
+                "address": {"line": ["1 A ST", "STE 2"], "city": "BEND"},
+                "telecom": [
+                    {"system": "phone", "value": "(541) 555-0100"},
+                    {"system": "fax", "value": "541.555.0101"},
+                    {"system": "email", "value": "front@clinic.example"},
+                ],
+                "position": {"latitude": 44, "longitude": -121.3},
+            }
+        },
+    ],
+}
+
+location_l2 = {
+    "resourceType": "Location",
+    "id": "l2",
+    "meta": {"lastUpdated": "2023-12-24T08:30:00Z"},
+    "address": {"state": "OR", "postalCode": "97701"},
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    FlattenNamespace.fragment_cache.clear()
+    ClientNamespace.reference_cache.clear()
+    ClientNamespace.response_cache.clear()
+
+
+@pytest.fixture
+def graph_client(make_smart_client):
+    client = make_smart_client()
+    client._graph_search_params = lambda: [
+        ("_revinclude", "PractitionerRole:practitioner"),
+        ("_include:iterate", "PractitionerRole:location"),
+        ("_include:iterate", "PractitionerRole:organization"),
+    ]
+
+    async def _async_http_json_query(query: str, params: list) -> dict:
+        if query == "Location/l2":
+            return copy.deepcopy(location_l2)
+        return copy.deepcopy(graph_bundle)
+
+    client._async_http_json_query = _async_http_json_query
+    client._async_http_cached_json_query = _async_http_json_query
+
+    return client
+
+
+def test_json_search_flattens_like_models(graph_client):
+    client = graph_client
+
+    async def search_both():
+        practitioners, roles, _ = await client.find_all_practitioner_data(
+            "Smith", "Jane", _NPI
+        )
+
+        model_records = []
+        for practitioner in practitioners:
+            for role in roles:
+                if role.practitioner.reference.split("/")[1] != practitioner.id:
+                    continue
+                for location in client.find_practitioner_role_locations(role):
+                    model_records.append(
+                        flatten_models(
+                            "Test Endpoint", practitioner, [role], [location]
+                        )
+                    )
+
+        json_records = flatten_practitioners_json(
+            "Test Endpoint",
+            *await client.find_all_practitioner_json("Smith", "Jane", _NPI),
+        )
+        await client.close()
+
+        return model_records, json_records
+
+    model_records, json_records = asyncio.run(search_both())
+
+    assert len(json_records) == len(model_records) == 2
+    for json_record, model_record in zip(json_records, model_records):
+        assert list(json_record) == list(model_record)
+        json_record["DateRetrieved"] = model_record["DateRetrieved"] = "stub"
+        assert json_record == model_record
+
+    assert json_records[0]["GroupName"] == "NORTH VALLEY CLINIC"
+    assert json_records[0]["LastPracUpdate"] == "2024-02-01T10:00:00-08:00"
+    assert json_records[0]["Fax"] == 5415550101
+    assert json_records[1]["Zip"] == "97701"
+
+
+def test_json_search_finds_nothing_without_matching_npi(graph_client):
+    client = graph_client
+
+    assert asyncio.run(
+        client.find_all_practitioner_json("Smith", "Jane", "0000000000")
+    ) == (None, None, None)
+
+
+def test_fragments_are_cached_by_resource_version():
+    practitioner = copy.deepcopy(graph_bundle["entry"][0]["resource"])
+    first = flatten_fragment("Test Endpoint", flatten_prac_json, practitioner)
+
+    # The same version is not flattened again, even when the JSON Object is a new one
+    assert (
+        flatten_fragment(
+            "Test Endpoint", flatten_prac_json, copy.deepcopy(practitioner)
+        )
+        is first
+    )
+    assert (
+        flatten_fragment("Other Endpoint", flatten_prac_json, practitioner) is not first
+    )
+
+    practitioner["meta"]["versionId"] = "2"
+    practitioner["gender"] = "male"
+    assert (
+        flatten_fragment("Test Endpoint", flatten_prac_json, practitioner)["Gender"]
+        == "Male"
+    )
+
+    # A resource with no version is always flattened anew
+    del practitioner["meta"]
+    assert flatten_fragment(
+        "Test Endpoint", flatten_prac_json, practitioner
+    ) is not flatten_fragment("Test Endpoint", flatten_prac_json, practitioner)
+
+
+def test_role_fragments_follow_their_organization():
+    role = graph_bundle["entry"][1]["resource"]
+    organization = dict(graph_bundle["entry"][3]["resource"], meta={"versionId": "1"})
+
+    def group_name(organization):
+        return flatten_fragment(
+            "Test Endpoint",
+            flatten_role_json,
+            role,
+            organization,
+            depends_on=organization,
+        )["GroupName"]
+
+    assert group_name(organization) == "NORTH VALLEY CLINIC"
+    assert group_name(None) is None
+    assert (
+        group_name(dict(organization, name="RENAMED", meta={"versionId": "2"}))
+        == "RENAMED"
+    )
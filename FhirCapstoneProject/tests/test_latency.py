@@ -0,0 +1,116 @@
+# Description: Tests the latency histograms that each SmartClient derives its request timeouts from
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from FhirCapstoneProject.fhirtypepkg.latency import (
+    CONNECT,
+    OTHER,
+    PRACTITIONER,
+    REFERENCE,
+    LatencyHistogram,
+    LatencyTracker,
+    current_operation,
+    operation,
+)
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+
+    for _ in range(99):
+        histogram.record(0.1)
+    histogram.record(10.0)
+
+    assert histogram.count() == 100
+    assert 0.1 <= histogram.percentile(0.5) < 0.15
+    assert 0.1 <= histogram.percentile(0.99) < 0.15
+    assert histogram.percentile(1.0) >= 10.0
+
+
+def test_histogram_window_rolls_over(clock):
+    histogram = LatencyHistogram(window_seconds=60, clock=clock)
+
+    histogram.record(1.0)
+    clock.now = 60.0
+    histogram.record(1.0)
+    assert histogram.count() == 2
+
+    clock.now = 120.0
+    assert histogram.count() == 1
+
+    clock.now = 300.0
+    assert histogram.count() == 0
+    assert histogram.percentile(0.99) is None
+
+
+def test_tracker_uses_defaults_until_enough_samples():
+    tracker = LatencyTracker(
+        default_timeout=30, default_connect_timeout=5, min_samples=10
+    )
+
+    for _ in range(9):
+        tracker.record(PRACTITIONER, 0.2)
+
+    assert tracker.timeouts(PRACTITIONER) == (5, 30)
+
+
+def test_tracker_derives_clamped_timeouts():
+    tracker = LatencyTracker(
+        min_timeout=1.0, max_timeout=20.0, headroom=3.0, min_samples=10
+    )
+
+    for _ in range(10):
+        tracker.record(PRACTITIONER, 2.0)
+        tracker.record(REFERENCE, 0.01)
+        tracker.record(OTHER, 60.0)
+
+    # Slow but steady endpoints keep a timeout above their usual latency
+    assert 6.0 <= tracker.timeout(PRACTITIONER) < 9.0
+    assert tracker.timeout(REFERENCE) == 1.0
+    assert tracker.timeout(OTHER) == 20.0
+
+    exported = tracker.export()
+    assert exported[PRACTITIONER]["count"] == 10
+    assert exported[PRACTITIONER]["buckets"][-1]["le"] == "+Inf"
+    assert exported[PRACTITIONER]["timeout"] == tracker.timeout(PRACTITIONER)
+    assert CONNECT not in exported
+
+
+def test_operation_is_inherited_by_tasks():
+    async def read_in_task():
+        with operation(REFERENCE):
+            return await asyncio.create_task(asyncio.to_thread(current_operation.get))
+
+    assert asyncio.run(read_in_task()) == REFERENCE
+    assert current_operation.get() == OTHER
+
+
+def test_timed_out_request_is_recorded_at_its_timeout(make_smart_client, fhir_server):
+    async def run():
+        async def practitioner(request):
+            await asyncio.sleep(1)
+            return web.json_response({"resourceType": "Bundle", "type": "searchset"})
+
+        async with fhir_server({"/fhir/Practitioner": practitioner}) as host:
+            client = make_smart_client(
+                host=host,
+                address="/fhir/",
+                default_timeout=0.1,
+                default_connect_timeout=0.1,
+                retry_max_attempts=1,
+            )
+            try:
+                with pytest.raises(asyncio.TimeoutError):
+                    await client._async_http_json_query("Practitioner", [])
+            finally:
+                await client.close()
+
+        return client.latency
+
+    latency = asyncio.run(run())
+
+    assert latency.count(OTHER) == 1
+    assert latency.percentile(OTHER, 1.0) >= 0.2
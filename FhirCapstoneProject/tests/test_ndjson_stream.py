@@ -0,0 +1,288 @@
+# Description: Tests streaming the records of each endpoint as newline delimited JSON as soon as it has answered
+
+import asyncio
+import json
+
+import pytest
+
+import FhirCapstoneProject.swaggerUI.app.extensions as extensions
+from FhirCapstoneProject.fhirtypepkg.flatten import StandardProcessModel
+from FhirCapstoneProject.swaggerUI.app import app
+
+NPI = "1234567890"
+
+
+def record(endpoint: str, npi: str = NPI) -> dict:
+    return dict(
+        dict.fromkeys(StandardProcessModel.model_fields),
+        Endpoint=endpoint,
+        NPI=npi,
+        FirstName="Jane",
+        LastName="Doe",
+    )
+
+
+def answer_after(seconds: float):
+    async def answer(client, family_name, given_name, npi):
+        await asyncio.sleep(seconds)
+        return [record(client.get_endpoint_name(), npi)]
+
+    return answer
+
+
+async def find_nothing(client, family_name, given_name, npi):
+    return []
+
+
+async def find_invalid(client, family_name, given_name, npi):
+    await asyncio.sleep(0.05)
+    return [dict(record(client.get_endpoint_name(), npi), NPI="123")]
+
+
+async def fail(client, family_name, given_name, npi):
+    raise ValueError("Unexpected response")
+
+
+@pytest.fixture
+def consensus(monkeypatch):
+    """
+    Replaces the model with one that scores every record 1 and predicts a record of the endpoints that answered, in
+    the order given.
+    """
+    monkeypatch.setattr(
+        extensions,
+        "calc_accuracy",
+        lambda records, predicted: [dict(data, AccuracyScore=1.0) for data in records],
+    )
+    monkeypatch.setattr(
+        extensions,
+        "predict",
+        lambda records: dict(
+            record("Consensus", records[0]["NPI"]),
+            Endpoints=[data["Endpoint"] for data in records],
+        ),
+    )
+
+
+def scored(records: list) -> list:
+    return [
+        (data["Endpoint"], data["NPI"], data.get("AccuracyScore") is not None)
+        for data in records
+    ]
+
+
+def getdata(**query) -> dict:
+    return dict(
+        {
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "npi": NPI,
+            "endpoint": "All",
+            "format": "NDJSON",
+            "consensus": "False",
+        },
+        **query,
+    )
+
+
+def lines(response) -> list:
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_as_answered_yields_in_the_order_finished():
+    async def after(seconds: float, result: str):
+        await asyncio.sleep(seconds)
+        return result
+
+    async def collect():
+        return [
+            answered
+            async for answered in extensions.as_answered(
+                [after(0.1, "slow"), after(0, "fast"), after(0.05, "middle")]
+            )
+        ]
+
+    assert asyncio.run(collect()) == [(1, "fast"), (2, "middle"), (0, "slow")]
+
+
+def test_as_answered_cancels_the_rest_when_closed():
+    cancelled = []
+
+    async def after(seconds: float):
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            cancelled.append(seconds)
+            raise
+        return seconds
+
+    async def first():
+        answered = extensions.as_answered([after(10), after(0)])
+        result = await answered.__anext__()
+        await answered.aclose()
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(first()) == (1, 0)
+    assert cancelled == [10]
+
+
+def test_stream_yields_each_endpoint_as_it_answers(endpoints, consensus):
+    endpoints(Slow=answer_after(0.1), Fast=answer_after(0))
+
+    async def collect():
+        return [
+            data
+            async for data in extensions.stream_all_practitioner_data(
+                "Doe", "Jane", NPI, consensus=True
+            )
+        ]
+
+    records = asyncio.run(collect())
+
+    # The consensus follows every record, and is taken in endpoint order as without streaming
+    assert scored(records) == [
+        ("Fast", NPI, False),
+        ("Slow", NPI, False),
+        ("Slow", NPI, True),
+        ("Fast", NPI, True),
+        ("Consensus", NPI, False),
+    ]
+    assert records[-1]["Endpoints"] == ["Slow", "Fast"]
+
+
+def test_batch_stream_yields_each_practitioner_as_it_is_found(endpoints, consensus):
+    other_npi = "0987654321"
+
+    async def answer_slowly(client, family_name, given_name, npi):
+        await asyncio.sleep(0.2 if npi == other_npi else 0.1)
+        return [record(client.get_endpoint_name(), npi)]
+
+    endpoints(Slow=answer_slowly, Fast=answer_after(0))
+
+    async def collect():
+        return [
+            data
+            async for data in extensions.stream_all_practitioner_data_batch(
+                [("Doe", "Jane", NPI), ("Roe", "Rick", other_npi)], consensus=True
+            )
+        ]
+
+    records = asyncio.run(collect())
+
+    assert scored(records) == [
+        ("Fast", NPI, False),
+        ("Fast", other_npi, False),
+        ("Slow", NPI, False),
+        ("Slow", NPI, True),
+        ("Fast", NPI, True),
+        ("Consensus", NPI, False),
+        ("Slow", other_npi, False),
+        ("Slow", other_npi, True),
+        ("Fast", other_npi, True),
+        ("Consensus", other_npi, False),
+    ]
+    assert records[-1]["Endpoints"] == ["Slow", "Fast"]
+
+
+def test_batch_stream_answers_for_an_endpoint_that_fails(endpoints, consensus):
+    endpoints(Fast=answer_after(0), Broken=fail)
+    partial_results = extensions.PartialResults()
+
+    async def collect():
+        return [
+            data
+            async for data in extensions.stream_all_practitioner_data_batch(
+                [("Doe", "Jane", NPI)],
+                consensus=True,
+                partial_results=partial_results,
+            )
+        ]
+
+    records = asyncio.run(collect())
+
+    assert scored(records) == [
+        ("Fast", NPI, False),
+        ("Fast", NPI, True),
+        ("Consensus", NPI, False),
+    ]
+    assert partial_results.failed == ["Broken"]
+
+
+def test_getdata_streams_tagged_lines(endpoints, consensus):
+    endpoints(Slow=answer_after(0.1), Fast=answer_after(0), Broken=fail)
+
+    response = app.test_client().get(
+        "/api/getdata", query_string=getdata(consensus="True")
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert [list(line) for line in lines(response)] == [["record"]] * 5 + [
+        ["partial_results"]
+    ]
+    assert scored([line["record"] for line in lines(response)[:-1]]) == [
+        ("Fast", NPI, False),
+        ("Slow", NPI, False),
+        ("Slow", NPI, True),
+        ("Fast", NPI, True),
+        ("Consensus", NPI, False),
+    ]
+    assert lines(response)[-1] == {"partial_results": {"X-Failed-Endpoints": "Broken"}}
+
+
+def test_getdata_stream_of_nothing_is_not_found(endpoints):
+    endpoints(Empty=find_nothing, Broken=fail)
+
+    response = app.test_client().get("/api/getdata", query_string=getdata())
+
+    assert response.status_code == 404
+    assert "failed: Broken" in response.json["message"]
+
+
+def test_getdata_stream_ends_with_an_error_on_an_invalid_record(endpoints):
+    endpoints(Valid=answer_after(0), Invalid=find_invalid)
+
+    response = app.test_client().get("/api/getdata", query_string=getdata())
+
+    assert response.status_code == 200
+    assert lines(response) == [
+        {"record": record("Valid")},
+        {
+            "error": {
+                "message": "NPI must be exactly 10 digits.",
+                "status_code": 400,
+            }
+        },
+    ]
+
+
+def test_getdata_stream_refuses_an_invalid_first_record(endpoints):
+    endpoints(Invalid=find_invalid)
+
+    response = app.test_client().get("/api/getdata", query_string=getdata())
+
+    assert response.status_code == 400
+    assert response.json["message"] == "NPI must be exactly 10 digits."
+
+
+def test_getlistdata_streams_tagged_lines(endpoints):
+    endpoints(Fast=answer_after(0))
+    other_npi = "0987654321"
+
+    response = app.test_client().post(
+        "/api/getdata",
+        query_string={"endpoint": "All", "format": "NDJSON", "consensus": "False"},
+        json={
+            "practitioners": [
+                {"first_name": "Jane", "last_name": "Doe", "npi": NPI},
+                {"first_name": "Rick", "last_name": "Roe", "npi": other_npi},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    assert lines(response) == [
+        {"record": record("Fast")},
+        {"record": record("Fast", other_npi)},
+    ]
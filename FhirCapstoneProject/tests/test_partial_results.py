@@ -0,0 +1,139 @@
+# Description: Tests that endpoints which time out, are unavailable or fail are left out of the results, not fail them
+
+import asyncio
+
+from aiohttp import ClientResponseError
+
+import FhirCapstoneProject.swaggerUI.app.extensions as extensions
+from FhirCapstoneProject.fhirtypepkg.fhirtype import ExceptionNPI
+from FhirCapstoneProject.swaggerUI.app import app
+from FhirCapstoneProject.swaggerUI.app.extensions import PartialResults
+
+NPI = "1234567890"
+
+GETDATA_QUERY = {
+    "first_name": "Jane",
+    "last_name": "Doe",
+    "npi": NPI,
+    "endpoint": "All",
+    "format": "JSON",
+    "consensus": "False",
+}
+
+
+def record(endpoint: str) -> dict:
+    return {
+        "Endpoint": endpoint,
+        "NPI": NPI,
+        "FirstName": "Jane",
+        "LastName": "Doe",
+    }
+
+
+async def answer(client, family_name, given_name, npi):
+    return [record(client.get_endpoint_name())]
+
+
+async def answer_late(client, family_name, given_name, npi):
+    await asyncio.sleep(10)
+    return [record(client.get_endpoint_name())]
+
+
+async def fail_status(client, family_name, given_name, npi):
+    raise ClientResponseError(None, (), status=503, message="Service Unavailable")
+
+
+async def fail_flattening(client, family_name, given_name, npi):
+    raise ExceptionNPI("NPI could not be flattened")
+
+
+def test_failing_endpoints_are_left_out(endpoints):
+    endpoints(
+        Answers=answer,
+        BadStatus=fail_status,
+        BadRecord=fail_flattening,
+        Late=answer_late,
+    )
+    partial_results = PartialResults()
+
+    records = asyncio.run(
+        extensions.search_all_practitioner_data(
+            "Doe",
+            "Jane",
+            NPI,
+            deadline_seconds=0.2,
+            partial_results=partial_results,
+        )
+    )
+
+    assert records == [record("Answers")]
+    assert partial_results.timed_out == ["Late"]
+    assert partial_results.unavailable == []
+    assert sorted(partial_results.failed) == ["BadRecord", "BadStatus"]
+    assert partial_results.headers() == {
+        "X-Timed-Out-Endpoints": "Late",
+        "X-Failed-Endpoints": "BadRecord, BadStatus",
+    }
+    assert partial_results.message() == (
+        " (timed out: Late; failed: BadRecord, BadStatus)"
+    )
+
+
+def test_batch_search_leaves_failing_endpoints_out(endpoints):
+    endpoints(Answers=answer, BadStatus=fail_status)
+    partial_results = PartialResults()
+
+    results = asyncio.run(
+        extensions.search_all_practitioner_data_batch(
+            [("Doe", "Jane", NPI), ("Roe", "Rick", "0987654321")],
+            partial_results=partial_results,
+        )
+    )
+
+    assert results == [[record("Answers")], [record("Answers")]]
+    assert partial_results.failed == ["BadStatus"]
+
+
+def test_endpoint_with_open_circuit_is_not_searched(endpoints):
+    clients = endpoints(Answers=answer, Open=fail_status)
+    for _ in range(clients["Open"].circuit_breaker.minimum_requests):
+        clients["Open"].circuit_breaker.record_failure()
+    partial_results = PartialResults()
+
+    records = asyncio.run(
+        extensions.search_all_practitioner_data(
+            "Doe", "Jane", NPI, partial_results=partial_results
+        )
+    )
+
+    assert records == [record("Answers")]
+    assert partial_results.unavailable == ["Open"]
+    assert partial_results.failed == []
+
+
+def test_getdata_lists_the_endpoints_left_out(endpoints, monkeypatch):
+    endpoints(Answers=answer, BadStatus=fail_status, Late=answer_late)
+    monkeypatch.setattr(extensions, "request_deadline_seconds", 0.2)
+
+    response = app.test_client().get(
+        "/api/getdata",
+        query_string=GETDATA_QUERY,
+    )
+
+    assert response.status_code == 200
+    assert response.json == [record("Answers")]
+    assert response.headers["X-Timed-Out-Endpoints"] == "Late"
+    assert response.headers["X-Failed-Endpoints"] == "BadStatus"
+    assert "X-Unavailable-Endpoints" not in response.headers
+
+
+def test_getdata_names_the_endpoints_left_out_when_nothing_is_found(endpoints):
+    endpoints(BadStatus=fail_status, BadRecord=fail_flattening)
+
+    response = app.test_client().get(
+        "/api/getdata",
+        query_string=GETDATA_QUERY,
+    )
+
+    assert response.status_code == 404
+    assert "failed: BadRecord, BadStatus" in response.json["message"]
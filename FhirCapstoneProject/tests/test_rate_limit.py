@@ -0,0 +1,99 @@
+# Description: Tests the per-endpoint rate limit, in-flight limit and handling of throttled (429) responses
+
+import asyncio
+
+from aiohttp import web
+
+from FhirCapstoneProject.fhirtypepkg.ratelimit import RateLimiter, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+    # 2015-10-21 07:28:00 UTC, asked 30 seconds before
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412450.0) == 30.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412500.0) == 0.0
+
+
+def test_token_bucket_spaces_requests_after_burst(clock):
+    limiter = RateLimiter(rate=2.0, burst=2.0, clock=clock)
+
+    assert limiter._reserve() == 0.0
+    assert limiter._reserve() == 0.0
+    assert limiter._reserve() == 0.5
+
+    clock.now = 0.5
+    assert limiter._reserve() == 0.0
+
+
+def test_pause_holds_back_every_request(clock):
+    limiter = RateLimiter(clock=clock)
+
+    assert limiter._reserve() == 0.0
+
+    limiter.pause(5.0)
+    limiter.pause(1.0)
+    assert limiter._reserve() == 5.0
+
+    clock.now = 5.0
+    assert limiter._reserve() == 0.0
+
+
+def test_max_in_flight():
+    limiter = RateLimiter(max_in_flight=2)
+    in_flight = []
+
+    async def request():
+        async with limiter.acquire():
+            in_flight.append(1)
+            peak = len(in_flight)
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return peak
+
+    async def run():
+        return await asyncio.gather(*(request() for _ in range(6)))
+
+    assert max(asyncio.run(run())) == 2
+
+
+def test_throttled_request_is_sent_again_after_retry_after(
+    make_smart_client, fhir_server
+):
+    async def run():
+        calls = []
+
+        async def practitioner(request):
+            calls.append(asyncio.get_running_loop().time())
+            if len(calls) == 1:
+                return web.Response(status=429, headers={"Retry-After": "1"})
+            return web.json_response({"resourceType": "Bundle", "type": "searchset"})
+
+        async with fhir_server({"/fhir/Practitioner": practitioner}) as host:
+            client = make_smart_client(host=host, address="/fhir/", max_retry_after=5.0)
+            try:
+                output = await client._async_http_json_query("Practitioner", [])
+            finally:
+                await client.close()
+
+        return calls, output, client.rate_limiter.stats()
+
+    calls, output, stats = asyncio.run(run())
+
+    assert output == {"resourceType": "Bundle", "type": "searchset"}
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.9
+    assert stats["requeued"] == 1
+    assert stats["throttled"] == 1
+
+
+def test_throttled_request_gives_up_when_asked_to_wait_too_long(make_smart_client):
+    client = make_smart_client(max_retry_after=60.0, max_requeues=3)
+
+    assert client._requeue_throttled("url", 429, {"Retry-After": "10"}, 0)
+    assert not client._requeue_throttled("url", 429, {"Retry-After": "10"}, 3)
+    assert not client._requeue_throttled("url", 429, {"Retry-After": "3600"}, 0)
+    assert not client._requeue_throttled("url", 503, {"Retry-After": "10"}, 0)
+    assert client.rate_limiter.stats()["requeued"] == 1
@@ -0,0 +1,116 @@
+# Description: Tests retrying transient upstream failures with exponential backoff and jitter
+
+import asyncio
+import socket
+
+import aiohttp
+import pytest
+import requests
+from aiohttp import web
+
+from FhirCapstoneProject.fhirtypepkg.retry import RetryPolicy, deadline
+
+
+def test_backoff_is_exponential_capped_and_jittered():
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=3.0, jitter=0.5, rng=lambda: 0)
+
+    assert [policy.backoff(attempt) for attempt in range(1, 5)] == [0.5, 1.0, 2.0, 3.0]
+
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=3.0, jitter=0.5, rng=lambda: 1)
+    assert policy.backoff(2) == 0.5
+
+
+def test_retries_stop_at_max_attempts_and_deadline(clock):
+    policy = RetryPolicy(max_attempts=3, backoff_base=1.0, jitter=0, clock=clock)
+
+    assert policy.next_delay(1) == 1.0
+    assert policy.next_delay(2) == 2.0
+    assert policy.next_delay(3) is None
+
+    with deadline(1.5):
+        assert policy.next_delay(1) == 1.0
+        assert policy.next_delay(2) is None
+
+    assert policy.stats() == {
+        "max_attempts": 3,
+        "retries": 3,
+        "recovered": 0,
+        "exhausted": 1,
+        "deadline_exceeded": 1,
+    }
+
+
+def test_retryable_exceptions_by_name():
+    policy = RetryPolicy(retryable_exceptions=("timeout",))
+
+    assert policy.is_retryable_exception(asyncio.TimeoutError())
+    assert policy.is_retryable_exception(requests.ReadTimeout())
+    assert not policy.is_retryable_exception(requests.ConnectionError())
+    assert not policy.is_retryable_exception(ValueError())
+
+    policy = RetryPolicy(retryable_exceptions=("connection",))
+    assert not policy.is_retryable_exception(requests.exceptions.SSLError())
+
+    # A misspelt name is refused rather than never retried
+    with pytest.raises(ValueError):
+        RetryPolicy(retryable_exceptions=("connection", "timeouts"))
+
+
+def test_server_errors_are_retried_until_answered(
+    make_smart_client, fhir_server, caplog
+):
+    async def run():
+        calls = []
+
+        async def practitioner(request):
+            calls.append(request)
+            if len(calls) < 3:
+                return web.Response(status=503)
+            return web.json_response({"resourceType": "Bundle", "type": "searchset"})
+
+        async with fhir_server({"/fhir/Practitioner": practitioner}) as host:
+            client = make_smart_client(
+                host=host, address="/fhir/", retry_backoff_base=0.01
+            )
+            try:
+                output = await client._async_http_json_query("Practitioner", [])
+            finally:
+                await client.close()
+
+        return len(calls), output, client.retry_policy.stats()
+
+    calls, output, stats = asyncio.run(run())
+
+    assert calls == 3
+    assert output == {"resourceType": "Bundle", "type": "searchset"}
+    assert stats["retries"] == 2
+    assert stats["recovered"] == 1
+
+    retried = [r.getMessage() for r in caplog.records if "retrying" in r.getMessage()]
+    assert retried[0].startswith("Attempt 1 of 3 on Test Endpoint (http://127.0.0.1:")
+
+
+def test_connection_errors_give_up_after_max_attempts(make_smart_client):
+    # A port that nothing listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    client = make_smart_client(
+        host=f"127.0.0.1:{port}",
+        address="/fhir/",
+        retry_backoff_base=0.01,
+        retry_max_attempts=2,
+    )
+
+    async def run():
+        try:
+            await client._async_http_json_query("Practitioner", [])
+        finally:
+            await client.close()
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(run())
+
+    assert client.retry_policy.stats()["retries"] == 1
+    assert client.retry_policy.stats()["exhausted"] == 1
@@ -0,0 +1,96 @@
+# Description: Tests coalescing identical concurrent lookups into one upstream request
+
+import asyncio
+
+import pytest
+
+from FhirCapstoneProject.fhirtypepkg.singleflight import SingleFlight
+
+practitioner_bundle = {
+    "resourceType": "Bundle",
+    "type": "searchset",
+    "entry": [{"resource": {"resourceType": "Practitioner", "id": "p1"}}],
+}
+
+
+def test_concurrent_lookups_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def lookup(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        return await asyncio.gather(
+            flights.do("a", lambda: lookup(1)),
+            flights.do("a", lambda: lookup(2)),
+            flights.do("b", lambda: lookup(3)),
+        )
+
+    assert asyncio.run(run()) == [1, 1, 3]
+    assert calls == [1, 3]
+    assert flights.stats() == {"started": 2, "coalesced": 1, "in_flight": 0}
+
+
+def test_lookup_survives_one_caller_giving_up():
+    flights = SingleFlight()
+
+    async def lookup():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        impatient = asyncio.create_task(flights.do("a", lookup))
+        patient = asyncio.create_task(flights.do("a", lookup))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_lookup_is_cancelled_once_every_caller_gives_up():
+    flights = SingleFlight()
+    cancelled = []
+
+    async def lookup():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(flights.do("a", lookup), 0.01)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == [True]
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_identical_searches_share_one_upstream_query(make_smart_client):
+    client = make_smart_client(host="coalesce.host.name")
+    queries = []
+
+    async def _async_http_cached_json_query(query, params):
+        queries.append((query, params))
+        await asyncio.sleep(0.01)
+        return practitioner_bundle
+
+    client._async_http_cached_json_query = _async_http_cached_json_query
+
+    async def run():
+        return await asyncio.gather(
+            client._collect_search("Practitioner", [("family", "A"), ("given", "B")]),
+            client._collect_search("Practitioner", [("given", "B"), ("family", "A")]),
+        )
+
+    first, second = asyncio.run(run())
+
+    assert len(queries) == 1
+    assert first[0] is second[0]
+    assert first is not second
@@ -0,0 +1,86 @@
+# Description: Tests the lifecycle of the pooled aiohttp session owned by each SmartClient
+
+import asyncio
+import warnings
+
+import pytest
+import urllib3
+
+from FhirCapstoneProject.fhirtypepkg.smartclient import SmartClient
+
+
+@pytest.fixture
+def create_test_smart_client(make_smart_client):
+    return make_smart_client(pool_limit=10, pool_limit_per_host=2, dns_cache_ttl=60)
+
+
+def test_async_session_is_reused(create_test_smart_client):
+    async def get_sessions():
+        first = await create_test_smart_client._get_async_session()
+        second = await create_test_smart_client._get_async_session()
+        await create_test_smart_client.close()
+        return first, second
+
+    first, second = asyncio.run(get_sessions())
+
+    assert first is second
+    assert first.closed
+
+
+def test_async_session_uses_endpoint_pool_settings(create_test_smart_client):
+    async def get_connector():
+        session = await create_test_smart_client._get_async_session()
+        connector = session.connector
+        limits = (connector.limit, connector.limit_per_host)
+        await create_test_smart_client.close()
+        return limits
+
+    assert asyncio.run(get_connector()) == (10, 2)
+
+
+def test_async_session_is_replaced_on_new_loop(create_test_smart_client):
+    first = asyncio.run(create_test_smart_client._get_async_session())
+    second = asyncio.run(create_test_smart_client._get_async_session())
+
+    assert first is not second
+    assert first.closed
+
+    asyncio.run(create_test_smart_client.close())
+
+
+def test_http_client_endpoint_skips_certificate_verification(make_smart_client):
+    client = make_smart_client(use_http_client=True, secure_connection_needed=True)
+
+    async def get_connector_ssl():
+        session = await client._get_async_session()
+        verify = session.connector._ssl
+        await client.close()
+        return verify
+
+    assert client.http_client_session.verify is False
+    assert asyncio.run(get_connector_ssl()) is False
+
+
+def test_http_client_endpoint_only_silences_its_own_warnings(make_smart_client):
+    def warn(host: str):
+        warnings.warn(
+            f"Unverified HTTPS request is being made to host '{host}'. Adding certificate verification is "
+            "strongly advised.",
+            urllib3.exceptions.InsecureRequestWarning,
+        )
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        make_smart_client(
+            host="unverified.host.name",
+            use_http_client=True,
+            secure_connection_needed=True,
+        )
+
+        warn("unverified.host.name")
+        warn("other.host.name")
+
+    assert [str(warning.message) for warning in caught] == [
+        "Unverified HTTPS request is being made to host 'other.host.name'. Adding certificate verification is "
+        "strongly advised."
+    ]
@@ -0,0 +1,323 @@
+# Description: Tests searching an endpoint for many practitioners with ORed identifier searches
+
+import asyncio
+
+import pytest
+from aiohttp import ClientConnectionError
+
+import FhirCapstoneProject.fhirtypepkg.smartclient as ClientNamespace
+import FhirCapstoneProject.swaggerUI.app.extensions as extensions
+from FhirCapstoneProject.fhirtypepkg.smartclient import (
+    http_build_identifier_values,
+    practitioner_json_matches_name,
+)
+
+_SYSTEM = "http://hl7.org/fhir/sid/us-npi"
+
+
+def practitioner(_id: str, npi: str, family: str, given: str) -> dict:
+    return {
+        "resourceType": "Practitioner",
+        "id": _id,
+        "identifier": [{"system": _SYSTEM, "value": npi}],
+        "name": [{"family": family, "given": [given]}],
+    }
+
+
+def role(_id: str, practitioner_id: str, location_id: str) -> dict:
+    return {
+        "resourceType": "PractitionerRole",
+        "id": _id,
+        "practitioner": {"reference": "Practitioner/" + practitioner_id},
+        "location": [{"reference": "Location/" + location_id}],
+    }
+
+
+resources = {
+    "1111111111": [
+        practitioner("p1", "1111111111", "Smith", "Jane"),
+        role("r1", "p1", "l1"),
+    ],
+    "2222222222": [
+        practitioner("p2", "2222222222", "Jones", "Ann"),
+        practitioner("p3", "2222222222", "Brown", "Ann"),
+        role("r2", "p2", "l1"),
+        role("r3", "p3", "l1"),
+    ],
+    "3333333333": [
+        practitioner("p4", "3333333333", "Lee", "Sam"),
+        role("r4", "p4", "l1"),
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    ClientNamespace.reference_cache.clear()
+    ClientNamespace.response_cache.clear()
+
+
+@pytest.fixture
+def make_batch_client(make_smart_client):
+    def make(searched: list, failing: tuple = (), **kwargs):
+        client = make_smart_client(can_search_by_npi=True, **kwargs)
+        client._graph_search_params = lambda: [
+            ("_revinclude", "PractitionerRole:practitioner"),
+        ]
+
+        async def _async_http_json_query(query: str, params: list) -> dict:
+            if query == "Location/l1":
+                return {"resourceType": "Location", "id": "l1"}
+
+            searched.append(params)
+            npis = [
+                value.split("|")[1] for value in dict(params)["identifier"].split(",")
+            ]
+            if any(npi in failing for npi in npis):
+                raise ClientConnectionError("Connection reset")
+            return {
+                "resourceType": "Bundle",
+                "type": "searchset",
+                "entry": [
+                    {"resource": resource}
+                    for npi in npis
+                    for resource in resources[npi]
+                ],
+            }
+
+        client._async_http_json_query = _async_http_json_query
+        client._async_http_cached_json_query = _async_http_json_query
+
+        return client
+
+    return make
+
+
+def test_identifier_values_are_chunked_by_length():
+    npis = ["1111111111", "2222222222", "3333333333"]
+
+    assert http_build_identifier_values(npis, 2000) == [
+        ",".join(_SYSTEM + "|" + npi for npi in npis)
+    ]
+
+    # Room for two NPIs (44 encoded characters each, and a comma) but not three
+    values = http_build_identifier_values(npis, 100)
+    assert values == [
+        _SYSTEM + "|1111111111," + _SYSTEM + "|2222222222",
+        _SYSTEM + "|3333333333",
+    ]
+
+    # An NPI that does not fit on its own still gets a search
+    assert len(http_build_identifier_values(npis, 1)) == 3
+
+
+def test_names_match_like_a_string_search():
+    resource = practitioner("p1", "1111111111", "Smith-Jones", "Jane")
+
+    assert practitioner_json_matches_name(resource, "smith", "JA")
+    assert practitioner_json_matches_name(resource, None, None)
+    assert not practitioner_json_matches_name(resource, "Jones", "Jane")
+
+
+def test_batch_results_are_handed_back_to_each_search(monkeypatch, make_batch_client):
+    monkeypatch.setattr(ClientNamespace, "_MAX_SEARCH_URL_LENGTH", 200)
+    searched = []
+    client = make_batch_client(searched)
+
+    async def run():
+        try:
+            return await client.find_all_practitioner_json_batch(
+                [
+                    ("Smith", "Jane", "1111111111"),
+                    ("Brown", "Ann", "2222222222"),
+                    ("Nobody", "Else", "3333333333"),
+                    ("Smith", "Jane", "1111111111"),
+                ]
+            )
+        finally:
+            await client.close()
+
+    found = asyncio.run(run())
+
+    # Three NPIs, split across two searches to keep the URLs short
+    assert len(searched) == 2
+    assert all(("_revinclude", "PractitionerRole:practitioner") in s for s in searched)
+
+    assert len(found) == 4
+    assert [p["id"] for p in found[0][0]] == ["p1"]
+    assert [r["id"] for r in found[0][1]] == ["r1"]
+    assert [p["id"] for p in found[1][0]] == ["p3"]
+    assert [r["id"] for r in found[1][1]] == ["r3"]
+    assert found[1][2]["Location/l1"] == {"resourceType": "Location", "id": "l1"}
+    assert found[2] == (None, None, None)
+    assert found[3][0] == found[0][0]
+
+
+def test_failed_search_only_loses_its_practitioners(monkeypatch, make_batch_client):
+    monkeypatch.setattr(ClientNamespace, "_MAX_SEARCH_URL_LENGTH", 200)
+    searched = []
+    client = make_batch_client(searched, failing=("3333333333",))
+
+    found = asyncio.run(
+        client.find_all_practitioner_json_batch(
+            [
+                ("Smith", "Jane", "1111111111"),
+                ("Brown", "Ann", "2222222222"),
+                ("Lee", "Sam", "3333333333"),
+            ]
+        )
+    )
+
+    assert len(searched) == 2
+    assert [p["id"] for p in found[0][0]] == ["p1"]
+    assert [p["id"] for p in found[1][0]] == ["p3"]
+    assert found[2] == (None, None, None)
+
+
+def test_each_search_is_yielded_once_its_practitioners_are_found(
+    monkeypatch, make_batch_client
+):
+    monkeypatch.setattr(ClientNamespace, "_MAX_SEARCH_URL_LENGTH", 200)
+    client = make_batch_client([], failing=("3333333333",))
+
+    async def run():
+        return [
+            (index, practitioners and [p["id"] for p in practitioners])
+            async for index, (
+                practitioners,
+                _,
+                _,
+            ) in client.iterate_all_practitioner_json_batch(
+                [
+                    ("Smith", "Jane", "1111111111"),
+                    ("Brown", "Ann", "2222222222"),
+                    ("Lee", "Sam", "3333333333"),
+                ]
+            )
+        ]
+
+    # The searches of the failed chunk are not found, once the others have been
+    assert asyncio.run(run()) == [(0, ["p1"]), (1, ["p3"]), (2, None)]
+
+
+def test_every_search_failing_raises(monkeypatch, make_batch_client):
+    monkeypatch.setattr(ClientNamespace, "_MAX_SEARCH_URL_LENGTH", 200)
+    client = make_batch_client([], failing=("1111111111", "3333333333"))
+
+    with pytest.raises(ClientConnectionError):
+        asyncio.run(
+            client.find_all_practitioner_json_batch(
+                [
+                    ("Smith", "Jane", "1111111111"),
+                    ("Brown", "Ann", "2222222222"),
+                    ("Lee", "Sam", "3333333333"),
+                ]
+            )
+        )
+
+
+def test_ored_search_follows_pages_for_each_npi(make_batch_client):
+    client = make_batch_client([], max_search_pages=2)
+    max_pages = []
+    iterate_search_pages = client.iterate_search_pages
+
+    def spy(query, params, cached=True, pages=None, prefetch=None):
+        max_pages.append(pages)
+        return iterate_search_pages(query, params, cached, pages, prefetch)
+
+    client.iterate_search_pages = spy
+
+    asyncio.run(
+        client.find_all_practitioner_json_batch(
+            [
+                ("Smith", "Jane", "1111111111"),
+                ("Brown", "Ann", "2222222222"),
+                ("Lee", "Sam", "3333333333"),
+            ]
+        )
+    )
+
+    assert max_pages == [6]
+
+
+def test_endpoint_that_cannot_search_by_npi_is_searched_one_by_one(
+    monkeypatch, make_smart_client
+):
+    client = make_smart_client()
+    searched = []
+
+    async def search_endpoint_practitioner_data(
+        searched_client, family_name, given_name, npi
+    ):
+        searched.append(npi)
+        return [{"NPI": npi}]
+
+    monkeypatch.setattr(
+        extensions,
+        "search_endpoint_practitioner_data",
+        search_endpoint_practitioner_data,
+    )
+
+    found = asyncio.run(
+        extensions.search_endpoint_practitioner_batch(
+            client,
+            [("Smith", "Jane", "1111111111"), ("Brown", "Ann", "2222222222")],
+        )
+    )
+
+    assert not client.can_search_by_npi()
+    assert searched == ["1111111111", "2222222222"]
+    assert found == [[{"NPI": "1111111111"}], [{"NPI": "2222222222"}]]
+
+
+def test_failed_one_by_one_search_only_loses_its_practitioner(
+    monkeypatch, make_smart_client
+):
+    client = make_smart_client()
+    failing = {"2222222222"}
+
+    async def search_endpoint_practitioner_data(
+        searched_client, family_name, given_name, npi
+    ):
+        if npi in failing:
+            raise ClientConnectionError("Connection reset")
+        return [{"NPI": npi}]
+
+    monkeypatch.setattr(
+        extensions,
+        "search_endpoint_practitioner_data",
+        search_endpoint_practitioner_data,
+    )
+    searches = [("Smith", "Jane", "1111111111"), ("Brown", "Ann", "2222222222")]
+
+    found = asyncio.run(extensions.search_endpoint_practitioner_batch(client, searches))
+
+    assert found == [[{"NPI": "1111111111"}], []]
+
+    failing.add("1111111111")
+    with pytest.raises(ClientConnectionError):
+        asyncio.run(extensions.search_endpoint_practitioner_batch(client, searches))
+
+
+def test_batch_search_of_every_endpoint(monkeypatch, make_batch_client):
+    searched = []
+    client = make_batch_client(searched)
+    monkeypatch.setattr(extensions, "smart_clients", {"Test Endpoint": client})
+
+    found = asyncio.run(
+        extensions.search_all_practitioner_data_batch(
+            [
+                ("Smith", "Jane", "1111111111"),
+                ("Nobody", "Else", "3333333333"),
+                ("Brown", "Ann", "2222222222"),
+            ]
+        )
+    )
+
+    # Every NPI in one search
+    assert len(searched) == 1
+    assert [[record["LastName"] for record in records] for records in found] == [
+        ["Smith"],
+        [],
+        ["Brown"],
+    ]
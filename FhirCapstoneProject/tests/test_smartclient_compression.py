@@ -0,0 +1,111 @@
+# Description: Tests compressed transfer from upstream and decoding JSON straight from the response bytes
+
+import asyncio
+import gzip
+import json
+
+import pytest
+from aiohttp import web
+
+import FhirCapstoneProject.fhirtypepkg.smartclient as ClientNamespace
+from FhirCapstoneProject.fhirtypepkg import fhirtype
+
+practitioner_bundle = {
+    "resourceType": "Bundle",
+    "type": "searchset",
+    "entry": [
+        {"resource": {"resourceType": "Practitioner", "id": f"p{i}", "name": []}}
+        for i in range(200)
+    ],
+}
+
+
+@pytest.fixture(params=[False, True], ids=["json", "orjson"])
+def json_decoder(request, monkeypatch):
+    """
+    Decodes JSON with the json module, then with orjson.
+    """
+    if request.param:
+        pytest.importorskip("orjson")
+
+    monkeypatch.setattr(fhirtype, "use_orjson", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "encoding", ["utf-8", "utf-8-sig", "utf-16", "utf-16-le", "utf-32-be"]
+)
+def test_loads_json_reads_bytes(json_decoder, encoding):
+    document = {"resourceType": "Practitioner", "name": [{"family": "Müller"}]}
+
+    assert fhirtype.loads_json(json.dumps(document).encode(encoding)) == document
+    assert fhirtype.loads_json(json.dumps(document)) == document
+
+
+def test_loads_json_uses_the_chosen_decoder(json_decoder, monkeypatch):
+    decoded = []
+    orjson = pytest.importorskip("orjson")
+    orjson_loads = orjson.loads
+
+    def loads(data):
+        decoded.append(data)
+        return orjson_loads(data)
+
+    monkeypatch.setattr(orjson, "loads", loads)
+
+    assert fhirtype.loads_json(b'{"id": "p1"}') == {"id": "p1"}
+    assert decoded == ([b'{"id": "p1"}'] if json_decoder else [])
+
+
+def test_accept_encoding_offers_brotli_only_when_installed():
+    if ClientNamespace.brotli is not None:
+        assert ClientNamespace._ACCEPT_ENCODING == "gzip, deflate, br"
+    else:
+        assert ClientNamespace._ACCEPT_ENCODING == "gzip, deflate"
+
+
+def compressors() -> dict:
+    compressors = {"gzip": gzip.compress}
+    if ClientNamespace.brotli is not None:
+        compressors["br"] = ClientNamespace.brotli.compress
+    return compressors
+
+
+@pytest.mark.parametrize("content_encoding", ["gzip", "br"])
+def test_compressed_response_is_negotiated_and_decoded(
+    make_smart_client, fhir_server, monkeypatch, content_encoding
+):
+    if content_encoding not in compressors():
+        pytest.skip("Brotli is not installed")
+
+    # Whatever the module offers is what upstream is asked for, rather than aiohttp's default
+    monkeypatch.setattr(ClientNamespace, "_ACCEPT_ENCODING", content_encoding)
+
+    async def run():
+        received = {}
+
+        async def practitioner(request):
+            received["accept-encoding"] = request.headers.get("Accept-Encoding", "")
+            return web.Response(
+                body=compressors()[content_encoding](
+                    json.dumps(practitioner_bundle).encode("utf-8")
+                ),
+                headers={
+                    "Content-Encoding": content_encoding,
+                    "Content-Type": "application/fhir+json",
+                },
+            )
+
+        async with fhir_server({"/fhir/Practitioner": practitioner}) as host:
+            client = make_smart_client(host=host, address="/fhir/")
+            try:
+                output = await client._async_http_json_query("Practitioner", [])
+            finally:
+                await client.close()
+
+        return received, output
+
+    received, output = asyncio.run(run())
+
+    assert received["accept-encoding"] == content_encoding
+    assert output == practitioner_bundle
@@ -0,0 +1,121 @@
+# Description: Tests fetching the Practitioner -> PractitionerRole -> Location graph with _revinclude/_include
+
+import asyncio
+
+import pytest
+from fhirclient.models.capabilitystatement import CapabilityStatement
+from fhirclient.models.location import Location
+
+import FhirCapstoneProject.fhirtypepkg.smartclient as ClientNamespace
+
+_NPI = "1234567890"
+
+
+def make_capability_statement(rev_includes: list, includes: list):
+    return CapabilityStatement(
+        {
+            "resourceType": "CapabilityStatement",
+            "status": "active",
+            "date": "2024-01-01",
+            "kind": "instance",
+            "fhirVersion": "4.0.1",
+            "format": ["json"],
+            "rest": [
+                {
+                    "mode": "server",
+                    "resource": [
+                        {"type": "Practitioner", "searchRevInclude": rev_includes},
+                        {"type": "PractitionerRole", "searchInclude": includes},
+                    ],
+                }
+            ],
+        }
+    )
+
+
+graph_bundle = {
+    "resourceType": "Bundle",
+    "type": "searchset",
+    "entry": [
+        {
+            "resource": {
+                "resourceType": "Practitioner",
+                "id": "p1",
+                "identifier": [
+                    {"system": "http://hl7.org/fhir/sid/us-npi", "value": _NPI}
+                ],
+            }
+        },
+        {
+            "resource": {
+                "resourceType": "PractitionerRole",
+                "id": "r1",
+                "practitioner": {"reference": "Practitioner/p1"},
+                "location": [{"reference": "Location/l1"}],
+            }
+        },
+        {
+            "resource": {
+                "resourceType": "PractitionerRole",
+                "id": "r2",
+                "practitioner": {"reference": "Practitioner/someone-else"},
+                "location": [{"reference": "Location/l1"}],
+            }
+        },
+        {"resource": {"resourceType": "Location", "id": "l1", "name": "Clinic"}},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_reference_cache():
+    ClientNamespace.reference_cache.clear()
+
+
+@pytest.fixture
+def create_test_smart_client(make_smart_client):
+    client = make_smart_client()
+
+    client.queries = []
+
+    async def _async_http_json_query(query: str, params: list) -> dict:
+        client.queries.append((query, params))
+        return graph_bundle
+
+    client._async_http_json_query = _async_http_json_query
+    client._async_http_cached_json_query = _async_http_json_query
+
+    return client
+
+
+def test_graph_search_params_follow_capability_statement(create_test_smart_client):
+    assert create_test_smart_client._graph_search_params() is None
+
+    create_test_smart_client._load_capabilities(
+        make_capability_statement(
+            ["PractitionerRole:practitioner"], ["PractitionerRole:location"]
+        )
+    )
+
+    assert create_test_smart_client._graph_search_params() == [
+        ("_revinclude", "PractitionerRole:practitioner"),
+        ("_include:iterate", "PractitionerRole:location"),
+    ]
+
+
+def test_graph_is_fetched_in_one_query(create_test_smart_client):
+    create_test_smart_client._load_capabilities(
+        make_capability_statement(
+            ["PractitionerRole:practitioner"], ["PractitionerRole:location"]
+        )
+    )
+
+    practitioners, roles, locations = asyncio.run(
+        create_test_smart_client.find_all_practitioner_data("Smith", "Jane", _NPI)
+    )
+
+    assert len(create_test_smart_client.queries) == 1
+    assert [practitioner.id for practitioner in practitioners] == ["p1"]
+    assert [role.id for role in roles] == ["r1"]
+    assert isinstance(locations[0], Location)
+    assert locations[0].name == "Clinic"
@@ -0,0 +1,80 @@
+# Description: Tests hedging slow requests with a duplicate, within a per-endpoint budget
+
+import asyncio
+
+import pytest
+
+from FhirCapstoneProject.fhirtypepkg.latency import PRACTITIONER, operation
+from FhirCapstoneProject.fhirtypepkg.smartclient import SmartClient
+
+
+@pytest.fixture
+def make_client(make_smart_client):
+    def make(hedge_requests: bool, hedge_budget_burst: float = 10.0):
+        client = make_smart_client(
+            hedge_requests=hedge_requests, hedge_budget_burst=hedge_budget_burst
+        )
+
+        # The endpoint usually answers within 10ms
+        for _ in range(client.latency.min_samples):
+            client.latency.record(PRACTITIONER, 0.01)
+
+        # The first attempt hangs, any later one answers at once
+        client.attempts = []
+
+        async def _async_http_url_attempt(query_url, headers=None):
+            client.attempts.append(query_url)
+            if len(client.attempts) == 1:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    client.first_cancelled = True
+                    raise
+                return "first", ""
+            return "hedge", ""
+
+        client.first_cancelled = False
+        client._async_http_url_attempt = _async_http_url_attempt
+        return client
+
+    return make
+
+
+def request(client: SmartClient, timeout: float = 1.0):
+    async def run():
+        with operation(PRACTITIONER):
+            return await asyncio.wait_for(
+                client._async_http_url_request("Practitioner"), timeout
+            )
+
+    return asyncio.run(run())
+
+
+def test_slow_request_is_hedged(make_client):
+    client = make_client(hedge_requests=True)
+
+    assert request(client) == ("hedge", "")
+    assert len(client.attempts) == 2
+    assert client.first_cancelled
+    assert client.hedge_budget.stats()["hedges_won"] == 1
+
+
+def test_hedging_is_opt_in(make_client):
+    client = make_client(hedge_requests=False)
+
+    with pytest.raises(asyncio.TimeoutError):
+        request(client, timeout=0.2)
+    assert len(client.attempts) == 1
+
+
+def test_hedges_stop_when_budget_is_spent(make_client):
+    client = make_client(hedge_requests=True, hedge_budget_burst=1.0)
+
+    assert request(client) == ("hedge", "")
+
+    # The budget has earned only a fraction of a hedge since
+    client.attempts = []
+    with pytest.raises(asyncio.TimeoutError):
+        request(client, timeout=0.2)
+    assert len(client.attempts) == 1
+    assert client.hedge_budget.stats()["rejected"] == 1
@@ -0,0 +1,91 @@
+# Description: Tests streaming the pages of a search Bundle by following link[relation=next]
+
+import asyncio
+
+import pytest
+
+from FhirCapstoneProject.fhirtypepkg.smartclient import bundle_next_url
+
+_PAGE_COUNT = 5
+
+
+def make_page(number: int) -> dict:
+    page = {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "entry": [
+            {"resource": {"resourceType": "Practitioner", "id": f"p{number}-{i}"}}
+            for i in range(2)
+        ],
+    }
+    if number + 1 < _PAGE_COUNT:
+        page["link"] = [
+            {"relation": "self", "url": f"https://host.name/page/{number}"},
+            {"relation": "next", "url": f"https://host.name/page/{number + 1}"},
+        ]
+    return page
+
+
+@pytest.fixture
+def create_test_smart_client(make_smart_client):
+    client = make_smart_client(max_search_pages=3)
+    client.pages_fetched = []
+
+    async def _async_http_cached_json_query(query, params):
+        client.pages_fetched.append(0)
+        return make_page(0)
+
+    async def _async_http_url_json_query(query_url):
+        number = int(query_url.rsplit("/", 1)[1])
+        client.pages_fetched.append(number)
+        return make_page(number)
+
+    client._async_http_cached_json_query = _async_http_cached_json_query
+    client._async_http_url_json_query = _async_http_url_json_query
+    return client
+
+
+def test_bundle_next_url():
+    assert bundle_next_url(make_page(0)) == "https://host.name/page/1"
+    assert bundle_next_url(make_page(_PAGE_COUNT - 1)) is None
+    assert bundle_next_url({}) is None
+
+
+def test_iterate_search_follows_every_page(create_test_smart_client):
+    async def collect():
+        return [
+            resource.id
+            async for resource in create_test_smart_client.iterate_search(
+                "Practitioner", []
+            )
+        ]
+
+    ids = asyncio.run(collect())
+
+    assert len(ids) == 2 * _PAGE_COUNT
+    assert ids[0] == "p0-0" and ids[-1] == f"p{_PAGE_COUNT - 1}-1"
+
+
+def test_iterate_search_stops_early_with_bounded_prefetch(create_test_smart_client):
+    async def take_first():
+        pages = create_test_smart_client.iterate_search("Practitioner", [])
+        first = await anext(pages)
+        # Give the background fetch every chance to run ahead
+        await asyncio.sleep(0.01)
+        await pages.aclose()
+        return first
+
+    first = asyncio.run(take_first())
+
+    assert first.id == "p0-0"
+    # The page being parsed, one prefetched and one waiting on the full queue
+    assert create_test_smart_client.pages_fetched == [0, 1, 2]
+
+
+def test_collect_search_stops_at_max_search_pages(create_test_smart_client):
+    resources = asyncio.run(
+        create_test_smart_client._collect_search("Practitioner", [])
+    )
+
+    assert len(resources) == 2 * 3
+    assert create_test_smart_client.pages_fetched == [0, 1, 2]
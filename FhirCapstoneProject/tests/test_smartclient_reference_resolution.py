@@ -0,0 +1,100 @@
+# Description: Tests the batched, asynchronous resolution of Location and Organization references
+
+import asyncio
+
+import pytest
+from fhirclient.models.location import Location
+from fhirclient.models.practitionerrole import PractitionerRole
+
+import FhirCapstoneProject.fhirtypepkg.smartclient as ClientNamespace
+
+
+def make_role(role_id: str, location_ids: list) -> PractitionerRole:
+    return PractitionerRole(
+        {
+            "resourceType": "PractitionerRole",
+            "id": role_id,
+            "location": [
+                {"reference": "Location/" + location_id} for location_id in location_ids
+            ],
+        }
+    )
+
+
+def make_location_json(location_id: str) -> dict:
+    return {"resourceType": "Location", "id": location_id, "name": location_id}
+
+
+@pytest.fixture(autouse=True)
+def clear_reference_cache():
+    ClientNamespace.reference_cache.clear()
+
+
+@pytest.fixture
+def create_test_smart_client(make_smart_client):
+    client = make_smart_client()
+
+    # Record each query and answer it as the endpoint would
+    client.queries = []
+
+    async def _async_http_json_query(query: str, params: list) -> dict:
+        client.queries.append((query, params))
+
+        if params:
+            ids = params[0][1].split(",")
+            return {
+                "resourceType": "Bundle",
+                "entry": [{"resource": make_location_json(_id)} for _id in ids],
+            }
+
+        return make_location_json(query.split("/")[1])
+
+    client._async_http_json_query = _async_http_json_query
+
+    return client
+
+
+def test_split_reference():
+    assert ClientNamespace.split_reference("Location/1") == ("Location", "1")
+    assert ClientNamespace.split_reference(
+        "https://site.com/fhir/Location/1/_history/2"
+    ) == ("Location", "1")
+    assert ClientNamespace.split_reference("Location") is None
+
+
+def test_references_are_deduplicated(create_test_smart_client):
+    roles = [make_role("a", ["1", "2"]), make_role("b", ["2"])]
+
+    asyncio.run(create_test_smart_client._async_resolve_references(roles))
+
+    assert sorted(query for query, _ in create_test_smart_client.queries) == [
+        "Location/1",
+        "Location/2",
+    ]
+    assert isinstance(roles[0].location[0], Location)
+    assert roles[0].location[1] is roles[1].location[0]
+
+
+def test_references_are_batched_when_id_search_is_supported(
+    create_test_smart_client,
+):
+    create_test_smart_client._search_params_by_type = {"Location": {"_id"}}
+    roles = [make_role("a", ["1", "2"]), make_role("b", ["3"])]
+
+    asyncio.run(create_test_smart_client._async_resolve_references(roles))
+
+    assert create_test_smart_client.queries == [("Location", [("_id", "1,2,3")])]
+    assert [location.id for location in roles[0].location] == ["1", "2"]
+    assert roles[1].location[0].id == "3"
+
+
+def test_resolved_references_are_cached_across_requests(create_test_smart_client):
+    asyncio.run(
+        create_test_smart_client._async_resolve_references([make_role("a", ["1"])])
+    )
+    role = make_role("b", ["1"])
+    asyncio.run(create_test_smart_client._async_resolve_references([role]))
+
+    assert len(create_test_smart_client.queries) == 1
+    assert role.location[0].id == "1"
+    assert ClientNamespace.reference_cache.stats()["hits"] == 1
@@ -0,0 +1,111 @@
+# Description: Tests the conditional-revalidation cache of practitioner search responses
+
+import asyncio
+import json
+
+import aiohttp
+import pytest
+
+import FhirCapstoneProject.fhirtypepkg.smartclient as ClientNamespace
+from FhirCapstoneProject.fhirtypepkg.cache import ResponseCache
+from FhirCapstoneProject.fhirtypepkg.smartclient import SmartClient
+
+bundle = {"resourceType": "Bundle", "type": "searchset", "entry": []}
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: dict):
+        self.status = status
+        self.headers = headers
+        self.request_info = None
+        self.history = ()
+        self.reason = ""
+
+
+@pytest.fixture
+def response_cache(clock, monkeypatch):
+    # Practitioner search responses cached by the fake clock
+    monkeypatch.setattr(
+        ClientNamespace, "response_cache", ResponseCache(1024, clock=clock)
+    )
+
+
+@pytest.fixture
+def create_test_smart_client(make_smart_client):
+    client = make_smart_client()
+
+    # Answer as an endpoint that supports ETags would
+    client.requests = []
+
+    async def _async_http_request(query: str, params: list, headers=None):
+        client.requests.append(headers)
+
+        response_headers = {"ETag": '"v1"', "Cache-Control": "max-age=10"}
+        if headers and headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304, response_headers), ""
+
+        return FakeResponse(200, response_headers), json.dumps(bundle)
+
+    client._async_http_request = _async_http_request
+
+    return client
+
+
+def query(client: SmartClient):
+    return asyncio.run(
+        client._async_http_cached_json_query("Practitioner", [("family", "Smith")])
+    )
+
+
+def test_fresh_response_is_served_from_cache(
+    clock, response_cache, create_test_smart_client
+):
+    first = query(create_test_smart_client)
+    clock.now = 5
+    second = query(create_test_smart_client)
+
+    assert first == bundle
+    assert second is first
+    assert len(create_test_smart_client.requests) == 1
+
+
+def test_stale_response_is_revalidated(clock, response_cache, create_test_smart_client):
+    first = query(create_test_smart_client)
+    clock.now = 11
+    second = query(create_test_smart_client)
+
+    assert second is first
+    assert create_test_smart_client.requests[1] == {"If-None-Match": '"v1"'}
+    assert ClientNamespace.response_cache.stats()["revalidations"] == 1
+
+    # The 304 made the entry fresh again
+    clock.now = 15
+    query(create_test_smart_client)
+    assert len(create_test_smart_client.requests) == 2
+
+
+def test_failed_revalidation_is_raised(clock, response_cache, create_test_smart_client):
+    query(create_test_smart_client)
+    clock.now = 11
+
+    async def _async_http_request(query: str, params: list, headers=None):
+        raise aiohttp.ClientConnectionError("Connection reset")
+
+    create_test_smart_client._async_http_request = _async_http_request
+
+    # Rather than an empty response, which would read as no practitioners found
+    with pytest.raises(aiohttp.ClientConnectionError):
+        query(create_test_smart_client)
+
+
+def test_response_cache_evicts_by_memory():
+    cache = ResponseCache(max_bytes=10, policy="lfu")
+
+    cache.store("a", "a", 4, None, None, 60)
+    cache.store("b", "b", 4, None, None, 60)
+    cache.lookup("a")
+    cache.store("c", "c", 4, None, None, 60)
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a").value == "a"
+    assert cache.stats()["bytes"] == 8
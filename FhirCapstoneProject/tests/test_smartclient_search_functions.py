@@ -1,11 +1,12 @@
 # Authors: Iain Richey, Trenton Young
 # Description: Tests the static functions of the SmartClient namespace.
 
+import asyncio
+
 import pytest
 from unittest.mock import Mock
 
 from FhirCapstoneProject.fhirtypepkg.endpoint import Endpoint
-from FhirCapstoneProject.fhirtypepkg.smartclient import SmartClient
 
 
 @pytest.fixture
@@ -35,22 +36,8 @@ def create_search_parameters():
 
 
 @pytest.fixture
-def create_test_endpoint_without_ssl():
-    return Endpoint(
-        name="Test Endpoint",
-        host="host.name",
-        address="/address/",
-        enable_http=False,
-        use_http_client=False,
-        get_metadata_on_init=False,
-        can_search_by_npi=False,
-        secure_connection_needed=False,
-    )
-
-
-@pytest.fixture
-def create_test_smart_client_without_ssl(create_test_endpoint_without_ssl):
-    return SmartClient(create_test_endpoint_without_ssl)
+def create_test_smart_client_without_ssl(make_smart_client):
+    return make_smart_client()
 
 
 def test_endpoint_url_of_smart_client(create_test_smart_client_without_ssl):
@@ -62,3 +49,36 @@ def test_endpoint_url_of_smart_client(create_test_smart_client_without_ssl):
 
 def test_endpoint_name_of_smart_client(create_test_smart_client_without_ssl):
     assert create_test_smart_client_without_ssl.get_endpoint_name() == "Test Endpoint"
+
+
+def test_find_all_practitioner_data_bounds_and_orders_role_lookups(
+    create_test_smart_client_without_ssl,
+):
+    client = create_test_smart_client_without_ssl
+    client.endpoint.role_lookup_concurrency = 2
+
+    practitioners = [Mock(id=str(i)) for i in range(5)]
+    in_flight, peak = 0, 0
+
+    async def find_practitioner(*args, **kwargs):
+        return practitioners
+
+    async def find_practitioner_role(practitioner, resolve_references=False):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later practitioners answer first, the output must still follow the input order
+        await asyncio.sleep(0.01 * (5 - int(practitioner.id)))
+        in_flight -= 1
+        return [Mock(id="role-" + practitioner.id, location=[])]
+
+    client.find_practitioner = find_practitioner
+    client.find_practitioner_role = find_practitioner_role
+    client.find_practitioner_role_locations = lambda role: []
+
+    _, roles, _ = asyncio.run(
+        client.find_all_practitioner_data("Smith", "Jane", "1234567890")
+    )
+
+    assert [role.id for role in roles] == ["role-" + str(i) for i in range(5)]
+    assert peak == 2
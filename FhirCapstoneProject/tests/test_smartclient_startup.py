@@ -0,0 +1,105 @@
+# Description: Tests that a SmartClient starts without blocking on its endpoint and keeps its Capability Statement on disk
+
+import json
+import threading
+
+import pytest
+from fhirclient.models.capabilitystatement import CapabilityStatement
+
+from FhirCapstoneProject.fhirtypepkg.smartclient import SmartClient
+
+capability_statement_json = {
+    "resourceType": "CapabilityStatement",
+    "status": "active",
+    "date": "2024-01-01",
+    "kind": "instance",
+    "fhirVersion": "4.0.1",
+    "format": ["json"],
+    "rest": [
+        {
+            "mode": "server",
+            "resource": [
+                {
+                    "type": "PractitionerRole",
+                    "searchInclude": ["PractitionerRole:location"],
+                }
+            ],
+        }
+    ],
+}
+
+
+@pytest.fixture
+def block_endpoint(monkeypatch):
+    # The endpoint answers only once the test releases it
+    release = threading.Event()
+
+    def find_endpoint_metadata(self, request_string):
+        release.wait(5)
+        return CapabilityStatement(capability_statement_json)
+
+    monkeypatch.setattr(SmartClient, "find_endpoint_metadata", find_endpoint_metadata)
+    return release
+
+
+def test_startup_does_not_wait_for_endpoint(
+    block_endpoint, tmp_path, make_smart_client
+):
+    client = make_smart_client(
+        get_metadata_on_init="metadata", capability_cache_dir=str(tmp_path)
+    )
+
+    assert not client.is_ready()
+    assert client.metadata is None
+
+    block_endpoint.set()
+
+    assert client.wait_until_ready(5)
+    assert client._search_includes_by_type["PractitionerRole"] == {
+        "PractitionerRole:location"
+    }
+    client._closed.set()
+
+
+def test_capability_statement_is_loaded_from_disk(
+    block_endpoint, tmp_path, make_smart_client
+):
+    block_endpoint.set()
+    first = make_smart_client(
+        get_metadata_on_init="metadata", capability_cache_dir=str(tmp_path)
+    )
+    assert first.wait_until_ready(5)
+    first._closed.set()
+
+    # The next boot has the capabilities before the endpoint answers
+    block_endpoint.clear()
+    second = make_smart_client(
+        get_metadata_on_init="metadata", capability_cache_dir=str(tmp_path)
+    )
+
+    assert not second.is_ready()
+    assert second._search_includes_by_type["PractitionerRole"] == {
+        "PractitionerRole:location"
+    }
+
+    block_endpoint.set()
+    second._closed.set()
+
+
+def test_failed_refresh_keeps_loaded_capabilities(
+    monkeypatch, tmp_path, make_smart_client
+):
+    def find_endpoint_metadata(self, request_string):
+        raise ConnectionError("endpoint is down")
+
+    monkeypatch.setattr(SmartClient, "find_endpoint_metadata", find_endpoint_metadata)
+    (tmp_path / "Test_Endpoint.json").write_text(json.dumps(capability_statement_json))
+
+    client = make_smart_client(
+        get_metadata_on_init="metadata", capability_cache_dir=str(tmp_path)
+    )
+
+    assert client.wait_until_ready(5)
+    assert not client.refresh_endpoint_metadata()
+    assert client.metadata is not None
+    client._closed.set()